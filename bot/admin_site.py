@@ -8,21 +8,10 @@ from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 import json
 
-# Initialize Firebase service lazily
-firebase_service = None
-
-def get_firebase_service():
-    global firebase_service
-    if firebase_service is None:
-        try:
-            # Use the lazy initializer from firebase_service.py
-            from .firebase_service import get_firebase_service as _get_fb_service
-            firebase_service = _get_fb_service()
-        except Exception as e:
-            print(f"Firebase not initialized: {e}")
-            return None
-    return firebase_service
-
+from .core.aio import async_login_required, run_sync
+from .core.compact import compressed_response, json_response, shape
+from .core.firebase import get_service
+from .core.outbox import new_record
 
 # Customize admin site
 admin.site.site_header = "Counseling Bot Administration"
@@ -41,59 +30,46 @@ def counseling_cases_view(request):
     })
 
 
-@login_required
-def cases_api_view(request):
+@async_login_required
+@compressed_response
+async def cases_api_view(request):
     """API endpoint for getting cases."""
+    from .admin_views import cases_with_people
+
     try:
-        service = get_firebase_service()
+        service = await run_sync(get_service)
         if not service:
             return JsonResponse({'error': 'Firebase not initialized'}, status=500)
         
-        cases = []
-        for doc in service.db.collection('cases').stream():
-            case_data = doc.to_dict()
-            case_data['id'] = doc.id
-            
-            # Get user info
-            user = service.get_user(case_data.get('user_telegram_id'))
-            if user:
-                case_data['user_info'] = {
-                    'first_name': user.get('first_name', 'Unknown'),
-                    'username': user.get('username', 'N/A')
-                }
-            
-            # Get counselor info if assigned
-            if case_data.get('assigned_counselor_id'):
-                counselor = service.get_user(case_data['assigned_counselor_id'])
-                if counselor:
-                    case_data['counselor_info'] = {
-                        'first_name': counselor.get('first_name', 'Unknown'),
-                        'username': counselor.get('username', 'N/A')
-                    }
-            
-            cases.append(case_data)
-        
-        # Sort by created_at descending if available
-        try:
-            cases.sort(key=lambda c: c.get('created_at', ''), reverse=True)
-        except Exception:
-            pass
-        return JsonResponse({'cases': cases})
+        return json_response({'cases': shape(request, 'cases', await cases_with_people(service))})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
         
 
 
 @login_required
-def users_api_view(request):
+def cases_stream_view(request):
+    """Server-sent events with case changes (shared listener, see ``bot.core.case_feed``)."""
+    from .admin_views import sse_response
+    from .core.case_feed import get_case_feed
+
+    service = get_service()
+    if not service:
+        return JsonResponse({'error': 'Firebase not initialized'}, status=503)
+    return sse_response(get_case_feed(service), request)
+
+
+@async_login_required
+@compressed_response
+async def users_api_view(request):
     """API endpoint for getting users/counselors."""
     try:
-        service = get_firebase_service()
+        service = await run_sync(get_service)
         if not service:
             return JsonResponse({'error': 'Firebase not initialized'}, status=500)
         
         users = []
-        for doc in service.db.collection('users').stream():
+        for doc in await run_sync(lambda: list(service.db.collection('users').stream())):
             user_data = doc.to_dict()
             user_data['id'] = doc.id
             
@@ -106,13 +82,13 @@ def users_api_view(request):
                     'role': user_data.get('role', 'user')
                 })
         
-        return JsonResponse({'users': users})
+        return json_response({'users': users})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@login_required
-def assign_case_view(request, case_id):
+@async_login_required
+async def assign_case_view(request, case_id):
     """Assign a case to a counselor."""
     if request.method == 'POST':
         try:
@@ -122,38 +98,26 @@ def assign_case_view(request, case_id):
             if not counselor_id:
                 return JsonResponse({'error': 'Counselor ID required'}, status=400)
             
-            service = get_firebase_service()
+            service = await run_sync(get_service)
             if not service:
                 return JsonResponse({'error': 'Firebase not initialized'}, status=500)
             
-            # Assign case
-            service.assign_case(case_id, counselor_id, None)  # Leader ID can be None for now
-            
-            # Notify counselor via bot
-            import os
-            from telegram import Bot
-            
-            bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-            if bot_token:
-                bot = Bot(token=bot_token)
-                
-                # Get case details
-                case = service.get_case(case_id)
-                if case:
-                    try:
-                        bot.send_message(
-                            chat_id=int(counselor_id),
-                            text=(
-                                f"📋 New Case Assigned to You!\n\n"
-                                f"Case ID: {case_id[:8]}\n"
-                                f"Problem: {case['problem']}\n\n"
-                                f"Please start the conversation with the user."
-                            )
-                        )
-                    except Exception as e:
-                        print(f"Error sending notification: {e}")
+            # Assign case and queue the counselor notification in one batch;
+            # the bot process delivers it from the outbox. Leader ID can be None for now.
+            case = await run_sync(service.get_case, case_id)
+            if not case:
+                return JsonResponse({'error': 'Case not found'}, status=404)
+            await run_sync(service.assign_case, case_id, counselor_id, None, notification=new_record(
+                counselor_id,
+                f"📋 New Case Assigned to You!\n\n"
+                f"Case ID: {case_id[:8]}\n"
+                f"Problem: {case['problem']}\n\n"
+                f"Please start the conversation with the user."
+            ))
             
             return JsonResponse({'success': True, 'message': 'Case assigned successfully'})
+        except LookupError as e:
+            return JsonResponse({'error': str(e)}, status=404)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -2,50 +2,24 @@
 Standalone admin interface for case management.
 """
 from django.shortcuts import render
-from django.http import JsonResponse
-from django.conf import settings
-from pathlib import Path
+from django.http import JsonResponse, StreamingHttpResponse
 import json
 
-# Import Firebase module - defer import to avoid Django settings issues
-_admin_firebase_service = None
-
-def get_admin_firebase_service():
-    global _admin_firebase_service
-    print(f"[DEBUG] get_admin_firebase_service called, _admin_firebase_service is: {_admin_firebase_service}")
-    if _admin_firebase_service is None:
-        print("[DEBUG] Initializing Firebase service...")
-        try:
-            cred_path = getattr(settings, 'FIREBASE_CREDENTIALS_PATH', 'serviceAccountKey.json')
-            abs_path = Path(cred_path)
-            if not abs_path.is_absolute():
-                base_dir = Path(getattr(settings, 'BASE_DIR', '.'))
-                abs_path = base_dir / abs_path
-            print(f"[DEBUG] FIREBASE_CREDENTIALS_PATH setting: {cred_path}")
-            print(f"[DEBUG] Resolved credentials path: {abs_path}")
-            print(f"[DEBUG] Credentials file exists: {abs_path.exists()}")
-        except Exception as debug_e:
-            print(f"[DEBUG] Error while checking credentials path: {debug_e}")
-        try:
-            from .firebase_service import get_firebase_service
-            print("[DEBUG] Import successful, calling get_firebase_service()...")
-            _admin_firebase_service = get_firebase_service()
-            print(f"[DEBUG] Admin Firebase initialized: {_admin_firebase_service}")
-        except Exception as e:
-            print(f"[ERROR] Firebase service error: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
-    print(f"[DEBUG] Returning service: {_admin_firebase_service is not None}")
-    return _admin_firebase_service
-
+from .core import case_query
+from .core.aio import gather, is_asgi, run_sync
+from .core.case_feed import get_case_feed, running_case_feed
+from .core.compact import compressed_response, json_response, shape
+from .core.firebase import get_service
+from .core.outbox import new_record
+from .core.replica import replica_for
+from .core.response_cache import cached_response, uncacheable
 
 def admin_dashboard(request):
     """Main admin dashboard for managing cases."""
     # Test Firebase connection before rendering
     print("Testing Firebase connection...")
     try:
-        service = get_admin_firebase_service()
+        service = get_service()
         if service:
             print("Firebase connected!")
         else:
@@ -58,70 +32,151 @@ def admin_dashboard(request):
     return render(request, 'admin_dashboard.html')
 
 
-def api_cases(request):
+@compressed_response
+@cached_response('cases', 'users')
+async def api_cases(request):
     """API endpoint to get all cases."""
     print("API called: /admin-ui/api/cases/")
+    replica = replica_for(request)
+    feed = running_case_feed()
     try:
-        service = get_admin_firebase_service()
+        query = case_query.from_request(request)
+        if query is not None and replica is None and feed is None:
+            case_query.plan(query)
+    except case_query.QueryError as e:
+        return JsonResponse({'cases': [], 'error': str(e)}, status=400)
+    if replica is not None:
+        return json_response({'cases': shape(request, 'cases', await run_sync(_replica_cases, replica, query))})
+    if feed is not None:
+        cases = feed.cases() if query is None else case_query.apply(feed.cases(), query)
+        return json_response({'cases': shape(request, 'cases', cases)})
+    try:
+        service = await run_sync(get_service)
         print(f"Firebase service: {service}")
         if not service:
             print("No Firebase service!")
-            import json
-            import traceback
-            traceback.print_exc()
             response_data = {'cases': [], 'error': 'Firebase not connected'}
             print(f"Returning: {json.dumps(response_data)}")
-            return JsonResponse(response_data, status=200)
+            return uncacheable(JsonResponse(response_data, status=200))
         
         print("Fetching cases from Firebase...")
-        cases = []
-        for doc in service.db.collection('cases').stream():
-            case_data = doc.to_dict()
-            case_data['id'] = doc.id
-            print(f"Found case: {doc.id}")
-            
-            # Get user info
-            user = service.get_user(case_data.get('user_telegram_id'))
-            if user:
-                case_data['user_info'] = {
-                    'first_name': user.get('first_name', 'Unknown'),
-                    'username': user.get('username', 'N/A')
-                }
-            
-            # Get counselor info if assigned
-            if case_data.get('assigned_counselor_id'):
-                counselor = service.get_user(case_data['assigned_counselor_id'])
-                if counselor:
-                    case_data['counselor_info'] = {
-                        'first_name': counselor.get('first_name', 'Unknown'),
-                        'username': counselor.get('username', 'N/A')
-                    }
-            
-            cases.append(case_data)
-        
-        # Sort by created_at descending if present
-        try:
-            cases.sort(key=lambda c: c.get('created_at', ''), reverse=True)
-        except Exception:
-            pass
+        cases = await cases_with_people(service, query)
         print(f"Returning {len(cases)} cases")
-        return JsonResponse({'cases': cases})
+        return json_response({'cases': shape(request, 'cases', cases)})
     except Exception as e:
         print(f"Error getting cases: {e}")
         import traceback
         traceback.print_exc()
-        return JsonResponse({'cases': []}, status=200)  # Return empty list without error
+        return uncacheable(JsonResponse({'cases': []}, status=200))  # Return empty list without error
+
+
+async def cases_with_people(service, query=None):
+    """Every case (or those matching a planned ``case_query.CaseQuery``) with
+    ``user_info``/``counselor_info``, newest first unless the query sorts.
+
+    Each distinct user is read once, and the reads run concurrently.
+    """
+    source = service.db.collection('cases')
+    if query is not None:
+        source = case_query.firestore_query(source, query)
+    cases = []
+    for doc in await run_sync(lambda: list(source.stream())):
+        case_data = doc.to_dict()
+        case_data['id'] = doc.id
+        cases.append(case_data)
+
+    ids = {c.get('user_telegram_id') for c in cases}
+    ids.update(c['assigned_counselor_id'] for c in cases if c.get('assigned_counselor_id'))
+    ids = [i for i in ids if i is not None]
+    users = dict(zip(ids, await gather(*((service.get_user, i) for i in ids))))
 
+    for case_data in cases:
+        user = users.get(case_data.get('user_telegram_id'))
+        if user:
+            case_data['user_info'] = {
+                'first_name': user.get('first_name', 'Unknown'),
+                'username': user.get('username', 'N/A')
+            }
+        if case_data.get('assigned_counselor_id'):
+            counselor = users.get(case_data['assigned_counselor_id'])
+            if counselor:
+                case_data['counselor_info'] = {
+                    'first_name': counselor.get('first_name', 'Unknown'),
+                    'username': counselor.get('username', 'N/A')
+                }
+
+    # Sort by created_at descending if present
+    if query is None:
+        try:
+            cases.sort(key=lambda c: c.get('created_at', ''), reverse=True)
+        except Exception:
+            pass
+    return cases
+
+
+def _replica_cases(replica, query=None):
+    """``api_cases`` payload built from the replica (no per-case user reads)."""
+    users = {str(u.get('telegram_id')): u for u in replica.users()}
+    cases = replica.cases() if query is None else replica.find_cases(*case_query.replica_sql(query))
+    for case_data in cases:
+        user = users.get(str(case_data.get('user_telegram_id')))
+        if user:
+            case_data['user_info'] = {
+                'first_name': user.get('first_name', 'Unknown'),
+                'username': user.get('username', 'N/A')
+            }
+        counselor = users.get(str(case_data.get('assigned_counselor_id')))
+        if case_data.get('assigned_counselor_id') and counselor:
+            case_data['counselor_info'] = {
+                'first_name': counselor.get('first_name', 'Unknown'),
+                'username': counselor.get('username', 'N/A')
+            }
+    if query is None:
+        cases.sort(key=lambda c: c.get('created_at') or '', reverse=True)
+    return cases
 
-def api_counselors(request):
+
+def api_cases_stream(request):
+    """Server-sent events with case changes for the dashboard (see ``bot.core.case_feed``)."""
+    service = get_service()
+    if not service:
+        return JsonResponse({'error': 'Firebase not connected'}, status=503)
+    return sse_response(get_case_feed(service), request)
+
+
+def sse_response(feed, request):
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    # ASGI sends a sync iterator only once it is exhausted; give it an async one
+    events = feed.astream(last_event_id) if is_asgi(request) else feed.stream(last_event_id)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies (nginx) from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@compressed_response
+@cached_response('users')
+async def api_counselors(request):
     """API endpoint to get all counselors."""
+    replica = replica_for(request)
+    if replica is not None:
+        return json_response({'counselors': [
+            {
+                'telegram_id': u.get('telegram_id'),
+                'first_name': u.get('first_name', 'Unknown'),
+                'username': u.get('username', 'N/A'),
+                'role': u.get('role', 'user')
+            }
+            for u in await run_sync(replica.users, roles=['counselor', 'leader'])
+        ]})
     try:
-        service = get_admin_firebase_service()
+        service = await run_sync(get_service)
         if not service:
-            return JsonResponse({'counselors': []}, status=200)  # Return empty list
+            return uncacheable(json_response({'counselors': []}, status=200))  # Return empty list
         
         users = []
-        for doc in service.db.collection('users').stream():
+        for doc in await run_sync(lambda: list(service.db.collection('users').stream())):
             user_data = doc.to_dict()
             if user_data.get('role') in ['counselor', 'leader']:
                 users.append({
@@ -131,13 +186,13 @@ def api_counselors(request):
                     'role': user_data.get('role', 'user')
                 })
         
-        return JsonResponse({'counselors': users})
+        return json_response({'counselors': users})
     except Exception as e:
         print(f"Error getting counselors: {e}")
-        return JsonResponse({'counselors': []}, status=200)  # Return empty list
+        return uncacheable(json_response({'counselors': []}, status=200))  # Return empty list
 
 
-def api_assign_case(request, case_id):
+async def api_assign_case(request, case_id):
     """API endpoint to assign a case to a counselor."""
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
@@ -149,38 +204,26 @@ def api_assign_case(request, case_id):
         if not counselor_id:
             return JsonResponse({'error': 'Counselor ID required'}, status=400)
         
-        service = get_admin_firebase_service()
+        service = await run_sync(get_service)
         if not service:
             return JsonResponse({'error': 'Firebase not connected'}, status=500)
         
-        # Assign case
-        service.assign_case(case_id, counselor_id, None)
-        
-        # Notify counselor via Telegram
-        import os
-        import asyncio
-        from telegram import Bot
-        
-        bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-        if bot_token:
-            try:
-                bot = Bot(token=bot_token)
-                case = service.get_case(case_id)
-                if case:
-                    # Run async send_message in sync context
-                    asyncio.run(bot.send_message(
-                        chat_id=int(counselor_id),
-                        text=(
-                            f"New Case Assigned to You!\n\n"
-                            f"Case ID: {case_id[:8]}\n"
-                            f"Problem: {case['problem']}\n\n"
-                            f"Please start the conversation with the user."
-                        )
-                    ))
-            except Exception as e:
-                print(f"Notification error: {e}")
+        # Assign case and queue the counselor notification in one batch;
+        # the bot process delivers it from the outbox.
+        case = await run_sync(service.get_case, case_id)
+        if not case:
+            return JsonResponse({'error': 'Case not found'}, status=404)
+        await run_sync(service.assign_case, case_id, counselor_id, None, notification=new_record(
+            counselor_id,
+            f"New Case Assigned to You!\n\n"
+            f"Case ID: {case_id[:8]}\n"
+            f"Problem: {case['problem']}\n\n"
+            f"Please start the conversation with the user."
+        ))
         
         return JsonResponse({'success': True, 'message': 'Case assigned successfully'})
+    except LookupError as e:
+        return JsonResponse({'error': str(e)}, status=404)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
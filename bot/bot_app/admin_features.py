@@ -4,6 +4,8 @@ from typing import List
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
+from bot.core import metrics
+from bot.core.search import get_search_index
 from .utils import get_firebase_service
 
 
@@ -20,12 +22,7 @@ async def pending_cases_command(update: Update, context: ContextTypes.DEFAULT_TY
         return
 
     # Fetch pending cases (latest 10)
-    all_cases: List[dict] = []
-    for doc in service.db.collection('cases').stream():
-        d = doc.to_dict()
-        d['id'] = doc.id
-        if d.get('status') == 'pending':
-            all_cases.append(d)
+    all_cases: List[dict] = service.get_all_pending_cases()
     all_cases.sort(key=lambda c: (c.get('created_at') or ''), reverse=True)
     pending = all_cases[:10]
 
@@ -99,3 +96,55 @@ async def handle_admin_callback(update: Update, context: ContextTypes.DEFAULT_TY
         await query.edit_message_text(f"❌ Error: {e}")
 
 
+
+
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admins/leaders: show in-process bot metrics (state sizes, timings)."""
+    service = get_firebase_service()
+    me = service.get_user(update.effective_user.id)
+    if not me or me.get('role') not in ['admin', 'leader']:
+        await update.message.reply_text("❌ Only admins can view metrics.")
+        return
+    await update.message.reply_text(metrics.format_snapshot(metrics.snapshot())[:4000])
+
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admins/leaders: full-text search over case problems and messages.
+
+    Usage: /search <words> [page]
+    """
+    service = get_firebase_service()
+    me = service.get_user(update.effective_user.id)
+    if not me or me.get('role') not in ['admin', 'leader']:
+        await update.message.reply_text("❌ Only admins can search cases.")
+        return
+    args = list(context.args or [])
+    page = 1
+    if len(args) > 1 and args[-1].isdigit():
+        page = max(1, int(args.pop()))
+    if not args:
+        await update.message.reply_text("Usage: /search <words> [page]")
+        return
+    index = get_search_index()
+    if index is None:
+        await update.message.reply_text("Search index is disabled.")
+        return
+
+    page_size = 10
+    try:
+        total, hits = index.search(' '.join(args), limit=page_size, offset=(page - 1) * page_size, marks=('<b>', '</b>'))
+    except Exception as e:
+        logger.error(f"Search failed: {e}")
+        await update.message.reply_text("❌ Search failed.")
+        return
+    if not hits:
+        await update.message.reply_text("No matches.")
+        return
+
+    lines = [f"🔎 {total} matches (page {page}):\n"]
+    for hit in hits:
+        where = 'problem' if hit['kind'] == 'problem' else f"{hit['sender_role']} msg #{hit['position'] + 1}"
+        lines.append(f"<code>{hit['case_id'][:8]}</code> · {where}\n{hit['snippet']}\n")
+    if page * page_size < total:
+        lines.append(f"Next: /search {' '.join(args)} {page + 1}")
+    await update.message.reply_text("\n".join(lines)[:4000], parse_mode='HTML')
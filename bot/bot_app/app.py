@@ -1,13 +1,33 @@
+import asyncio
 import logging
 import os
-from pathlib import Path
+import signal
+import time
 
 from django.conf import settings
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
+from telegram import Update
+from telegram.ext import (
+    Application,
+    CommandHandler,
+    MessageHandler,
+    CallbackQueryHandler,
+    InlineQueryHandler,
+    PicklePersistence,
+    TypeHandler,
+    filters,
+)
 
 from . import commands
 from . import messages
+from . import media
+from . import inline
+from . import state
+from .drain import InFlight, commit_offset
+from .health import HealthServer
 from .utils import apply_ptb_py313_patch
+from bot.core.firebase import get_service, replay_spool, spool_replayer, warm_up
+from bot.core.case_view import OpenCaseView
+from bot.core.outbox import OutboxDrainer
 from . import admin_features
 
 
@@ -16,6 +36,8 @@ logger = logging.getLogger(__name__)
 
 def _register_handlers(application: Application) -> None:
     logger.info("Adding handlers...")
+    # Runs first for every update: keeps per-user state bounded
+    application.add_handler(TypeHandler(Update, state.track_activity), group=-1)
     application.add_handler(CommandHandler("start", commands.start))
     application.add_handler(CommandHandler("menu", commands.menu_command))
     application.add_handler(CommandHandler("end", commands.end_command))
@@ -36,8 +58,12 @@ def _register_handlers(application: Application) -> None:
     # Admin helpers
     application.add_handler(CommandHandler("pending", admin_features.pending_cases_command))
     application.add_handler(CommandHandler("admin_pending", admin_features.pending_cases_command))
+    application.add_handler(CommandHandler("metrics", admin_features.metrics_command))
+    application.add_handler(CommandHandler("search", admin_features.search_command))
     application.add_handler(CallbackQueryHandler(admin_features.handle_admin_callback, pattern=r"^adm_"))
+    application.add_handler(InlineQueryHandler(inline.handle_inline_query))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, messages.handle_message))
+    application.add_handler(MessageHandler(media.MEDIA_FILTER, media.handle_media))
 
 
 def run() -> None:
@@ -49,11 +75,18 @@ def run() -> None:
         logger.error("TELEGRAM_BOT_TOKEN not set!")
         return
 
-    _ensure_firebase_creds_file()
-
     logger.info("Creating application...")
-    application = Application.builder().token(token).build()
+    builder = Application.builder().token(token)
+    persist_dir = state.state_dir()
+    if persist_dir:
+        persist_dir.mkdir(parents=True, exist_ok=True)
+        builder = builder.persistence(PicklePersistence(filepath=persist_dir / 'ptb_state.pickle'))
+    application = builder.build()
+    state.bind_application(application)
     _register_handlers(application)
+    inflight = InFlight()
+    inflight.track_handlers(application)
+    application.add_handler(TypeHandler(Update, inflight.note_update), group=-2)
 
     # Decide between webhook and polling. Use webhook if WEBHOOK_URL or WEBHOOK_BASE_URL is set.
     webhook_url = os.environ.get("WEBHOOK_URL")
@@ -63,46 +96,133 @@ def run() -> None:
             base = base.rstrip("/")
             webhook_url = f"{base}/{token}"
 
+    asyncio.run(_serve(application, inflight, token, webhook_url))
+
+
+async def _serve(application: Application, inflight: InFlight, token: str, webhook_url) -> None:
+    """Run until SIGTERM/SIGINT, then drain within ``BOT_DRAIN_SECONDS``.
+
+    Draining stops fetching updates, lets queued updates and in-flight
+    handlers (and their sends) finish, stops the outbox drainer after its
+    current send, flushes the write spool, and then commits the polling
+    offset, so the next process neither loses nor repeats updates.
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:  # Windows
+            signal.signal(signum, lambda *_: loop.call_soon_threadsafe(stop.set))
+
+    health = None
+    health_port = getattr(settings, 'BOT_HEALTH_PORT', 0)
+    if health_port:
+        # Up before initialize(): /health answers while booting, /ready says 503
+        health = HealthServer(application, health_port)
+        try:
+            await health.start()
+        except OSError as e:
+            logger.error(f"Health endpoints disabled: {e}")
+            health = None
+
+    await application.initialize()
+    await _post_init(application)
+    polling = True
     if webhook_url:
         port = int(os.environ.get("PORT", 10000))
         logger.info(f"Starting webhook server on 0.0.0.0:{port}")
         logger.info(f"Webhook URL set to {webhook_url}")
         try:
-            application.run_webhook(
+            await application.updater.start_webhook(
                 listen="0.0.0.0",
                 port=port,
                 url_path=token,
                 webhook_url=webhook_url,
             )
-            return
+            polling = False
         except Exception as exc:
             logger.warning(
                 "Webhook start failed (%s). Falling back to polling...", type(exc).__name__
             )
             logger.debug("Webhook error", exc_info=exc)
-
-    logger.info("Starting in polling mode")
-    application.run_polling()
-
-
-def _ensure_firebase_creds_file() -> None:
-    """If FIREBASE_CREDENTIALS_JSON is provided, write it to serviceAccountKey.json.
-
-    This allows Render Secret (env var) based provisioning without committing the file.
-    The Firebase service already defaults to reading settings.FIREBASE_CREDENTIALS_PATH
-    which is 'serviceAccountKey.json' at the project base.
-    """
-    json_blob = os.environ.get("FIREBASE_CREDENTIALS_JSON")
-    if not json_blob:
+    if polling:
+        logger.info("Starting in polling mode")
+        await application.updater.start_polling()
+    await application.start()
+
+    await stop.wait()
+    if health is not None:
+        # Report unready before draining so traffic moves elsewhere first
+        health.draining = True
+    deadline = time.monotonic() + getattr(settings, 'BOT_DRAIN_SECONDS', 25)
+    logger.info("Shutdown requested; draining in-flight updates...")
+    await application.updater.stop()
+    try:
+        # Processes the updates already queued and waits for running handlers
+        await asyncio.wait_for(application.stop(), max(0.0, deadline - time.monotonic()))
+        drained = True
+    except asyncio.TimeoutError:
+        drained = False
+        logger.warning(
+            f"Drain deadline passed with {inflight.count} handler(s) running and "
+            f"{application.update_queue.qsize()} update(s) queued; stopping anyway"
+        )
+    await _post_stop(application, deadline)
+    if polling and drained:
+        await commit_offset(application.bot, inflight.last_update_id)
+    await application.shutdown()
+    await _post_shutdown(application)
+    if health is not None:
+        await health.stop()
+    logger.info("Bot stopped")
+
+
+# Long-running background work owned by the bot process
+_background_tasks = []
+_outbox_drainer = None
+_case_view = None
+
+
+async def _post_init(application: Application) -> None:
+    global _outbox_drainer, _case_view
+    # Connect to Firestore before taking updates, not inside the first handler
+    await asyncio.to_thread(warm_up)
+    replay_spool()
+    service = get_service()
+    if service is None:
         return
-
     try:
-        base_dir = Path(getattr(settings, 'BASE_DIR', '.'))
-        target = base_dir / 'serviceAccountKey.json'
-        if not target.exists():
-            target.write_text(json_blob)
-            logger.info(f"Wrote Firebase credentials to {target}")
+        _case_view = OpenCaseView(service.db)
+        _case_view.start()
+        service.attach_case_view(_case_view)
     except Exception as e:
-        logger.error(f"Failed to write Firebase credentials file: {e}")
-
-
+        logger.error(f"Open-case view disabled: {e}")
+    _outbox_drainer = OutboxDrainer(service, application.bot, interval=settings.OUTBOX_POLL_SECONDS)
+    _background_tasks.append(asyncio.create_task(_outbox_drainer.run()))
+
+
+async def _post_stop(application: Application, deadline: float) -> None:
+    """Stop background work within the drain ``deadline`` (``time.monotonic``)."""
+    if _outbox_drainer is not None:
+        # Let the drainer finish its current send before cancelling it
+        _outbox_drainer.stop()
+    if _background_tasks:
+        _, pending = await asyncio.wait(_background_tasks, timeout=max(0.0, deadline - time.monotonic()))
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+        _background_tasks.clear()
+    replayer = spool_replayer()
+    if replayer is not None:
+        await asyncio.to_thread(replayer.stop)
+        # Spooled writes survive on disk, but hand them to Firestore now if it is reachable
+        if not await asyncio.to_thread(replayer.flush, deadline):
+            logger.warning("Write spool not empty at shutdown; it will be replayed by the next replayer")
+        replayer.release()
+    if _case_view is not None:
+        _case_view.stop()
+
+
+async def _post_shutdown(application: Application) -> None:
+    state.save_state()
@@ -5,14 +5,20 @@ from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from bot.ui.keyboards import build_main_menu, build_counselor_menu, build_admin_menu
+from bot.ui.keyboards import MAIN_MENU, COUNSELOR_MENU, ADMIN_MENU
 from .utils import get_firebase_service, build_case_label
 from .state import counselor_active_case_selection
+from bot.core.prefix_index import AmbiguousPrefix
 
 
 logger = logging.getLogger(__name__)
 
 
+def _ambiguous_text(error: AmbiguousPrefix) -> str:
+    candidates = ", ".join(cid[:10] for cid in error.matches)
+    return f"Several cases start with '{error.prefix}': {candidates}. Please type more characters."
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command."""
     user = update.effective_user
@@ -32,14 +38,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Error creating/getting user in start: {e}")
 
     # Pick keyboard per role
-    role_kb = build_main_menu()
+    role_kb = MAIN_MENU
     try:
         existing = service.get_user(user.id)
         if existing:
             if existing.get('role') in ['admin', 'leader']:
-                role_kb = build_admin_menu()
+                role_kb = ADMIN_MENU
             elif existing.get('role') == 'counselor':
-                role_kb = build_counselor_menu()
+                role_kb = COUNSELOR_MENU
     except Exception as e:
         logger.error(f"Error getting user role in start: {e}")
 
@@ -88,8 +94,7 @@ async def problem_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Check if user already has a case
-    user_cases = service.get_user_cases(user.id)
-    active_cases = [c for c in user_cases if c.get('status') in ['pending', 'assigned', 'active']]
+    active_cases = service.get_open_user_cases(user.id)
     existing_case = active_cases[0] if active_cases else None
 
     if existing_case:
@@ -141,7 +146,7 @@ async def problem_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def assign_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /assign command (admin only)."""
+    """Handle /assign command (admin only). The case id may be a short prefix."""
     if len(context.args) != 2:
         await update.message.reply_text("Usage: `/assign <case_id> <counselor_id>`", parse_mode='Markdown')
         return
@@ -154,10 +159,15 @@ async def assign_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Only admins can assign cases.")
         return
 
-    case_id, counselor_id = context.args
+    case_prefix, counselor_id = context.args
 
     try:
-        case = service.get_case(case_id)
+        try:
+            case_id = service.resolve_case_id(case_prefix)
+        except AmbiguousPrefix as e:
+            await update.message.reply_text(_ambiguous_text(e))
+            return
+        case = service.get_case(case_id) if case_id else None
         if not case:
             await update.message.reply_text("❌ Case not found.")
             return
@@ -186,14 +196,9 @@ async def cases_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     role = user_data.get('role', 'user') if user_data else 'user'
 
     if role in ['admin', 'leader']:
-        all_cases = []
-        for doc in service.db.collection('cases').stream():
-            case = doc.to_dict()
-            case['id'] = doc.id
-            all_cases.append(case)
-
-        pending = [c for c in all_cases if c.get('status') == 'pending']
-        message = f"📊 Cases: {len(all_cases)} total, {len(pending)} pending\n\n"
+        total = service.count_cases()
+        pending = service.get_all_pending_cases()
+        message = f"📊 Cases: {total} total, {len(pending)} pending\n\n"
         for case in pending[:10]:
             message += f"`{case['id'][:12]}` - {case['problem'][:40]}...\n"
 
@@ -218,7 +223,7 @@ async def cases_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(
                 "No cases yet. Use `/discuss <message>` to create one.",
                 parse_mode='Markdown',
-                reply_markup=build_main_menu(),  # remove keyboard for normal users
+                reply_markup=MAIN_MENU,  # remove keyboard for normal users
             )
             return
 
@@ -229,7 +234,7 @@ async def cases_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 status += " ✅"
             message += f"`{case['id'][:12]}` - {status}\n"
 
-        await update.message.reply_text(message, parse_mode='Markdown', reply_markup=build_main_menu())
+        await update.message.reply_text(message, parse_mode='Markdown', reply_markup=MAIN_MENU)
 
 
 async def admin_list_all_cases_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -271,7 +276,7 @@ async def admin_list_all_cases_command(update: Update, context: ContextTypes.DEF
             f"`{c['id'][:10]}` - {status} | user: {user_name} | counselor: {counselor_name}"
         )
 
-    await update.message.reply_text("\n".join(lines), parse_mode='Markdown', reply_markup=build_admin_menu())
+    await update.message.reply_text("\n".join(lines), parse_mode='Markdown', reply_markup=ADMIN_MENU)
 
 
 async def register_counselor_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -380,7 +385,7 @@ async def switch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Only counselors can use /switch.")
         return
 
-    cases = service.get_counselor_cases(str(user.id)) or []
+    cases = service.get_open_counselor_cases(str(user.id)) or []
     active_cases = [c for c in cases if c.get('status') in ['assigned', 'active']]
     # Stable order: storage/creation order (oldest first)
     try:
@@ -394,7 +399,7 @@ async def switch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         # Ensure counselor keyboard is active (no user buttons)
         try:
-            await update.message.reply_text("Switch case:", reply_markup=build_counselor_menu())
+            await update.message.reply_text("Switch case:", reply_markup=COUNSELOR_MENU)
         except Exception:
             pass
         # Text list + inline buttons for all cases
@@ -423,11 +428,12 @@ async def switch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
     else:
         # case id exact or prefix match
-        for c in active_cases:
-            cid = c.get('id', '')
-            if cid == arg or cid.startswith(arg):
-                chosen = c
-                break
+        try:
+            case_id = service.resolve_case_id(arg, counselor_id=str(user.id))
+        except AmbiguousPrefix as e:
+            await update.message.reply_text(_ambiguous_text(e))
+            return
+        chosen = next((c for c in active_cases if c.get('id') == case_id), None)
         if not chosen:
             await update.message.reply_text("Case not found for your assignments.")
             return
@@ -437,7 +443,7 @@ async def switch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         f"Switched to {case_label}. Your replies will go to the user.",
         parse_mode='Markdown',
-        reply_markup=build_counselor_menu()
+        reply_markup=COUNSELOR_MENU
     )
 
 
@@ -461,7 +467,7 @@ async def switch_pick_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     await query.edit_message_text(f"✅ Switched to {case_label}. Now your messages will reach the user.")
     # Also send a small message to refresh the reply keyboard
     try:
-        await query.message.reply_text("Menu updated.", reply_markup=build_counselor_menu())
+        await query.message.reply_text("Menu updated.", reply_markup=COUNSELOR_MENU)
     except Exception:
         pass
 
@@ -485,20 +491,23 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "`/assign <case_id> <counselor_id>` - Assign case\n"
             "`/cases_all` - List all cases with users and counselors\n"
             "`/pending` - List pending cases with Assign buttons\n"
+            "`@<bot> <words>` - Search open cases by id, name or problem\n"
+            "`/search <words>` - Search all problems and messages\n"
             "`/register_admin <passcode>` - Become admin\n"
             "`/help` - Show this help"
         )
-        kb = build_admin_menu()
+        kb = ADMIN_MENU
     elif role == 'counselor':
         help_text = (
             "**Counselor Help**\n\n"
             "`/cases` - View your assigned cases\n"
             "`/switch [index|case_id]` - Choose which user to reply to\n"
             "`/setname [case_id] <alias>` / `/clearname [case_id]` - Manage case label\n"
+            "`@<bot> <words>` - Search your cases by id, name or problem\n"
             "`/end` - Close the current case\n"
             "`/help` - Show this help"
         )
-        kb = build_counselor_menu()
+        kb = COUNSELOR_MENU
     else:
         help_text = (
             "**Help**\n\n"
@@ -507,7 +516,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "`/cases` - View your conversations\n"
             "`/help` - Show this help"
         )
-        kb = build_main_menu()
+        kb = MAIN_MENU
 
     await update.message.reply_text(help_text, parse_mode='Markdown', reply_markup=kb)
 
@@ -516,14 +525,14 @@ async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show main menu keyboard again."""
     service = get_firebase_service()
     user = update.effective_user
-    kb = build_main_menu()
+    kb = MAIN_MENU
     try:
         existing = service.get_user(user.id)
         if existing:
             if existing.get('role') in ['admin', 'leader']:
-                kb = build_admin_menu()
+                kb = ADMIN_MENU
             elif existing.get('role') == 'counselor':
-                kb = build_counselor_menu()
+                kb = COUNSELOR_MENU
     except Exception:
         pass
     await update.message.reply_text("Main menu:", reply_markup=kb)
@@ -545,15 +554,12 @@ async def end_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     selected_case_id = counselor_active_case_selection.get(user.id)
     if not selected_case_id:
-        await update.message.reply_text("No current case selected. Use /switch to choose one.", reply_markup=build_counselor_menu())
+        await update.message.reply_text("No current case selected. Use /switch to choose one.", reply_markup=COUNSELOR_MENU)
         return
 
     try:
         # Close case
-        service.db.collection('cases').document(selected_case_id).update({
-            'status': 'closed',
-            'updated_at': datetime.now().isoformat()
-        })
+        service.update_case(selected_case_id, {'status': 'closed'})
         case = service.get_case(selected_case_id)
         
         # Block the user from creating new cases
@@ -578,7 +584,7 @@ async def end_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         pass
 
     counselor_active_case_selection.pop(user.id, None)
-    await update.message.reply_text("✅ User blocked. Use /switch to choose another case.", reply_markup=build_counselor_menu())
+    await update.message.reply_text("✅ User blocked. Use /switch to choose another case.", reply_markup=COUNSELOR_MENU)
 
 
 async def done_case_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -592,15 +598,12 @@ async def done_case_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     selected_case_id = counselor_active_case_selection.get(user.id)
     if not selected_case_id:
-        await update.message.reply_text("No current case selected. Use /switch to choose one.", reply_markup=build_counselor_menu())
+        await update.message.reply_text("No current case selected. Use /switch to choose one.", reply_markup=COUNSELOR_MENU)
         return
 
     try:
-        service.db.collection('cases').document(selected_case_id).update({
-            'done': True,
-            'updated_at': datetime.now().isoformat()
-        })
-        await update.message.reply_text("✅ Marked as done. Conversation remains open.", reply_markup=build_counselor_menu())
+        service.update_case(selected_case_id, {'done': True})
+        await update.message.reply_text("✅ Marked as done. Conversation remains open.", reply_markup=COUNSELOR_MENU)
     except Exception as e:
         await update.message.reply_text(f"Error marking done: {e}")
 
@@ -634,24 +637,18 @@ async def setname_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         possible_id = context.args[0]
         alias = ' '.join(context.args[1:])
         # Resolve by exact/prefix among counselor's cases
-        cases = service.get_counselor_cases(str(user.id)) or []
-        target = None
-        for c in cases:
-            cid = c.get('id', '')
-            if cid == possible_id or cid.startswith(possible_id):
-                target = c
-                break
-        if not target:
+        try:
+            case_id = service.resolve_case_id(possible_id, counselor_id=str(user.id))
+        except AmbiguousPrefix as e:
+            await update.message.reply_text(_ambiguous_text(e))
+            return
+        if not case_id:
             await update.message.reply_text("Case not found in your assignments.")
             return
-        case_id = target['id']
 
     try:
-        service.db.collection('cases').document(case_id).update({
-            'alias': alias,
-            'updated_at': datetime.now().isoformat()
-        })
-        await update.message.reply_text(f"Alias set for case {case_id[:8]}: [{alias}]", reply_markup=build_counselor_menu())
+        service.update_case(case_id, {'alias': alias})
+        await update.message.reply_text(f"Alias set for case {case_id[:8]}: [{alias}]", reply_markup=COUNSELOR_MENU)
     except Exception as e:
         await update.message.reply_text(f"Error setting alias: {e}")
 
@@ -681,24 +678,18 @@ async def clearname_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
     else:
         possible_id = context.args[0]
-        cases = service.get_counselor_cases(str(user.id)) or []
-        target = None
-        for c in cases:
-            cid = c.get('id', '')
-            if cid == possible_id or cid.startswith(possible_id):
-                target = c
-                break
-        if not target:
+        try:
+            case_id = service.resolve_case_id(possible_id, counselor_id=str(user.id))
+        except AmbiguousPrefix as e:
+            await update.message.reply_text(_ambiguous_text(e))
+            return
+        if not case_id:
             await update.message.reply_text("Case not found in your assignments.")
             return
-        case_id = target['id']
 
     try:
-        service.db.collection('cases').document(case_id).update({
-            'alias': None,
-            'updated_at': datetime.now().isoformat()
-        })
-        await update.message.reply_text(f"Alias removed for case {case_id[:8]}", reply_markup=build_counselor_menu())
+        service.update_case(case_id, {'alias': None})
+        await update.message.reply_text(f"Alias removed for case {case_id[:8]}", reply_markup=COUNSELOR_MENU)
     except Exception as e:
         await update.message.reply_text(f"Error removing alias: {e}")
 
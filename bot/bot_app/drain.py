@@ -0,0 +1,55 @@
+"""In-flight tracking for a graceful bot shutdown.
+
+Every handler callback is wrapped so the number of updates being handled
+is known while draining; the highest update id that reached the handlers
+is remembered so the polling offset can be committed once they finished,
+and Telegram does not deliver those updates again after the restart.
+"""
+
+import functools
+import logging
+
+from bot.core import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class InFlight:
+    def __init__(self):
+        self.count = 0
+        self.last_update_id = None
+        metrics.gauge("bot.inflight", lambda: self.count)
+
+    def wrap(self, callback):
+        @functools.wraps(callback)
+        async def tracked(update, context):
+            self.count += 1
+            try:
+                return await callback(update, context)
+            finally:
+                self.count -= 1
+        return tracked
+
+    def track_handlers(self, application) -> None:
+        """Wrap the callbacks of every handler registered on ``application``."""
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                handler.callback = self.wrap(handler.callback)
+
+    async def note_update(self, update, context) -> None:
+        """Group -2 TypeHandler: remember the newest update id seen."""
+        update_id = getattr(update, 'update_id', None)
+        if update_id is not None and (self.last_update_id is None or update_id > self.last_update_id):
+            self.last_update_id = update_id
+
+
+async def commit_offset(bot, last_update_id) -> None:
+    """Confirm every update up to ``last_update_id`` to Telegram (polling only)."""
+    if last_update_id is None:
+        return
+    try:
+        await bot.get_updates(offset=last_update_id + 1, limit=1, timeout=0)
+        logger.info(f"Committed polling offset {last_update_id + 1}")
+    except Exception as e:
+        logger.warning(f"Could not commit polling offset: {e}")
@@ -0,0 +1,85 @@
+"""Liveness/readiness endpoints for the bot process.
+
+The bot has no HTTP server of its own in polling mode, so a minimal one
+listens on ``BOT_HEALTH_PORT`` (off when 0):
+
+- ``GET /health``: 200 while the event loop answers
+- ``GET /ready``: the shared probes of ``bot.core.readiness`` plus whether
+  the application is fetching updates; 503 while any of them fails, and
+  from the moment a shutdown starts
+"""
+
+import asyncio
+import json
+import logging
+
+from bot.core import readiness
+
+
+logger = logging.getLogger(__name__)
+
+_REASONS = {200: 'OK', 404: 'Not Found', 405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+
+class HealthServer:
+    def __init__(self, application, port: int, host: str = '0.0.0.0'):
+        self.application = application
+        self.port = port
+        self.host = host
+        self.draining = False
+        self._server = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Health endpoints on {self.host}:{self.port} (/health, /ready)")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _updates(self) -> dict:
+        updater = self.application.updater
+        ok = self.application.running and updater is not None and updater.running and not self.draining
+        return {'ok': ok, 'draining': self.draining}
+
+    async def ready(self) -> dict:
+        probes = readiness.probes()
+        results = await asyncio.gather(*(asyncio.to_thread(probe.result) for probe in probes))
+        checks = {probe.name: result for probe, result in zip(probes, results)}
+        checks['updates'] = self._updates()
+        return readiness.summarize(checks)
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # Headers are not needed; read them so the client sees a clean close
+            while (await asyncio.wait_for(reader.readline(), 5)).strip():
+                pass
+            method, path, *_ = request_line.decode('latin-1').split() or ['', '']
+            path = path.split('?', 1)[0].rstrip('/')
+            if method not in ('GET', 'HEAD'):
+                status, body = 405, {'error': 'method not allowed'}
+            elif path == '/health':
+                status, body = 200, {'status': 'ok'}
+            elif path == '/ready':
+                body = await self.ready()
+                status = 200 if body['status'] == 'ready' else 503
+            else:
+                status, body = 404, {'error': 'not found'}
+            payload = json.dumps(body).encode()
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode()
+                + (payload if method != 'HEAD' else b'')
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ValueError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.warning(f"Health request failed: {e}")
+        finally:
+            writer.close()
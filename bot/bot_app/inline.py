@@ -0,0 +1,120 @@
+"""Inline-mode case search (``@bot <query>``) for counselors and leaders.
+
+Counselors search their own open cases, leaders and admins all open cases,
+by id prefix, alias or problem words. Answers come from the open-case view's
+search index and are served in pages through ``next_offset``.
+
+Results are cached per scope (one counselor, or all) and query for
+``RESULT_TTL`` seconds from the search that produced them. As a query grows
+keystroke by keystroke, it is answered by filtering the cached results of
+its longest cached prefix instead of searching again. Inline mode must be
+enabled for the bot via @BotFather (``/setinline``).
+"""
+
+import logging
+import time
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.ext import ContextTypes
+
+from bot.core import metrics
+from bot.core.case_search import filter_cases
+from bot.core.records import Role, User
+from bot.core.store import BoundedStore
+from .utils import get_firebase_service
+
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 20
+# Seconds a search result is reused, counted from the search itself
+RESULT_TTL = 30
+# Matching cases per (scope, query): (monotonic time searched, cases)
+_results = BoundedStore('inline_results', max_entries=512, ttl_seconds=RESULT_TTL)
+# Roles looked up for inline queries: telegram_id -> shared Role member
+_roles = BoundedStore('inline_roles', max_entries=2048, ttl_seconds=300)
+
+
+def _role(service, user_id: int) -> Role:
+    role = _roles.get(user_id)
+    if role is None:
+        profile = service.get_user(user_id)
+        role = User.from_doc(profile).role if profile else Role.USER
+        _roles[user_id] = role
+    return role
+
+
+def _cached(key: str):
+    entry = _results.get(key)
+    # The store's TTL is idle time; results also age out while in use
+    if entry is not None and time.monotonic() - entry[0] < RESULT_TTL:
+        return entry
+    return None
+
+
+def _search(service, query: str, counselor_id):
+    scope = counselor_id or '*'
+    entry = _cached(f"{scope}:{query}")
+    if entry is not None:
+        return entry[1]
+    # Narrow the longest cached prefix; the empty query (every case) is not
+    # worth scanning, the index answers faster
+    for end in range(len(query) - 1, 0, -1):
+        entry = _cached(f"{scope}:{query[:end]}")
+        if entry is not None:
+            metrics.incr("inline.prefix_hits")
+            cases = filter_cases(entry[1], query)
+            # Keep the prefix's search time so narrowing never extends freshness
+            _results[f"{scope}:{query}"] = (entry[0], cases)
+            return cases
+    metrics.incr("inline.cache_misses")
+    with metrics.timed("inline.search"):
+        searched_at = time.monotonic()
+        cases = service.search_open_cases(query, counselor_id)
+    _results[f"{scope}:{query}"] = (searched_at, cases)
+    return cases
+
+
+def _article(case: dict, counselor: bool) -> InlineQueryResultArticle:
+    short_id = case['id'][:12]
+    alias = case.get('alias')
+    problem = (case.get('problem') or '').replace('\n', ' ')
+    title = f"{short_id} · {alias}" if alias else short_id
+    # The chosen result is posted into whatever chat the query was typed in,
+    # possibly a group: send the id only; the problem stays in the picker
+    if counselor:
+        # Sent into the bot chat, this selects the case for replies
+        text = f"/switch {short_id}"
+    else:
+        text = f"Case {short_id}"
+    return InlineQueryResultArticle(
+        id=case['id'],
+        title=f"{title} [{case.get('status')}]",
+        description=problem[:100],
+        input_message_content=InputTextMessageContent(text),
+    )
+
+
+async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    inline_query = update.inline_query
+    service = get_firebase_service()
+    user_id = inline_query.from_user.id
+    try:
+        role = _role(service, user_id)
+        if role not in (Role.COUNSELOR, Role.LEADER, Role.ADMIN):
+            await inline_query.answer([], cache_time=60, is_personal=True)
+            return
+        counselor_id = str(user_id) if role is Role.COUNSELOR else None
+        cases = _search(service, inline_query.query.strip(), counselor_id)
+        offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+        page = cases[offset:offset + PAGE_SIZE]
+        next_offset = str(offset + PAGE_SIZE) if offset + PAGE_SIZE < len(cases) else ''
+        await inline_query.answer(
+            [_article(c, role is Role.COUNSELOR) for c in page],
+            next_offset=next_offset,
+            cache_time=5,
+            is_personal=True,
+        )
+        metrics.incr("inline.queries")
+    except Exception as e:
+        logger.error(f"Error answering inline query: {e}")
@@ -0,0 +1,132 @@
+"""Relay of media messages (photos, voice notes, documents, ...).
+
+Media is copied with ``copy_message`` so Telegram moves the file by
+``file_id``; nothing is downloaded into this process. ``copy_message`` also
+drops the "Forwarded from" header, keeping both sides anonymous exactly like
+the text relay in ``messages``. The case log stores only type, file_id and
+size.
+"""
+
+import logging
+from typing import Optional
+
+from telegram import Message, Update
+from telegram.ext import ContextTypes, filters
+
+from bot.core import metrics
+from .utils import get_firebase_service, build_case_tag
+from .router import LazyProfile
+from .messages import counselor_target_case, user_target_case
+
+
+logger = logging.getLogger(__name__)
+
+
+MEDIA_FILTER = (
+    filters.PHOTO
+    | filters.VIDEO
+    | filters.VOICE
+    | filters.AUDIO
+    | filters.VIDEO_NOTE
+    | filters.ANIMATION
+    | filters.Document.ALL
+    | filters.Sticker.ALL
+)
+
+# Message types that cannot carry a caption; a short text header is sent instead
+_CAPTIONLESS = {'sticker', 'video_note'}
+
+
+def media_metadata(message: Message) -> Optional[dict]:
+    """Lightweight description of the media in ``message`` for the case log."""
+    if message.photo:
+        kind, media = 'photo', message.photo[-1]  # largest size
+    else:
+        kind, media = next(
+            (
+                (name, getattr(message, name))
+                for name in ('animation', 'video', 'voice', 'audio', 'video_note', 'document', 'sticker')
+                if getattr(message, name, None)
+            ),
+            (None, None),
+        )
+    if media is None:
+        return None
+    return {
+        'type': kind,
+        'file_id': media.file_id,
+        'size': getattr(media, 'file_size', None),
+    }
+
+
+async def handle_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Relay a media message between a user and their counselor."""
+    message = update.message
+    if not message:
+        return
+    meta = media_metadata(message)
+    if meta is None:
+        return
+
+    user = update.effective_user
+    service = get_firebase_service()
+    profile = LazyProfile(service, user.id)
+    metrics.incr(f"media.{meta['type']}")
+
+    with metrics.timed("router.media"):
+        if profile.role in ['counselor', 'leader']:
+            case = await counselor_target_case(update, service)
+            if case is None:
+                return
+            await _relay(update, context, service, case, meta, 'counselor',
+                         chat_id=int(case['user_telegram_id']),
+                         header="👥 Counselor")
+        else:
+            case = await user_target_case(update, service)
+            if case is None:
+                return
+            counselor_id = case['assigned_counselor_id']
+            await _relay(update, context, service, case, meta, 'user',
+                         chat_id=int(counselor_id),
+                         header=(
+                             f"📩 {meta['type'].replace('_', ' ').capitalize()} from user "
+                             f"{user.first_name or ''} ({user.id})"
+                         ),
+                         tag=build_case_tag(service, counselor_id, case))
+
+
+async def _relay(update, context, service, case, meta, sender_role, chat_id, header, tag=None):
+    message = update.message
+    user = update.effective_user
+    caption = message.caption or ''
+    text = f"{header}: {caption}" if caption else header
+    if tag:
+        text += f"\n\n{tag}"
+
+    # Save metadata only
+    try:
+        service.add_message_to_case(case['id'], {
+            'sender_role': sender_role,
+            'sender_telegram_id': user.id,
+            'message': caption or f"[{meta['type']}]",
+            'media': meta,
+        })
+    except Exception as e:
+        logger.error(f"Error saving {sender_role} media: {e}")
+
+    try:
+        if meta['type'] in _CAPTIONLESS:
+            await context.bot.send_message(chat_id=chat_id, text=text)
+            await context.bot.copy_message(
+                chat_id=chat_id, from_chat_id=message.chat_id, message_id=message.message_id
+            )
+        else:
+            await context.bot.copy_message(
+                chat_id=chat_id,
+                from_chat_id=message.chat_id,
+                message_id=message.message_id,
+                caption=text[:1024],  # Telegram caption limit
+            )
+    except Exception as e:
+        logger.error(f"Error relaying media: {e}")
+        await message.reply_text("Error sending your file. Please try again.")
@@ -1,12 +1,27 @@
 import logging
-from datetime import datetime
 
-from telegram import Update, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from bot.ui.keyboards import build_main_menu, build_counselor_menu
+from bot.core import metrics
+from bot.ui.keyboards import (
+    MAIN_MENU,
+    COUNSELOR_MENU,
+    REMOVE_KEYBOARD,
+    BTN_DISCUSS,
+    BTN_NEW_PROBLEM,
+    BTN_MY_CASES,
+    BTN_SWITCH,
+    BTN_ALL_CASES,
+    BTN_PENDING,
+    BTN_DONE,
+    BTN_BLOCK,
+    BTN_HELP,
+    BTN_SET_NAME,
+)
 from .utils import get_firebase_service, build_case_tag
 from .state import counselor_active_case_selection
+from .router import Router, LazyProfile
 from . import commands as cmd
 from . import admin_features as adm
 
@@ -14,269 +29,261 @@ from . import admin_features as adm
 logger = logging.getLogger(__name__)
 
 
+async def _discuss_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Button: Discuss -> prompt for text."""
+    context.user_data['awaiting_problem_text'] = True
+    await update.message.reply_text(
+        "Hello! 👋 Feel free to share what's on your mind.\n\n"
+        "ሰላም! 👋 ወደ አእምሮህ የሚመጣውን በነጻነት አጋራ።\n\n"
+        "🔒 Remember: Everything you share is **anonymous** and **private**!\n"
+        "🔒 አስታውስ: የምታጋራው ነገር ሁሉ **የተደበቀ** እና **ግላዊ** ነው!",
+        reply_markup=MAIN_MENU,
+        parse_mode='Markdown'
+    )
+
+
+async def _new_problem_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Button: New problem -> prompt for text (for backward compatibility)."""
+    context.user_data['awaiting_problem_text'] = True
+    await update.message.reply_text(
+        "Please describe your problem in one message.", reply_markup=REMOVE_KEYBOARD
+    )
+
+
+async def _set_name_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Button: Set name (counselors) -> next text becomes the alias."""
+    context.user_data['awaiting_alias'] = True
+    await update.message.reply_text("Send the new alias for the current case (or use /setname <case_id> <alias>).", reply_markup=REMOVE_KEYBOARD)
+
+
+# Defensive: route common slash commands in case CommandHandlers miss them
+ROUTER = Router()
+ROUTER.command('switch', cmd.switch_command)
+ROUTER.command('cases', cmd.cases_command)
+ROUTER.command('menu', cmd.menu_command)
+ROUTER.command('end', cmd.end_command)
+ROUTER.command('setname', cmd.setname_command)
+ROUTER.command('rename', cmd.rename_command)
+ROUTER.command('clearname', cmd.clearname_command)
+
+ROUTER.button(BTN_DISCUSS, _discuss_button)
+ROUTER.button(BTN_NEW_PROBLEM, _new_problem_button)
+ROUTER.button(BTN_MY_CASES, cmd.cases_command)
+ROUTER.button(BTN_SWITCH, cmd.switch_command)
+# Admin-only buttons
+ROUTER.button(BTN_ALL_CASES, cmd.admin_list_all_cases_command)
+ROUTER.button(BTN_PENDING, adm.pending_cases_command)
+ROUTER.button(BTN_DONE, cmd.done_case_command)
+ROUTER.button(BTN_BLOCK, cmd.end_command)
+ROUTER.button(BTN_HELP, cmd.help_command)
+ROUTER.button(BTN_SET_NAME, _set_name_button)
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle regular messages - forward to counselor if user has active case."""
     if not update.message or not update.message.text:
         return
 
     text = (update.message.text or '').strip()
-    user = update.effective_user
-    service = get_firebase_service()
-    user_data = service.get_user(user.id)
-
-    # Defensive: route common slash commands in case CommandHandlers miss them
-    if text.startswith('/switch'):
-        parts = text.split(maxsplit=1)
-        context.args = parts[1:].pop(0).split() if len(parts) > 1 else []
-        await cmd.switch_command(update, context)
-        return
-    if text.startswith('/cases'):
-        context.args = []
-        await cmd.cases_command(update, context)
-        return
-    if text.startswith('/menu'):
-        await cmd.menu_command(update, context)
-        return
-    if text.startswith('/end'):
-        await cmd.end_command(update, context)
-        return
-    if text.startswith('/setname'):
-        parts = text.split(maxsplit=1)
-        context.args = parts[1:].pop(0).split() if len(parts) > 1 else []
-        await cmd.setname_command(update, context)
-        return
-    if text.startswith('/rename'):
-        parts = text.split(maxsplit=1)
-        context.args = parts[1:].pop(0).split() if len(parts) > 1 else []
-        await cmd.rename_command(update, context)
-        return
-    if text.startswith('/clearname'):
-        parts = text.split(maxsplit=1)
-        context.args = parts[1:].pop(0).split() if len(parts) > 1 else []
-        await cmd.clearname_command(update, context)
+    if await ROUTER.dispatch(update, context, text):
         return
 
-    # Button: Discuss -> prompt for text
-    if text == "💬 Discuss":
-        context.user_data['awaiting_problem_text'] = True
-        await update.message.reply_text(
-            "Hello! 👋 Feel free to share what's on your mind.\n\n"
-            "ሰላም! 👋 ወደ አእምሮህ የሚመጣውን በነጻነት አጋራ።\n\n"
-            "🔒 Remember: Everything you share is **anonymous** and **private**!\n"
-            "🔒 አስታውስ: የምታጋራው ነገር ሁሉ **የተደበቀ** እና **ግላዊ** ነው!",
-            reply_markup=build_main_menu(),
-            parse_mode='Markdown'
-        )
-        return
-    
-    # Button: New problem -> prompt for text (for backward compatibility)
-    if text == "🆕 New problem":
-        context.user_data['awaiting_problem_text'] = True
-        await update.message.reply_text(
-            "Please describe your problem in one message.", reply_markup=ReplyKeyboardRemove()
-        )
-        return
+    metrics.incr("router.text.calls")
+    with metrics.timed("router.text"):
+        await _handle_text(update, context, text)
+
+
+async def _handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+    """Free text: pending prompts first, then relay between user and counselor."""
+    user = update.effective_user
+    service = get_firebase_service()
+    profile = LazyProfile(service, user.id)
 
     # If awaiting problem description, create the case
     if context.user_data.get('awaiting_problem_text'):
-        problem_text = text
         context.user_data.pop('awaiting_problem_text', None)
-        try:
-            # Check if user is blocked
-            if user_data and user_data.get('blocked'):
-                await update.message.reply_text(
-                    "You have been blocked from creating counseling cases. Please contact an administrator if you need assistance.",
-                    reply_markup=build_main_menu()
-                )
-                return
-            
-            # Reuse logic from /problem without needing args
-            user_cases = service.get_user_cases(user.id)
-            active_cases = [c for c in user_cases if c.get('status') in ['pending', 'assigned', 'active']]
-            existing_case = active_cases[0] if active_cases else None
-            if existing_case:
-                await update.message.reply_text(
-                    "You already have an active case!\n\nTo view your case, tap '📋 My cases'.",
-                    reply_markup=build_main_menu()
-                )
-            else:
-                case_id = service.create_case({
-                    'user_telegram_id': user.id,
-                    'problem': problem_text
-                })
-                # Notify admins/leaders
-                try:
-                    admins = service.get_all_users_by_role('leader') or []
-                    if not admins:
-                        admins = service.get_all_users_by_role('admin') or []
-                    for admin in admins:
-                        try:
-                            kb = InlineKeyboardMarkup(
-                                [[InlineKeyboardButton("Assign", callback_data=f"adm_assign:{case_id}")]]
-                            )
-                            await context.bot.send_message(
-                                chat_id=admin['telegram_id'],
-                                text=(
-                                    f"🆕 New Case `{case_id[:8]}`\n\n{problem_text}\n\n"
-                                    f"Tap Assign to choose a counselor."
-                                ),
-                                parse_mode='Markdown',
-                                reply_markup=kb,
-                            )
-                        except Exception:
-                            pass
-                except Exception as e:
-                    logger.error(f"Error notifying admins: {e}")
-                await update.message.reply_text(
-                    f"Case created!\n\nID: `{case_id[:12]}`\n\nNow just send regular messages - they'll go to your counselor once assigned.",
-                    parse_mode='Markdown',
-                    reply_markup=build_main_menu()
-                )
-        except Exception as e:
-            logger.error(f"Error creating case from button: {e}")
-            await update.message.reply_text("Error creating your case. Please try again.", reply_markup=build_main_menu())
+        await _create_case_from_text(update, context, service, profile, text)
         return
 
-    # Button: My cases
-    if text == "📋 My cases":
-        context.args = []
-        await cmd.cases_command(update, context)
+    # If counselor sent a message while waiting for alias, treat text as alias
+    if context.user_data.get('awaiting_alias'):
+        context.user_data.pop('awaiting_alias', None)
+        await _apply_alias(update, service, profile, text)
         return
 
-    # Button: Switch case
-    if text == "🔀 Switch case":
-        context.args = []
-        await cmd.switch_command(update, context)
+    # If the sender is a counselor/leader, forward to the selected user's chat (no auto-fallback)
+    if profile.role in ['counselor', 'leader']:
+        await _forward_counselor_message(update, context, service, update.message.text)
         return
 
-    # Admin-only buttons
-    if text == "📊 All cases":
-        await cmd.admin_list_all_cases_command(update, context)
-        return
-    if text == "🕓 Pending":
-        await adm.pending_cases_command(update, context)
-        return
+    await _forward_user_message(update, context, service, update.message.text)
 
-    # Button: Done
-    if text == "✅ Done":
-        await cmd.done_case_command(update, context)
-        return
 
-    # Button: Block user
-    if text == "🚫 Block user":
-        await cmd.end_command(update, context)
-        return
+async def _create_case_from_text(update, context, service, profile, problem_text):
+    try:
+        # Check if user is blocked
+        if profile.blocked:
+            await update.message.reply_text(
+                "You have been blocked from creating counseling cases. Please contact an administrator if you need assistance.",
+                reply_markup=MAIN_MENU
+            )
+            return
 
-    # Button: Help
-    if text == "❓ Help":
-        await cmd.help_command(update, context)
-        return
+        user = update.effective_user
+        # Reuse logic from /problem without needing args
+        active_cases = service.get_open_user_cases(user.id)
+        existing_case = active_cases[0] if active_cases else None
+        if existing_case:
+            await update.message.reply_text(
+                "You already have an active case!\n\nTo view your case, tap '📋 My cases'.",
+                reply_markup=MAIN_MENU
+            )
+        else:
+            case_id = service.create_case({
+                'user_telegram_id': user.id,
+                'problem': problem_text
+            })
+            # Notify admins/leaders
+            try:
+                admins = service.get_all_users_by_role('leader') or []
+                if not admins:
+                    admins = service.get_all_users_by_role('admin') or []
+                for admin in admins:
+                    try:
+                        kb = InlineKeyboardMarkup(
+                            [[InlineKeyboardButton("Assign", callback_data=f"adm_assign:{case_id}")]]
+                        )
+                        await context.bot.send_message(
+                            chat_id=admin['telegram_id'],
+                            text=(
+                                f"🆕 New Case `{case_id[:8]}`\n\n{problem_text}\n\n"
+                                f"Tap Assign to choose a counselor."
+                            ),
+                            parse_mode='Markdown',
+                            reply_markup=kb,
+                        )
+                    except Exception:
+                        pass
+            except Exception as e:
+                logger.error(f"Error notifying admins: {e}")
+            await update.message.reply_text(
+                f"Case created!\n\nID: `{case_id[:12]}`\n\nNow just send regular messages - they'll go to your counselor once assigned.",
+                parse_mode='Markdown',
+                reply_markup=MAIN_MENU
+            )
+    except Exception as e:
+        logger.error(f"Error creating case from button: {e}")
+        await update.message.reply_text("Error creating your case. Please try again.", reply_markup=MAIN_MENU)
 
-    # Button: Set name (counselors)
-    if text == "📝 Set name":
-        context.user_data['awaiting_alias'] = True
-        await update.message.reply_text("Send the new alias for the current case (or use /setname <case_id> <alias>).", reply_markup=ReplyKeyboardRemove())
+
+async def _apply_alias(update, service, profile, text):
+    user = update.effective_user
+    # Apply alias to current selected case
+    selected_case_id = counselor_active_case_selection.get(user.id)
+    if not selected_case_id:
+        await update.message.reply_text("No current case selected. Use /switch or /setname <case_id> <alias>.", reply_markup=COUNSELOR_MENU if profile.role in ['counselor', 'leader'] else MAIN_MENU)
         return
+    service.update_case(selected_case_id, {'alias': text})
+    await update.message.reply_text(f"Alias set for case {selected_case_id[:8]}: [{text}]", reply_markup=COUNSELOR_MENU)
 
-    # If the sender is a counselor/leader, forward to the selected user's chat (no auto-fallback)
-    role = user_data.get('role') if user_data else None
-    if role in ['counselor', 'leader']:
-        try:
-            target_case = None
-            selected_case_id = counselor_active_case_selection.get(user.id)
-            if selected_case_id:
-                fetched_case = service.get_case(selected_case_id)
-                if fetched_case and str(fetched_case.get('assigned_counselor_id')) == str(user.id) and fetched_case.get('status') in ['assigned', 'active']:
-                    target_case = fetched_case
-                else:
-                    counselor_active_case_selection.pop(user.id, None)
-
-            if target_case is None:
-                # Show counselor menu (avoid 'New problem' for counselors)
-                await update.message.reply_text(
-                    "You have no current case selected. Use /switch to choose one.",
-                    reply_markup=build_counselor_menu()
-                )
-                return
-            message_text = update.message.text
 
-            # Save message
-            try:
-                service.add_message_to_case(target_case['id'], {
-                    'sender_role': 'counselor',
-                    'sender_telegram_id': user.id,
-                    'message': message_text
-                })
-            except Exception as e:
-                logger.error(f"Error saving counselor message: {e}")
+async def counselor_target_case(update, service):
+    """Return the counselor's currently selected case, or None after telling them to /switch."""
+    user = update.effective_user
+    target_case = None
+    selected_case_id = counselor_active_case_selection.get(user.id)
+    if selected_case_id:
+        fetched_case = service.get_case(selected_case_id)
+        if fetched_case and str(fetched_case.get('assigned_counselor_id')) == str(user.id) and fetched_case.get('status') in ['assigned', 'active']:
+            target_case = fetched_case
+        else:
+            counselor_active_case_selection.pop(user.id, None)
 
-            # Forward to the user
-            try:
-                # Send clean message to the user (no case tag)
-                await context.bot.send_message(
-                    chat_id=int(target_case['user_telegram_id']),
-                    text=f"👥 Counselor: {message_text}"
-                )
-                # Add a small inline-style tag right under counselor's own message
-                try:
-                    await update.message.reply_text(
-                        f"_{build_case_tag(service, user.id, target_case)}_",
-                        parse_mode='Markdown'
-                    )
-                except Exception:
-                    pass
-            except Exception as e:
-                logger.error(f"Error forwarding to user: {e}")
-                await update.message.reply_text("Error sending message to user.")
-            return
-        except Exception as e:
-            logger.error(f"Counselor reply flow error: {e}")
-            await update.message.reply_text("Error handling your message. Please try again.")
-            return
+    if target_case is None:
+        # Show counselor menu (avoid 'New problem' for counselors)
+        await update.message.reply_text(
+            "You have no current case selected. Use /switch to choose one.",
+            reply_markup=COUNSELOR_MENU
+        )
+    return target_case
 
-    # If counselor sent a message while waiting for alias, treat text as alias
-    if context.user_data.get('awaiting_alias'):
-        context.user_data.pop('awaiting_alias', None)
-        # Apply alias to current selected case
-        selected_case_id = counselor_active_case_selection.get(user.id)
-        if not selected_case_id:
-            await update.message.reply_text("No current case selected. Use /switch or /setname <case_id> <alias>.", reply_markup=build_counselor_menu() if (user_data and user_data.get('role') in ['counselor','leader']) else build_main_menu())
-            return
-        service.db.collection('cases').document(selected_case_id).update({
-            'alias': text,
-            'updated_at': datetime.now().isoformat()
-        })
-        await update.message.reply_text(f"Alias set for case {selected_case_id[:8]}: [{text}]", reply_markup=build_counselor_menu())
-        return
 
+async def user_target_case(update, service):
+    """Return the user's open case if a counselor is assigned, else None after explaining why."""
+    user = update.effective_user
     # Check if user has an active case
-    user_cases = service.get_user_cases(user.id)
-    case = user_cases[0] if user_cases and any(c.get('status') in ['pending', 'assigned', 'active'] for c in user_cases) else None
+    open_cases = service.get_open_user_cases(user.id)
+    case = open_cases[0] if open_cases else None
 
     if not case:
         # No case - suggest button
         await update.message.reply_text(
             "Tap '💬 Discuss' below to start a conversation, or use `/discuss <your message>`.",
             parse_mode='Markdown',
-            reply_markup=build_main_menu()
+            reply_markup=MAIN_MENU
         )
-        return
+        return None
 
     # Check if case has a counselor assigned
-    counselor_id = case.get('assigned_counselor_id')
-
-    if not counselor_id:
+    if not case.get('assigned_counselor_id'):
         # No counselor assigned yet
         await update.message.reply_text(
             "Your case is waiting for a counselor to be assigned. Please wait.",
             parse_mode='Markdown',
-            reply_markup=build_main_menu()
+            reply_markup=MAIN_MENU
         )
+        return None
+    return case
+
+
+async def _forward_counselor_message(update, context, service, message_text):
+    user = update.effective_user
+    try:
+        target_case = await counselor_target_case(update, service)
+        if target_case is None:
+            return
+
+        # Save message
+        try:
+            service.add_message_to_case(target_case['id'], {
+                'sender_role': 'counselor',
+                'sender_telegram_id': user.id,
+                'message': message_text
+            })
+        except Exception as e:
+            logger.error(f"Error saving counselor message: {e}")
+
+        # Forward to the user
+        try:
+            # Send clean message to the user (no case tag)
+            await context.bot.send_message(
+                chat_id=int(target_case['user_telegram_id']),
+                text=f"👥 Counselor: {message_text}"
+            )
+            # Add a small inline-style tag right under counselor's own message
+            try:
+                await update.message.reply_text(
+                    f"_{build_case_tag(service, user.id, target_case)}_",
+                    parse_mode='Markdown'
+                )
+            except Exception:
+                pass
+        except Exception as e:
+            logger.error(f"Error forwarding to user: {e}")
+            await update.message.reply_text("Error sending message to user.")
+    except Exception as e:
+        logger.error(f"Counselor reply flow error: {e}")
+        await update.message.reply_text("Error handling your message. Please try again.")
+
+
+async def _forward_user_message(update, context, service, message_text):
+    user = update.effective_user
+    case = await user_target_case(update, service)
+    if case is None:
         return
+    counselor_id = case['assigned_counselor_id']
 
     # Save message to case
-    message_text = update.message.text
-
     try:
         service.add_message_to_case(case['id'], {
             'sender_role': 'user',
@@ -299,5 +306,3 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         logger.error(f"Error forwarding message: {e}")
         await update.message.reply_text("Error sending message. Please try again.")
-
-
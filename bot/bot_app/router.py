@@ -0,0 +1,106 @@
+"""Table-driven routing for plain-text messages.
+
+Button labels resolve through one dict lookup; slash commands through a
+prefix table keyed by command name. Every routed call is timed under
+``router.<route>`` in ``bot.core.metrics``.
+"""
+
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from bot.core import metrics
+from bot.core.records import User
+
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]
+
+
+class LazyProfile:
+    """The sender's Firestore user document as a ``User`` record, fetched on first access only."""
+
+    __slots__ = ('_service', '_user_id', '_user', '_loaded')
+
+    def __init__(self, service, user_id: int):
+        self._service = service
+        self._user_id = user_id
+        self._user = None
+        self._loaded = False
+
+    def get(self) -> Optional[User]:
+        if not self._loaded:
+            doc = self._service.get_user(self._user_id)
+            self._user = User.from_doc(doc) if doc else None
+            self._loaded = True
+        return self._user
+
+    @property
+    def role(self) -> Optional[str]:
+        user = self.get()
+        return user.role.value if user else None
+
+    @property
+    def blocked(self) -> bool:
+        user = self.get()
+        return bool(user and user.blocked)
+
+
+class Router:
+    """Compiled dispatch table for button labels and slash commands."""
+
+    def __init__(self):
+        self._buttons: Dict[str, Tuple[str, Handler]] = {}
+        self._commands: Dict[str, Tuple[str, Handler]] = {}
+        self._max_command_len = 0
+
+    def button(self, label: str, handler: Handler, name: Optional[str] = None) -> None:
+        self._buttons[label] = (name or handler.__name__, handler)
+
+    def command(self, command: str, handler: Handler) -> None:
+        self._commands[command] = (command, handler)
+        self._max_command_len = max(self._max_command_len, len(command))
+
+    def resolve(self, text: str) -> Optional[Tuple[str, Handler, Optional[list]]]:
+        """Return ``(route, handler, args)`` for ``text`` or None.
+
+        ``args`` is None for buttons and the whitespace-split remainder for
+        commands. Commands match on the name before any ``@botname`` suffix,
+        falling back to the longest registered prefix (``/switch2`` routes to
+        ``switch``), so lookup cost is bounded by the longest command name.
+        """
+        hit = self._buttons.get(text)
+        if hit is not None:
+            return hit[0], hit[1], None
+        if not text.startswith('/'):
+            return None
+
+        parts = text[1:].split(None, 1)
+        if not parts:
+            return None
+        name = parts[0].split('@', 1)[0]
+        rest = parts[1] if len(parts) > 1 else ''
+        hit = self._commands.get(name)
+        if hit is None:
+            for n in range(min(len(name) - 1, self._max_command_len), 0, -1):
+                hit = self._commands.get(name[:n])
+                if hit is not None:
+                    break
+        if hit is None:
+            return None
+        return hit[0], hit[1], rest.split()
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> bool:
+        """Run the handler for ``text``. Returns False when nothing matched."""
+        resolved = self.resolve(text)
+        if resolved is None:
+            return False
+        route, handler, args = resolved
+        context.args = args if args is not None else []
+        metrics.incr(f"router.{route}.calls")
+        with metrics.timed(f"router.{route}"):
+            await handler(update, context)
+        return True
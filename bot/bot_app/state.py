@@ -1,6 +1,93 @@
-"""Shared in-memory state for the bot runtime."""
+"""Shared in-memory state for the bot runtime.
+
+Per-user state is bounded: entries idle for longer than
+``BOT_STATE_TTL_SECONDS`` or beyond ``BOT_STATE_MAX_ENTRIES`` (least recently
+used first) are dropped. Set ``BOT_STATE_DIR`` to keep it across restarts.
+"""
+
+import time
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+from bot.core import metrics
+from bot.core.store import BoundedStore, deep_sizeof
+
+
+_MAX_ENTRIES = getattr(settings, 'BOT_STATE_MAX_ENTRIES', 10000)
+_TTL_SECONDS = getattr(settings, 'BOT_STATE_TTL_SECONDS', 6 * 3600)
+_SWEEP_INTERVAL = 60
+
+
+def state_dir() -> Optional[Path]:
+    """Directory for persisted bot state, or None when persistence is off."""
+    value = getattr(settings, 'BOT_STATE_DIR', '')
+    return Path(value) if value else None
+
+
+def _persist_path(name: str) -> Optional[Path]:
+    base = state_dir()
+    return base / f"{name}.json" if base else None
+
 
 # Active case selection per counselor: telegram_id -> case_id
-counselor_active_case_selection = {}
+counselor_active_case_selection = BoundedStore(
+    'counselor_selection',
+    max_entries=_MAX_ENTRIES,
+    ttl_seconds=_TTL_SECONDS,
+    persist_path=_persist_path('counselor_selection'),
+)
+
+# Last activity per user: telegram_id -> chat_id. Evicting an entry drops the
+# user's PTB user_data/chat_data (awaiting_problem_text, awaiting_alias, ...).
+conversations = BoundedStore(
+    'conversations',
+    max_entries=_MAX_ENTRIES,
+    ttl_seconds=_TTL_SECONDS,
+    persist_path=_persist_path('conversations'),
+)
+
+_application = None
+_last_sweep = 0.0
+
+
+def bind_application(application) -> None:
+    """Attach the PTB application so evictions can drop its per-user dicts."""
+    global _application
+    _application = application
+    conversations.on_evict = _drop_conversation
+    metrics.gauge('ptb.user_data.entries', lambda: len(application.user_data))
+    metrics.gauge('ptb.user_data.bytes', lambda: deep_sizeof(dict(application.user_data)))
+    metrics.gauge('ptb.chat_data.entries', lambda: len(application.chat_data))
+    metrics.gauge('ptb.chat_data.bytes', lambda: deep_sizeof(dict(application.chat_data)))
+
+
+def _drop_conversation(user_id, chat_id) -> None:
+    if _application is None:
+        return
+    _application.drop_user_data(user_id)
+    if chat_id is not None:
+        _application.drop_chat_data(chat_id)
+
+
+async def track_activity(update, context) -> None:
+    """Record activity for the update's user; runs before all other handlers."""
+    global _last_sweep
+    user = update.effective_user
+    if user is None:
+        return
+    chat = update.effective_chat
+    conversations[user.id] = chat.id if chat else None
+
+    now = time.monotonic()
+    if now - _last_sweep >= _SWEEP_INTERVAL:
+        _last_sweep = now
+        conversations.sweep()
+        counselor_active_case_selection.sweep()
 
 
+def save_state() -> None:
+    """Persist bounded stores (no-op unless BOT_STATE_DIR is set)."""
+    counselor_active_case_selection.save()
+    conversations.save()
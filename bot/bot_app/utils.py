@@ -1,5 +1,7 @@
 import logging
 
+from bot.core.firebase import get_service as get_firebase_service  # noqa: F401 (used by the handler modules)
+
 logger = logging.getLogger(__name__)
 
 
@@ -44,18 +46,6 @@ def apply_ptb_py313_patch() -> None:
         logger.warning(f"Skipping PTB compatibility patch: {e}")
 
 
-def get_firebase_service():
-    """Lazy import to get the Firebase service singleton."""
-    try:
-        from bot.firebase_service import get_firebase_service as get_fb_service
-        return get_fb_service()
-    except Exception as e:
-        logger.error(f"Firebase initialization error: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
-
-
 def build_case_label(service, counselor_id, case_dict):
     """Return a stable, human-friendly label for a case.
 
@@ -75,7 +65,7 @@ def build_case_tag(service, counselor_id, case_dict):
     (newest first). Falls back to a short id prefix if not found.
     """
     try:
-        cases = service.get_counselor_cases(str(counselor_id)) or []
+        cases = service.get_open_counselor_cases(str(counselor_id)) or []
         active = [c for c in cases if c.get('status') in ['assigned', 'active']]
         # Storage/creation order (oldest first)
         try:
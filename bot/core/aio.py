@@ -0,0 +1,96 @@
+"""Helpers for async Django views that call the (blocking) Firestore client.
+
+Django 4.2's ``csrf_exempt``, ``require_http_methods`` and
+``login_required`` wrap views in sync functions, which would make Django
+run an async view as a sync one; the ``async_*`` decorators here are the
+async-aware equivalents.
+
+``run_sync`` / ``gather`` run blocking calls in worker threads, at most
+``FIRESTORE_CONCURRENCY`` at a time per event loop, so independent reads
+overlap instead of queueing one after another.
+"""
+
+import asyncio
+import functools
+import weakref
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseNotAllowed
+
+from . import metrics
+
+
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        sem = _semaphores[loop] = asyncio.Semaphore(getattr(settings, 'FIRESTORE_CONCURRENCY', 8))
+    return sem
+
+
+async def run_sync(fn, *args, **kwargs):
+    """Run blocking ``fn`` in a worker thread under the concurrency limit."""
+    async with _semaphore():
+        return await sync_to_async(fn, thread_sensitive=False)(*args, **kwargs)
+
+
+async def gather(*calls):
+    """Run ``(fn, *args)`` tuples concurrently; results in the same order."""
+    with metrics.timed("aio.gather"):
+        return await asyncio.gather(*(run_sync(fn, *args) for fn, *args in calls))
+
+
+def is_asgi(request) -> bool:
+    """True when ``request`` is served over ASGI.
+
+    Django 4.2 reads a sync ``StreamingHttpResponse`` iterator to the end
+    before an ASGI server sends anything, so streams need an async iterator
+    there.
+    """
+    from django.core.handlers.asgi import ASGIRequest
+    return isinstance(request, ASGIRequest)
+
+
+async def iterate_in_thread(iterator):
+    """Async iterator over blocking ``iterator``, each item produced in a worker thread."""
+    step = sync_to_async(next, thread_sensitive=False)
+    done = object()
+    while True:
+        item = await step(iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+def async_csrf_exempt(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await view(request, *args, **kwargs)
+    wrapper.csrf_exempt = True
+    return markcoroutinefunction(wrapper)
+
+
+def async_require_http_methods(methods):
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+        return markcoroutinefunction(wrapper)
+    return decorator
+
+
+def async_login_required(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # request.user loads the session from the database: keep it off the loop
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return markcoroutinefunction(wrapper)
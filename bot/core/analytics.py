@@ -0,0 +1,179 @@
+"""Counselor workload and response-time analytics.
+
+Cases and their ``messages`` arrays are flattened into pandas columns once,
+then every metric is a vectorized pass over those columns:
+
+- first response: first counselor message minus case ``created_at``
+- reply latency: each counselor reply minus the first message of the user
+  turn it answers (consecutive user messages form one turn)
+- time to assignment: ``assigned_at`` minus ``created_at`` (cases assigned
+  before ``assigned_at`` was recorded are skipped)
+- load: cases per counselor, open cases, and new cases per week
+
+Results are cached per window (see ``report``). numpy and pandas are
+optional; without them ``available()`` is False.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+    pd = None
+
+from . import metrics
+from .store import BoundedStore
+
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 95)
+
+# Reports per (source, window); the window end is rounded to CACHE_SECONDS
+CACHE_SECONDS = 300
+_cache = BoundedStore('analytics_reports', max_entries=64, ttl_seconds=CACHE_SECONDS)
+
+
+def available() -> bool:
+    return pd is not None
+
+
+def frames(cases: Iterable[dict]):
+    """Columnar ``(cases, messages)`` DataFrames with parsed timestamps."""
+    case_rows = []
+    message_rows = []
+    for case in cases:
+        case_id = case.get('id')
+        counselor = case.get('assigned_counselor_id')
+        case_rows.append((
+            case_id,
+            str(counselor) if counselor is not None else None,
+            case.get('status'),
+            case.get('created_at'),
+            case.get('assigned_at'),
+        ))
+        for position, m in enumerate(case.get('messages') or []):
+            message_rows.append((case_id, position, m.get('sender_role'), m.get('timestamp')))
+    cases_df = pd.DataFrame(case_rows, columns=['case_id', 'counselor_id', 'status', 'created_at', 'assigned_at'])
+    messages_df = pd.DataFrame(message_rows, columns=['case_id', 'position', 'sender_role', 'timestamp'])
+    for df, columns in ((cases_df, ['created_at', 'assigned_at']), (messages_df, ['timestamp'])):
+        for column in columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce', format='ISO8601')
+    return cases_df, messages_df
+
+
+def _summary(seconds) -> dict:
+    """Count, mean and percentiles (in seconds) of a numeric Series/array."""
+    values = np.asarray(seconds, dtype='float64')
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {'count': 0}
+    pcts = np.percentile(values, PERCENTILES)
+    out = {'count': int(len(values)), 'mean': round(float(values.mean()), 1)}
+    out.update({f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, pcts)})
+    return out
+
+
+def reply_latencies(cases_df, messages_df):
+    """Seconds from the start of each user turn to the counselor's reply.
+
+    Returns a DataFrame with ``case_id``, ``counselor_id``, ``timestamp`` and
+    ``latency`` (one row per answered turn).
+    """
+    m = messages_df.sort_values(['case_id', 'position'])
+    is_user = m['sender_role'].eq('user')
+    prev_role = m.groupby('case_id')['sender_role'].shift()
+    # First message of each user turn carries its timestamp; later ones inherit it
+    turn_start = m['timestamp'].where(is_user & prev_role.ne('user'))
+    turn_start = turn_start.groupby(m['case_id']).ffill()
+    replies = m[m['sender_role'].eq('counselor') & prev_role.eq('user')].copy()
+    replies['latency'] = (replies['timestamp'] - turn_start[replies.index]).dt.total_seconds()
+    replies = replies.merge(cases_df[['case_id', 'counselor_id']], on='case_id', how='left')
+    return replies[['case_id', 'counselor_id', 'timestamp', 'latency']]
+
+
+def compute(cases: Iterable[dict]) -> dict:
+    """All analytics for ``cases`` (dicts with ``messages``)."""
+    with metrics.timed("analytics.compute"):
+        cases_df, messages_df = frames(cases)
+
+        counselor_msgs = messages_df[messages_df['sender_role'].eq('counselor')]
+        first_reply = counselor_msgs.groupby('case_id')['timestamp'].min()
+        created = cases_df.set_index('case_id')['created_at']
+        first_response = (first_reply - created.reindex(first_reply.index)).dt.total_seconds()
+
+        to_assignment = (cases_df['assigned_at'] - cases_df['created_at']).dt.total_seconds()
+
+        replies = reply_latencies(cases_df, messages_df)
+
+        assigned = cases_df[cases_df['counselor_id'].notna()]
+        open_mask = assigned['status'].isin(['assigned', 'active'])
+        load = pd.DataFrame({
+            'cases': assigned.groupby('counselor_id').size(),
+            'open_cases': assigned[open_mask].groupby('counselor_id').size(),
+        }).fillna(0).astype(int)
+
+        counselors = {}
+        latency_groups = replies.dropna(subset=['counselor_id']).groupby('counselor_id')['latency']
+        for counselor_id, row in load.iterrows():
+            counselors[counselor_id] = {
+                'cases': int(row['cases']),
+                'open_cases': int(row['open_cases']),
+                'reply_latency': {'count': 0},
+            }
+        for counselor_id, latencies in latency_groups:
+            counselors.setdefault(counselor_id, {'cases': 0, 'open_cases': 0})
+            counselors[counselor_id]['reply_latency'] = _summary(latencies)
+
+        weekly = (
+            assigned.dropna(subset=['created_at'])
+            .assign(week=lambda d: d['created_at'].dt.to_period('W').dt.start_time.dt.date.astype(str))
+            .groupby(['week', 'counselor_id']).size()
+        )
+        cases_per_week = {}
+        for (week, counselor_id), n in weekly.items():
+            cases_per_week.setdefault(week, {})[counselor_id] = int(n)
+
+        return {
+            'cases': int(len(cases_df)),
+            'messages': int(len(messages_df)),
+            'first_response_seconds': _summary(first_response),
+            'reply_latency_seconds': _summary(replies['latency']),
+            'time_to_assignment_seconds': _summary(to_assignment),
+            'counselors': counselors,
+            'cases_per_week': cases_per_week,
+        }
+
+
+def window(days: Optional[int] = None, since: Optional[str] = None, until: Optional[str] = None):
+    """``(start, end)`` ISO strings for a report; the end is rounded up to
+    ``CACHE_SECONDS`` so requests within that interval share a cache entry.
+    """
+    now = datetime.now()
+    end = datetime.fromisoformat(until) if until else now
+    if not until:
+        step = CACHE_SECONDS
+        end = datetime.fromtimestamp((int(end.timestamp()) // step + 1) * step)
+    if since:
+        start = datetime.fromisoformat(since)
+    else:
+        start = end - timedelta(days=days or 30)
+    return start.isoformat(), end.isoformat()
+
+
+def report(load_cases, start: str, end: str, source: str = 'firestore') -> dict:
+    """Cached analytics for cases created in ``[start, end)``.
+
+    ``load_cases(start, end)`` returns the case dicts (with messages).
+    """
+    key = f"{source}:{start}:{end}"
+    result = _cache.get(key)
+    if result is None:
+        metrics.incr("analytics.cache_misses")
+        result = {'window': {'start': start, 'end': end}, 'source': source, **compute(load_cases(start, end))}
+        _cache[key] = result
+    return result
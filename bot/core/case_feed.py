@@ -0,0 +1,297 @@
+"""Shared change feed of all cases for admin dashboards (server-sent events).
+
+One pair of Firestore ``on_snapshot`` listeners per web process (``cases``
+and ``users``) keeps every case in memory, with ``user_info`` and
+``counselor_info`` resolved from the users map instead of per-case reads.
+Each change is numbered and kept in a short ring buffer; every connected
+dashboard streams from that buffer, so Firestore load does not grow with
+the number of open tabs.
+
+Stream protocol (``text/event-stream``):
+
+- ``snapshot``: ``{"cases": [...]}`` with every case, sent on connect and
+  whenever a client fell too far behind to replay
+- ``upsert``: one case (added or changed)
+- ``remove``: ``{"id": ...}``
+
+Event ids are ``<feed epoch>-<sequence number>``, so a reconnecting
+``EventSource`` resumes from ``Last-Event-ID`` (or gets a snapshot if the
+process restarted in between). Cases carry ``message_count`` instead of
+``messages``.
+"""
+
+import json
+import logging
+import threading
+import uuid
+from collections import deque
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+BUFFER_SIZE = 1000
+HEARTBEAT_SECONDS = 15
+
+
+class CaseFeed:
+    """In-memory case map plus numbered change events, fed by listeners."""
+
+    def __init__(self, db, health_interval: float = 15.0):
+        self.db = db
+        self.health_interval = health_interval
+        self._cond = threading.Condition()
+        self._cases: Dict[str, dict] = {}
+        self._users: Dict[str, dict] = {}
+        self._events = deque(maxlen=BUFFER_SIZE)  # (seq, event, payload)
+        self._seq = 0
+        self._epoch = uuid.uuid4().hex[:8]
+        self._watches = {}
+        self._synced = set()
+        self._subscribers = 0
+        # (loop, asyncio.Event) of each waiting ``astream`` client
+        self._waiters = set()
+        self._stop = threading.Event()
+        metrics.gauge("case_feed.subscribers", lambda: self._subscribers)
+        metrics.gauge("case_feed.cases", lambda: len(self._cases))
+
+    # Lifecycle ----------------------------------------------------------
+
+    @property
+    def ready(self) -> bool:
+        return self._synced >= {'cases', 'users'}
+
+    def start(self) -> None:
+        self._subscribe('users')
+        self._subscribe('cases')
+        threading.Thread(target=self._watchdog, name='case-feed-monitor', daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        for collection in list(self._watches):
+            self._unsubscribe(collection)
+        with self._cond:
+            self._notify()
+
+    def _subscribe(self, collection: str) -> None:
+        self._synced.discard(collection)
+        handler = self._on_users if collection == 'users' else self._on_cases
+        self._watches[collection] = self.db.collection(collection).on_snapshot(handler)
+
+    def _unsubscribe(self, collection: str) -> None:
+        watch = self._watches.pop(collection, None)
+        self._synced.discard(collection)
+        if watch is not None:
+            try:
+                watch.unsubscribe()
+            except Exception:
+                pass
+
+    def _watchdog(self) -> None:
+        while not self._stop.wait(self.health_interval):
+            for collection in ('users', 'cases'):
+                watch = self._watches.get(collection)
+                if watch is not None and getattr(watch, 'is_active', True):
+                    continue
+                logger.warning(f"Case feed {collection} listener inactive; resubscribing")
+                self._unsubscribe(collection)
+                try:
+                    self._subscribe(collection)
+                except Exception as e:
+                    logger.error(f"Case feed resubscribe failed: {e}")
+
+    # Snapshot handling ----------------------------------------------------
+
+    def _on_users(self, docs, changes, read_time) -> None:
+        with self._cond:
+            if 'users' not in self._synced:
+                self._users = {doc.id: doc.to_dict() or {} for doc in docs}
+                self._synced.add('users')
+                # Names may have changed while unsubscribed
+                for case_id, case in list(self._cases.items()):
+                    self._put(case_id, case)
+                return
+            touched = set()
+            for change in changes:
+                if change.type.name == 'REMOVED':
+                    self._users.pop(change.document.id, None)
+                else:
+                    self._users[change.document.id] = change.document.to_dict() or {}
+                touched.add(change.document.id)
+            for case_id, case in list(self._cases.items()):
+                if str(case.get('user_telegram_id')) in touched or str(case.get('assigned_counselor_id')) in touched:
+                    self._put(case_id, case)
+
+    def _on_cases(self, docs, changes, read_time) -> None:
+        with self._cond:
+            if 'cases' not in self._synced:
+                # (Re)subscription: diff against what subscribers already have
+                fresh = {doc.id: doc.to_dict() or {} for doc in docs}
+                for case_id in set(self._cases) - set(fresh):
+                    self._remove(case_id)
+                for case_id, data in fresh.items():
+                    self._put(case_id, data)
+                self._synced.add('cases')
+                logger.info(f"Case feed synced: {len(self._cases)} cases")
+                return
+            for change in changes:
+                if change.type.name == 'REMOVED':
+                    self._remove(change.document.id)
+                else:
+                    self._put(change.document.id, change.document.to_dict() or {})
+
+    def _put(self, case_id: str, data: dict) -> None:
+        case = self._summarize(case_id, data)
+        if self._cases.get(case_id) != case:
+            self._cases[case_id] = case
+            self._emit('upsert', case)
+
+    def _remove(self, case_id: str) -> None:
+        if self._cases.pop(case_id, None) is not None:
+            self._emit('remove', {'id': case_id})
+
+    def _emit(self, event: str, payload: dict) -> None:
+        self._seq += 1
+        self._events.append((self._seq, event, payload))
+        metrics.incr("case_feed.events")
+        self._notify()
+
+    def _notify(self) -> None:
+        """Wake every waiting client (call with ``_cond`` held)."""
+        self._cond.notify_all()
+        for loop, event in list(self._waiters):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:  # loop closed
+                self._waiters.discard((loop, event))
+
+    def _summarize(self, case_id: str, data: dict) -> dict:
+        case = {k: v for k, v in data.items() if k not in ('messages', 'user_info', 'counselor_info')}
+        case['id'] = case_id
+        if 'messages' in data:
+            case['message_count'] = len(data.get('messages') or [])
+        user = self._users.get(str(data.get('user_telegram_id')))
+        if user:
+            case['user_info'] = {
+                'first_name': user.get('first_name', 'Unknown'),
+                'username': user.get('username', 'N/A'),
+            }
+        counselor = self._users.get(str(data.get('assigned_counselor_id')))
+        if data.get('assigned_counselor_id') and counselor:
+            case['counselor_info'] = {
+                'first_name': counselor.get('first_name', 'Unknown'),
+                'username': counselor.get('username', 'N/A'),
+            }
+        return case
+
+    # Reads ----------------------------------------------------------------
+
+    def cases(self) -> list:
+        """Every case, newest first (the ``api_cases`` payload)."""
+        with self._cond:
+            cases = list(self._cases.values())
+        return sorted(cases, key=lambda c: c.get('created_at') or '', reverse=True)
+
+    def stream(self, last_event_id: Optional[str] = None,
+               heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+        """SSE text for one client, resuming after ``last_event_id``."""
+        with self._cond:
+            self._subscribers += 1
+        try:
+            yield "retry: 3000\n\n"
+            cursor = self._cursor(last_event_id)
+            while not self._stop.is_set():
+                cursor, chunks = self._next(cursor, heartbeat)
+                yield from chunks
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+    async def astream(self, last_event_id: Optional[str] = None,
+                      heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+        """``stream`` for ASGI servers, which would buffer a sync iterator in full.
+
+        Waits on an ``asyncio.Event`` set by the listener threads, so an
+        idle client holds no thread.
+        """
+        import asyncio
+
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            self._subscribers += 1
+            self._waiters.add(waiter)
+        try:
+            yield "retry: 3000\n\n"
+            cursor = self._cursor(last_event_id)
+            while not self._stop.is_set():
+                waiter[1].clear()
+                cursor, chunks = self._collect(cursor)
+                if not chunks:
+                    try:
+                        await asyncio.wait_for(waiter[1].wait(), heartbeat)
+                        continue
+                    except asyncio.TimeoutError:
+                        chunks = [": ping\n\n"]
+                for chunk in chunks:
+                    yield chunk
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+                self._waiters.discard(waiter)
+
+    def _next(self, cursor: Optional[int], heartbeat: float) -> Tuple[Optional[int], List[str]]:
+        """Wait up to ``heartbeat`` for events after ``cursor``; returns the new cursor and SSE chunks."""
+        with self._cond:
+            if cursor is not None and cursor >= self._seq:
+                self._cond.wait(heartbeat)
+        cursor, chunks = self._collect(cursor)
+        return cursor, chunks or [": ping\n\n"]
+
+    def _collect(self, cursor: Optional[int]) -> Tuple[Optional[int], List[str]]:
+        """Events after ``cursor`` without waiting (no chunks if there are none)."""
+        with self._cond:
+            seq = self._seq
+            oldest = self._events[0][0] if self._events else seq + 1
+            if cursor is None or cursor > seq or cursor + 1 < oldest:
+                # New client, or too far behind to replay: full snapshot
+                events = None
+                snapshot = list(self._cases.values())
+            else:
+                events = [e for e in self._events if e[0] > cursor]
+        if events is None:
+            return seq, [self._format(seq, 'snapshot', {'cases': snapshot})]
+        if not events:
+            return cursor, []
+        return events[-1][0], [self._format(*event) for event in events]
+
+    def _cursor(self, last_event_id: Optional[str]) -> Optional[int]:
+        epoch, _, seq = (last_event_id or '').partition('-')
+        return int(seq) if epoch == self._epoch and seq.isdigit() else None
+
+    def _format(self, seq: int, event: str, payload: dict) -> str:
+        data = json.dumps(payload, default=str)
+        return f"id: {self._epoch}-{seq}\nevent: {event}\ndata: {data}\n\n"
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_case_feed(service) -> CaseFeed:
+    """The process-wide feed, started on first use."""
+    global _feed
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                feed = CaseFeed(service.db)
+                feed.start()
+                _feed = feed
+    return _feed
+
+
+def running_case_feed() -> Optional[CaseFeed]:
+    """The feed if a dashboard stream already started it and it has synced."""
+    feed = _feed
+    return feed if feed is not None and feed.ready else None
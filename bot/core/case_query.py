@@ -0,0 +1,210 @@
+"""Server-side filters and sorting for case listings, with a query planner.
+
+Query parameters (all optional):
+
+- ``status``: one status, or several comma-separated
+- ``counselor_id``: assigned counselor's Telegram id
+- ``user_id``: the case owner's Telegram id
+- ``done``: ``true``/``false`` (Firestore only matches cases that have the
+  field, i.e. ones a counselor marked)
+- ``created_after`` / ``created_before``: ISO timestamps, ``[after, before)``
+- ``sort``: ``created_at``, ``updated_at``, or either with a ``-`` prefix
+  for descending (default ``-created_at``)
+
+Firestore serves a query only from an index: a sort (and the created_at
+range) alone uses the automatic single-field index, but combined with
+equality filters it needs a composite index. ``plan`` checks the request
+against the composite indexes declared in ``firestore.indexes.json``
+(deploy them with ``firebase deploy --only firestore:indexes``) and raises
+``UnindexedQuery`` for anything else, instead of scanning the collection.
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+PARAMS = ('status', 'counselor_id', 'user_id', 'done', 'created_after', 'created_before', 'sort')
+SORT_FIELDS = ('created_at', 'updated_at')
+DEFAULT_SORT = '-created_at'
+
+IndexKey = Tuple[FrozenSet[str], str, bool]
+
+
+class QueryError(ValueError):
+    """Malformed filter or sort parameter."""
+
+
+class UnindexedQuery(QueryError):
+    """The combination has no Firestore index; the message names the one needed."""
+
+
+@dataclass
+class CaseQuery:
+    # document field -> value, or a list of values (``in``)
+    equals: Dict[str, object] = field(default_factory=dict)
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+    sort: str = 'created_at'
+    descending: bool = True
+
+    @property
+    def has_range(self) -> bool:
+        return bool(self.created_after or self.created_before)
+
+
+def _timestamp(name: str, value: str) -> str:
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise QueryError(f"{name} must be an ISO timestamp")
+    return value
+
+
+def from_request(request) -> Optional[CaseQuery]:
+    """The query for ``request``, or None when it has no filter/sort parameters."""
+    params = request.GET
+    if not any(params.get(name) for name in PARAMS):
+        return None
+    query = CaseQuery()
+    if params.get('status'):
+        statuses = [s.strip() for s in params['status'].split(',') if s.strip()]
+        query.equals['status'] = statuses[0] if len(statuses) == 1 else statuses
+    if params.get('counselor_id'):
+        # Both assignment paths (bot command and dashboard) store it as a string
+        query.equals['assigned_counselor_id'] = params['counselor_id'].strip()
+    if params.get('user_id'):
+        try:
+            query.equals['user_telegram_id'] = int(params['user_id'])
+        except ValueError:
+            raise QueryError("user_id must be an integer")
+    if params.get('done'):
+        value = params['done'].lower()
+        if value not in ('1', 'true', '0', 'false'):
+            raise QueryError("done must be true or false")
+        query.equals['done'] = value in ('1', 'true')
+    if params.get('created_after'):
+        query.created_after = _timestamp('created_after', params['created_after'])
+    if params.get('created_before'):
+        query.created_before = _timestamp('created_before', params['created_before'])
+    sort = params.get('sort') or DEFAULT_SORT
+    query.descending = sort.startswith('-')
+    query.sort = sort.lstrip('-')
+    if query.sort not in SORT_FIELDS:
+        raise QueryError(f"sort must be one of {', '.join(SORT_FIELDS)} (prefix - for descending)")
+    return query
+
+
+def load_indexes(path) -> Set[IndexKey]:
+    """Composite ``cases`` indexes as ``(equality fields, sort field, descending)``.
+
+    The last field of each index is the sort field; the ones before it are
+    equality fields.
+    """
+    try:
+        spec = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return set()
+    indexes = set()
+    for index in spec.get('indexes', []):
+        if index.get('collectionGroup') != 'cases' or len(index.get('fields', [])) < 2:
+            continue
+        *equality, last = index['fields']
+        indexes.add((
+            frozenset(f['fieldPath'] for f in equality),
+            last['fieldPath'],
+            last.get('order') == 'DESCENDING',
+        ))
+    return indexes
+
+
+_declared = None
+
+
+def declared_indexes() -> Set[IndexKey]:
+    """Indexes from ``FIRESTORE_INDEXES_PATH``, read once per process."""
+    global _declared
+    if _declared is None:
+        from django.conf import settings
+        _declared = load_indexes(getattr(settings, 'FIRESTORE_INDEXES_PATH', 'firestore.indexes.json'))
+    return _declared
+
+
+def plan(query: CaseQuery, indexes: Optional[Iterable[IndexKey]] = None) -> Optional[IndexKey]:
+    """The composite index that serves ``query`` (None: single-field index).
+
+    Raises ``UnindexedQuery`` if Firestore would need an index that is not
+    declared.
+    """
+    if query.has_range and query.sort != 'created_at':
+        raise UnindexedQuery("created_after/created_before require sort=created_at or sort=-created_at")
+    if not query.equals:
+        return None
+    key = (frozenset(query.equals), query.sort, query.descending)
+    if key in set(declared_indexes() if indexes is None else indexes):
+        return key
+    needed = ', '.join(sorted(query.equals)) + f", {query.sort} {'DESC' if query.descending else 'ASC'}"
+    raise UnindexedQuery(f"No Firestore index for this filter combination (needs cases: {needed})")
+
+
+def firestore_query(collection, query: CaseQuery):
+    """Firestore query for ``query`` on the ``cases`` collection reference."""
+    ref = collection
+    for name, value in query.equals.items():
+        ref = ref.where(name, 'in', value) if isinstance(value, list) else ref.where(name, '==', value)
+    if query.created_after:
+        ref = ref.where('created_at', '>=', query.created_after)
+    if query.created_before:
+        ref = ref.where('created_at', '<', query.created_before)
+    return ref.order_by(query.sort, direction='DESCENDING' if query.descending else 'ASCENDING')
+
+
+def matches(case: dict, query: CaseQuery) -> bool:
+    for name, value in query.equals.items():
+        actual = case.get(name)
+        wanted = value if isinstance(value, list) else [value]
+        if name in ('assigned_counselor_id', 'user_telegram_id'):
+            # Ids may be stored as int or string; compare as strings
+            if str(actual) not in {str(v) for v in wanted}:
+                return False
+        elif name == 'done':
+            if bool(actual) != value:
+                return False
+        elif actual not in wanted:
+            return False
+    created = case.get('created_at') or ''
+    if query.created_after and created < query.created_after:
+        return False
+    if query.created_before and created >= query.created_before:
+        return False
+    return True
+
+
+def apply(cases: Iterable[dict], query: CaseQuery) -> List[dict]:
+    """Filter and sort in-memory cases (the dashboard case feed)."""
+    found = [c for c in cases if matches(c, query)]
+    found.sort(key=lambda c: c.get(query.sort) or '', reverse=query.descending)
+    return found
+
+
+def replica_sql(query: CaseQuery) -> Tuple[str, tuple]:
+    """``WHERE ... ORDER BY ...`` clause and parameters for the replica ``cases`` table."""
+    clauses, params = [], []
+    for name, value in query.equals.items():
+        values = value if isinstance(value, list) else [value]
+        if name == 'assigned_counselor_id':
+            # The replica stores Telegram ids as integers
+            values = [int(v) if str(v).lstrip('-').isdigit() else v for v in values]
+        elif name == 'done':
+            values = [int(v) for v in values]
+        clauses.append(f"{name} IN ({','.join('?' * len(values))})")
+        params.extend(values)
+    if query.created_after:
+        clauses.append("created_at >= ?")
+        params.append(query.created_after)
+    if query.created_before:
+        clauses.append("created_at < ?")
+        params.append(query.created_before)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return f"{where} ORDER BY {query.sort} {'DESC' if query.descending else 'ASC'}", tuple(params)
@@ -0,0 +1,146 @@
+"""In-memory search over open cases by id prefix, alias and problem text.
+
+Words of each case's ``alias`` and ``problem`` are lower-cased into terms
+kept in a ``PrefixIndex``, so a query word matches every term it starts
+(``anx`` finds "anxiety"). A query word also matches case ids starting with
+it. All query words must match; results rank id hits first, then alias
+hits, then newest first.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+from .prefix_index import PrefixIndex
+
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Only the start of long problem descriptions is indexed
+MAX_TERMS_PER_CASE = 64
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [w.lower() for w in _WORD.findall(text or '')]
+
+
+class CaseSearchIndex:
+    """Term index over cases; callers hold their own lock if shared."""
+
+    def __init__(self, cases: Iterable = ()):
+        self._cases: Dict[str, object] = {}
+        self._ids = PrefixIndex()
+        self._terms = PrefixIndex()
+        self._postings: Dict[str, Set[str]] = {}
+        self._alias_terms: Dict[str, Set[str]] = {}
+        for case in cases:
+            self.add(case)
+
+    def __len__(self) -> int:
+        return len(self._cases)
+
+    def add(self, case) -> None:
+        """Index ``case`` (a ``CaseSummary`` or case dict with an ``id``)."""
+        case_id = _field(case, 'id')
+        self.discard(case_id)
+        self._cases[case_id] = case
+        self._ids.add(case_id)
+        alias_terms = set(tokenize(_field(case, 'alias')))
+        terms = set(list(alias_terms) + tokenize(_field(case, 'problem'))[:MAX_TERMS_PER_CASE])
+        self._alias_terms[case_id] = alias_terms
+        for term in terms:
+            ids = self._postings.get(term)
+            if ids is None:
+                ids = self._postings[term] = set()
+                self._terms.add(term)
+            ids.add(case_id)
+
+    def discard(self, case_id: str) -> None:
+        case = self._cases.pop(case_id, None)
+        if case is None:
+            return
+        self._ids.discard(case_id)
+        self._alias_terms.pop(case_id, None)
+        terms = set(tokenize(_field(case, 'alias')) + tokenize(_field(case, 'problem'))[:MAX_TERMS_PER_CASE])
+        for term in terms:
+            ids = self._postings.get(term)
+            if ids is None:
+                continue
+            ids.discard(case_id)
+            if not ids:
+                del self._postings[term]
+                self._terms.discard(term)
+
+    def search(self, query: str, allowed: Optional[Set[str]] = None) -> List:
+        """Cases matching every word of ``query``, best first.
+
+        ``allowed`` restricts results to those case ids (e.g. one
+        counselor's cases). An empty query lists all (allowed) cases.
+        """
+        raw_words = _WORD.findall(query or '')
+        words = [w.lower() for w in raw_words]
+        id_hits: Set[str] = set()
+        if not words:
+            found = set(self._cases)
+        else:
+            found = None
+            for raw, word in zip(raw_words, words):
+                # Case ids are case-sensitive; terms are lower-cased
+                by_id = set(self._ids.matches(raw))
+                id_hits |= by_id
+                matched = set(by_id)
+                for term in self._terms.matches(word):
+                    matched |= self._postings[term]
+                found = matched if found is None else found & matched
+                if not found:
+                    return []
+        if allowed is not None:
+            found &= allowed
+
+        def rank(case_id):
+            return _rank(self._cases[case_id], case_id in id_hits, self._alias_terms.get(case_id, ()), words)
+
+        return [self._cases[i] for i in sorted(found, key=rank)]
+
+
+def filter_cases(cases: Iterable, query: str) -> List:
+    """Those of ``cases`` matching ``query``, ranked as ``CaseSearchIndex.search``.
+
+    Scans instead of indexing: meant for narrowing an earlier, shorter
+    query's results (every match of ``"anxi"`` is among those of ``"anx"``).
+    """
+    raw_words = _WORD.findall(query or '')
+    words = [w.lower() for w in raw_words]
+    ranked = []
+    for case in cases:
+        case_id = _field(case, 'id')
+        alias_terms = set(tokenize(_field(case, 'alias')))
+        terms = alias_terms | set(tokenize(_field(case, 'problem'))[:MAX_TERMS_PER_CASE])
+        id_hit = False
+        for raw, word in zip(raw_words, words):
+            if case_id.startswith(raw):
+                id_hit = True
+            elif not any(t.startswith(word) for t in terms):
+                break
+        else:
+            ranked.append((_rank(case, id_hit, alias_terms, words), case))
+    ranked.sort(key=lambda pair: pair[0])
+    return [case for _, case in ranked]
+
+
+def _rank(case, id_hit: bool, alias_terms, words: List[str]) -> tuple:
+    alias_hit = any(t.startswith(w) for w in words for t in alias_terms)
+    return (not id_hit, not alias_hit, _sort_key(_field(case, 'created_at')))
+
+
+def _field(case, name):
+    if isinstance(case, dict):
+        return case.get(name)
+    return getattr(case, name, None)
+
+
+def _sort_key(created) -> str:
+    """Newest first inside a rank bucket (inverted ISO timestamp)."""
+    if created is None:
+        return '\uffff'
+    text = created if isinstance(created, str) else created.isoformat()
+    return ''.join(chr(0xffff - ord(ch)) for ch in text)
@@ -0,0 +1,191 @@
+"""Realtime in-memory view of open cases.
+
+A Firestore ``on_snapshot`` listener on ``status in [pending, assigned,
+active]`` keeps a local copy of every open case, indexed by user id,
+counselor id, id prefix and search terms. ``FirebaseService`` serves
+routine bot reads from it while it is ``ready`` and falls back to queries
+otherwise.
+
+Cases are stored as compact ``CaseSummary`` records, without their
+``messages`` array; reads return ``CaseSummary.to_dict()`` documents.
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional, Set
+
+from . import metrics
+from .case_search import CaseSearchIndex
+from .prefix_index import PrefixIndex
+from .records import CaseSummary
+
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ('pending', 'assigned', 'active')
+
+
+class OpenCaseView:
+    """Materialized view of open cases fed by a Firestore listener."""
+
+    def __init__(self, db, health_interval: float = 15.0):
+        self.db = db
+        self.health_interval = health_interval
+        self._lock = threading.RLock()
+        self._cases: Dict[str, CaseSummary] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        # Prefix indexes over open case ids: global and per counselor
+        self._ids = PrefixIndex()
+        self._by_counselor: Dict[str, PrefixIndex] = {}
+        self._search = CaseSearchIndex()
+        # Bumped on every change so callers can key caches on it
+        self.version = 0
+        self._watch = None
+        self._synced = False
+        self._stop = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+        metrics.gauge("case_view.open_cases", lambda: len(self._cases))
+        metrics.gauge("case_view.ready", lambda: int(self.ready))
+
+    # Lifecycle ----------------------------------------------------------
+
+    @property
+    def ready(self) -> bool:
+        """True once the current listener delivered its initial snapshot."""
+        watch = self._watch
+        return self._synced and watch is not None and getattr(watch, 'is_active', True)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._subscribe()
+        self._monitor = threading.Thread(target=self._watchdog, name='case-view-monitor', daemon=True)
+        self._monitor.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._unsubscribe()
+
+    def _subscribe(self) -> None:
+        self._synced = False
+        query = self.db.collection('cases').where('status', 'in', list(OPEN_STATUSES))
+        self._watch = query.on_snapshot(self._on_snapshot)
+        metrics.incr("case_view.subscriptions")
+        logger.info("Open-case listener subscribed")
+
+    def _unsubscribe(self) -> None:
+        watch, self._watch = self._watch, None
+        self._synced = False
+        if watch is not None:
+            try:
+                watch.unsubscribe()
+            except Exception:
+                pass
+
+    def _watchdog(self) -> None:
+        """Resubscribe (and therefore fully resync) when the listener dies."""
+        while not self._stop.wait(self.health_interval):
+            watch = self._watch
+            if watch is not None and getattr(watch, 'is_active', True):
+                continue
+            logger.warning("Open-case listener inactive; resubscribing")
+            self._unsubscribe()
+            try:
+                self._subscribe()
+            except Exception as e:
+                logger.error(f"Open-case listener resubscribe failed: {e}")
+
+    # Snapshot handling ----------------------------------------------------
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        with self._lock:
+            if not self._synced:
+                # First snapshot of a (re)subscription: rebuild from scratch
+                self._cases.clear()
+                self._by_user.clear()
+                self._ids = PrefixIndex()
+                self._by_counselor.clear()
+                self._search = CaseSearchIndex()
+                for doc in docs:
+                    self._put(doc.id, doc.to_dict() or {})
+                self._synced = True
+                self.version += 1
+                logger.info(f"Open-case view synced: {len(self._cases)} cases")
+                return
+            for change in changes:
+                doc = change.document
+                if change.type.name == 'REMOVED':
+                    self._remove(doc.id)
+                else:
+                    self._remove(doc.id)
+                    self._put(doc.id, doc.to_dict() or {})
+            self.version += 1
+        metrics.incr("case_view.changes", len(changes))
+
+    def _put(self, case_id: str, data: dict) -> None:
+        case = CaseSummary.from_doc(case_id, data)
+        self._cases[case_id] = case
+        self._by_user.setdefault(str(case.user_telegram_id), set()).add(case_id)
+        self._ids.add(case_id)
+        self._search.add(case)
+        if case.assigned_counselor_id is not None:
+            self._by_counselor.setdefault(str(case.assigned_counselor_id), PrefixIndex()).add(case_id)
+
+    def _remove(self, case_id: str) -> None:
+        case = self._cases.pop(case_id, None)
+        if case is None:
+            return
+        _discard(self._by_user, str(case.user_telegram_id), case_id)
+        self._ids.discard(case_id)
+        self._search.discard(case_id)
+        if case.assigned_counselor_id is not None:
+            _discard(self._by_counselor, str(case.assigned_counselor_id), case_id)
+
+    # Reads ----------------------------------------------------------------
+
+    def get(self, case_id: str) -> Optional[dict]:
+        with self._lock:
+            case = self._cases.get(case_id)
+            return case.to_dict() if case else None
+
+    def by_user(self, telegram_id) -> List[dict]:
+        with self._lock:
+            return [self._cases[i].to_dict() for i in self._by_user.get(str(telegram_id), ())]
+
+    def by_counselor(self, counselor_id) -> List[dict]:
+        with self._lock:
+            return [self._cases[i].to_dict() for i in self._by_counselor.get(str(counselor_id), ())]
+
+    def by_prefix(self, prefix: str) -> List[dict]:
+        with self._lock:
+            return [self._cases[i].to_dict() for i in self._ids.matches(prefix)]
+
+    def resolve(self, prefix: str, counselor_id=None) -> Optional[str]:
+        """Resolve a short case id among all open cases, or one counselor's.
+
+        Raises ``AmbiguousPrefix`` when several cases match.
+        """
+        with self._lock:
+            if counselor_id is None:
+                return self._ids.resolve(prefix)
+            index = self._by_counselor.get(str(counselor_id))
+            return index.resolve(prefix) if index is not None else None
+
+    def search(self, query: str, counselor_id=None) -> List[dict]:
+        """Open cases matching ``query`` (id prefix, alias or problem words)."""
+        with self._lock:
+            allowed = None
+            if counselor_id is not None:
+                allowed = set(self._by_counselor.get(str(counselor_id), ()))
+            return [c.to_dict() for c in self._search.search(query, allowed)]
+
+    def with_status(self, status: str) -> List[dict]:
+        with self._lock:
+            return [c.to_dict() for c in self._cases.values() if c.status == status]
+
+
+def _discard(index: dict, key: str, case_id: str) -> None:
+    ids = index.get(key)
+    if ids is not None:
+        ids.discard(case_id)
+        if not ids:
+            del index[key]
@@ -0,0 +1,113 @@
+"""Compact JSON responses for admin listings.
+
+Listings send a summary of each document by default (cases carry
+``message_count`` instead of their message history). ``?fields=a,b`` picks
+fields from the full documents instead, and ``?view=full`` sends them
+whole. Bodies are serialized with ``orjson`` when installed and, above
+``API_COMPRESS_MIN_BYTES``, compressed with brotli (if installed) or gzip
+according to ``Accept-Encoding``.
+"""
+
+import functools
+import gzip
+import json
+from typing import Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import metrics
+
+
+SUMMARY_FIELDS = {
+    'cases': (
+        'id', 'status', 'problem', 'user_telegram_id', 'assigned_counselor_id', 'counseling_leader_id',
+        'alias', 'done', 'message_count', 'created_at', 'assigned_at', 'updated_at',
+        'user_info', 'counselor_info',
+    ),
+    'users': ('id', 'telegram_id', 'username', 'first_name', 'role', 'blocked', 'created_at', 'updated_at'),
+}
+
+
+def requested_fields(request) -> Optional[List[str]]:
+    raw = request.GET.get('fields')
+    if not raw:
+        return None
+    return [f for f in (part.strip() for part in raw.split(',')) if f]
+
+
+def shape(request, kind: str, rows: Iterable[dict]) -> List[dict]:
+    """``rows`` as the request asked for: summary, ``?fields=`` or ``?view=full``."""
+    fields = requested_fields(request)
+    if fields is None and request.GET.get('view') == 'full':
+        return list(rows)
+    if fields is None:
+        fields = SUMMARY_FIELDS[kind]
+    elif 'id' not in fields:
+        fields = ['id'] + fields
+    shaped = []
+    for row in rows:
+        if 'message_count' in fields and 'message_count' not in row and 'messages' in row:
+            row = {**row, 'message_count': len(row.get('messages') or [])}
+        shaped.append({f: row[f] for f in fields if f in row})
+    return shaped
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=str, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def json_response(payload, status: int = 200) -> HttpResponse:
+    """Uncompressed JSON response (``compressed_response`` encodes it)."""
+    with metrics.timed("compact.serialize"):
+        body = dumps(payload)
+    return HttpResponse(body, status=status, content_type='application/json')
+
+
+def encode(body: bytes, accept_encoding: str):
+    """``(body, content_encoding)``; encoding is None when left uncompressed."""
+    if len(body) < getattr(settings, 'API_COMPRESS_MIN_BYTES', 1024):
+        return body, None
+    accepted = {part.split(';')[0].strip().lower() for part in accept_encoding.split(',')}
+    if brotli is not None and 'br' in accepted:
+        return brotli.compress(body, quality=5), 'br'
+    if 'gzip' in accepted:
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
+
+
+def compressed_response(view):
+    """Compress the view's (non-streaming) responses for clients that accept it."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        response = await view(request, *args, **kwargs)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.status_code != 200:
+            return response
+        body, encoding = encode(response.content, request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+        metrics.incr(f"compact.{encoding}")
+        response.content = body
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag:
+            # Same representation rule as the cache: one tag per encoding
+            response['ETag'] = f'{etag[:-1]}-{encoding}"'
+        return response
+    return wrapper
@@ -0,0 +1,49 @@
+"""Cursors for delta-sync listings (``?since=<cursor>``).
+
+Every write sets ``updated_at``, so "changed since" is a range query on it.
+A cursor is an opaque, URL-safe encoding of the ``(updated_at, doc id)``
+of the last change a client received; the id breaks ties between changes
+in the same microsecond. Deletions are recorded as tombstones (see
+``FirebaseService.delete_document``) and returned in the same order.
+"""
+
+import base64
+from typing import Iterable, List, Optional, Tuple
+
+# Where to start when the client has no cursor yet (``since=`` or ``since=0``)
+ORIGIN = ('', '')
+
+
+def encode_cursor(updated_at: str, doc_id: str) -> str:
+    raw = f"{updated_at}|{doc_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[str, str]:
+    """``(updated_at, doc_id)`` for ``cursor``; raises ValueError if malformed."""
+    if not cursor or cursor == '0':
+        return ORIGIN
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    updated_at, sep, doc_id = raw.partition('|')
+    if not sep:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return updated_at, doc_id
+
+
+def page(changes: Iterable[dict], position: Tuple[str, str], limit: int):
+    """The next ``limit`` changes after ``position``.
+
+    ``changes`` are dicts with ``id`` and ``updated_at`` (tombstones carry
+    ``deleted: True``). Returns ``(page, next_cursor, has_more)``; the cursor
+    stays at ``position`` when there is nothing new.
+    """
+    after: List[dict] = sorted(
+        (c for c in changes if (str(c.get('updated_at') or ''), c['id']) > position),
+        key=lambda c: (str(c.get('updated_at') or ''), c['id']),
+    )
+    chunk = after[:limit]
+    last = (str(chunk[-1].get('updated_at') or ''), chunk[-1]['id']) if chunk else position
+    return chunk, encode_cursor(*last), len(after) > limit
@@ -0,0 +1,138 @@
+"""Streaming exports of users, cases and message transcripts.
+
+Documents are read from Firestore one page at a time (ordered by document
+id, continuing after the last snapshot of the previous page) and turned
+into NDJSON or CSV rows as they arrive, optionally gzip-compressed on the
+fly. Only one page is held in memory, whatever the collection size.
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+PAGE_SIZE = 500
+
+FIELDS: Dict[str, List[str]] = {
+    'users': ['id', 'telegram_id', 'username', 'first_name', 'role', 'blocked', 'created_at', 'updated_at'],
+    'cases': [
+        'id', 'user_telegram_id', 'status', 'assigned_counselor_id', 'counseling_leader_id', 'alias',
+        'done', 'problem', 'message_count', 'created_at', 'assigned_at', 'updated_at',
+    ],
+    'messages': ['case_id', 'position', 'sender_role', 'sender_telegram_id', 'timestamp', 'message', 'media_type'],
+}
+
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def iter_pages(db, collection: str, page_size: int = PAGE_SIZE,
+               start: Optional[str] = None, end: Optional[str] = None,
+               after: Optional[str] = None) -> Iterator[List[Tuple[str, dict]]]:
+    """Pages of ``(id, data)`` in document id order, ``page_size`` at a time.
+
+    ``start``/``end`` restrict the scan to document ids in ``[start, end)``;
+    ``after`` resumes after that id.
+    """
+    from google.cloud.firestore_v1 import FieldPath
+
+    ref = db.collection(collection)
+    base = ref.order_by(FieldPath.document_id())
+    if after:
+        base = base.where(FieldPath.document_id(), '>', ref.document(after))
+    elif start:
+        base = base.where(FieldPath.document_id(), '>=', ref.document(start))
+    if end:
+        base = base.where(FieldPath.document_id(), '<', ref.document(end))
+    last = None
+    while True:
+        query = base.limit(page_size)
+        if last is not None:
+            query = query.start_after(last)
+        docs = list(query.stream())
+        if docs:
+            yield [(doc.id, doc.to_dict() or {}) for doc in docs]
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
+
+
+def iter_documents(db, collection: str, page_size: int = PAGE_SIZE, **bounds) -> Iterator[Tuple[str, dict]]:
+    """``(id, data)`` for every document (see ``iter_pages`` for ``bounds``)."""
+    for docs in iter_pages(db, collection, page_size, **bounds):
+        yield from docs
+
+
+def records(dataset: str, documents: Iterable[Tuple[str, dict]], with_messages: bool = False) -> Iterator[dict]:
+    """Export rows for ``dataset`` (users, cases or messages)."""
+    for doc_id, data in documents:
+        if dataset == 'messages':
+            for position, m in enumerate(data.get('messages') or []):
+                yield {
+                    'case_id': doc_id,
+                    'position': position,
+                    'sender_role': m.get('sender_role'),
+                    'sender_telegram_id': m.get('sender_telegram_id'),
+                    'timestamp': m.get('timestamp'),
+                    'message': m.get('message'),
+                    'media_type': (m.get('media') or {}).get('type'),
+                }
+        elif dataset == 'cases':
+            row = {**data, 'id': doc_id, 'message_count': len(data.get('messages') or [])}
+            if not with_messages:
+                row.pop('messages', None)
+            yield row
+        else:
+            yield {**data, 'id': doc_id}
+
+
+def ndjson_lines(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, default=str, ensure_ascii=False) + '\n'
+
+
+def csv_lines(rows: Iterable[dict], fields: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encoded(lines: Iterable[str], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """UTF-8 bytes, grouped into chunks of about ``chunk_size``."""
+    pending = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        pending.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b''.join(pending)
+
+
+def gzipped(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a byte stream into one gzip member, chunk by chunk."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def stream(db, dataset: str, fmt: str, compress: bool = False,
+           with_messages: bool = False, page_size: int = PAGE_SIZE) -> Iterator[bytes]:
+    """The full export of ``dataset`` as ``fmt`` (``ndjson`` or ``csv``)."""
+    collection = 'users' if dataset == 'users' else 'cases'
+    rows = records(dataset, iter_documents(db, collection, page_size), with_messages)
+    lines = ndjson_lines(rows) if fmt == 'ndjson' else csv_lines(rows, FIELDS[dataset])
+    chunks = encoded(lines)
+    return gzipped(chunks) if compress else chunks
@@ -1,15 +1,159 @@
-"""Thin wrapper around the existing firebase_service module.
+"""The process's Firestore service: created once, thread-safely, per process.
 
-Use get_service() to obtain the singleton Firestore service.
+Every caller gets the service from ``get_service()``. The first call builds
+it under a lock, so concurrent first requests in a threaded server do not
+each open their own channels; a failed build is retried at most every
+``RETRY_SECONDS``. gRPC channels do not survive ``fork()``: a forked child
+(pre-fork servers such as gunicorn with ``--preload``) drops the service it
+inherited and builds its own on first use. ``FIRESTORE_CHANNEL_POOL_SIZE``
+sets how many channels the service spreads its calls over.
+
+Use warm_up() while a process boots so its first request does not pay for
+the Firestore channel, and replay_spool() so writes that fell back to the
+local spool (``bot.core.spool``) reach Firestore.
 """
 
-from typing import Any
+import logging
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_SECONDS = 5.0
+
+_lock = threading.Lock()
+_service = None
+_failed_at = None
+_last_error = None
+_fork_resets = 0
+_replay = False
+_replayer = None
+metrics.gauge("firebase.fork_resets", lambda: _fork_resets)
+
+
+def _create() -> Any:
+    from django.conf import settings
+    from bot.firebase_service import FirebaseService
+
+    pool_size = max(1, getattr(settings, 'FIRESTORE_CHANNEL_POOL_SIZE', 1))
+    started = time.monotonic()
+    service = FirebaseService(pool_size=pool_size)
+    metrics.observe("firebase.client_init", time.monotonic() - started)
+    metrics.incr("firebase.clients_created", pool_size)
+    metrics.gauge("firebase.channel_pool_size", pool_size)
+    logger.info(f"Firestore service created in pid {os.getpid()} ({pool_size} channel(s))")
+    return service
 
 
 def get_service() -> Any:
-    # Lazy import to avoid heavy imports at module import time
-    from bot.firebase_service import get_firebase_service as _get_fb
+    """The Firestore service, or None if it cannot be created."""
+    global _service, _failed_at, _last_error
+    service = _service
+    if service is not None:
+        return service
+    with _lock:
+        if _service is not None:
+            return _service
+        if _failed_at is not None and time.monotonic() - _failed_at < RETRY_SECONDS:
+            return None
+        try:
+            _service = _create()
+            _failed_at = _last_error = None
+            if _replay:
+                _start_replayer(_service)
+        except Exception as e:
+            _failed_at = time.monotonic()
+            _last_error = f"{type(e).__name__}: {e}"
+            metrics.incr("firebase.client_init_failures")
+            logger.error(f"Failed to initialize Firebase: {e}")
+        return _service
+
+
+def last_error() -> Optional[str]:
+    """Why the last attempt to create the service failed (None if it did not)."""
+    return _last_error
+
+
+def replay_spool() -> None:
+    """Replay the service's write spool in a background thread.
+
+    Starts now if the service exists, else as soon as ``get_service``
+    creates it. Call once per process that writes through the service.
+    """
+    global _replay
+    with _lock:
+        _replay = True
+        if _service is not None:
+            _start_replayer(_service)
+
+
+def spool_replayer():
+    """The running ``SpoolReplayer`` (None before replay_spool or without a spool)."""
+    return _replayer
+
+
+def _start_replayer(service) -> None:
+    global _replayer
+    if _replayer is not None or service.spool is None:
+        return
+    from .spool import SpoolReplayer
+
+    _replayer = SpoolReplayer(service, service.spool)
+    _replayer.start()
+
+
+def _after_fork_in_child() -> None:
+    global _lock, _service, _failed_at, _last_error, _fork_resets, _replayer
+    # The parent's lock may have been held mid-init and its channels are
+    # unusable here; drop both without closing anything the parent still uses.
+    # No metrics/logging calls: their locks may be held by a parent thread too.
+    _lock = threading.Lock()
+    if _service is not None:
+        _fork_resets += 1
+    # The replayer thread did not survive the fork; the child starts its own
+    _service = _failed_at = _last_error = _replayer = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def warm_up(timeout: float = None) -> bool:
+    """Create the service and open its Firestore channel.
+
+    Waits at most ``timeout`` seconds (``FIREBASE_WARMUP_TIMEOUT``); a slow
+    warm-up keeps going in the background. No-op when ``FIREBASE_WARMUP``
+    is off. Returns True if the channel is ready.
+    """
+    from django.conf import settings
 
-    return _get_fb()
+    if not getattr(settings, 'FIREBASE_WARMUP', True):
+        return False
+    if timeout is None:
+        timeout = getattr(settings, 'FIREBASE_WARMUP_TIMEOUT', 10.0)
+    finished = threading.Event()
+    ready = []
 
+    def _run():
+        started = time.monotonic()
+        try:
+            service = get_service()
+            if service is not None:
+                service.warm_up()
+                metrics.observe("firebase.warm_up", time.monotonic() - started)
+                logger.info(f"Firestore warm-up took {time.monotonic() - started:.2f}s")
+                ready.append(True)
+        except Exception as e:
+            logger.warning(f"Firestore warm-up failed: {e}")
+        finally:
+            finished.set()
 
+    threading.Thread(target=_run, name='firestore-warm-up', daemon=True).start()
+    if not finished.wait(timeout):
+        logger.warning(f"Firestore not warmed up within {timeout:.0f}s; continuing")
+    return bool(ready)
@@ -0,0 +1,86 @@
+"""Process-local metrics registry (counters, gauges and timings).
+
+Metrics are kept in memory only. The bot exposes them through the admin
+``/metrics`` command; the web process through ``/api/metrics/``.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Union
+
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_gauges: Dict[str, Union[float, Callable[[], Any]]] = {}
+_timings: Dict[str, Dict[str, float]] = {}
+
+
+def incr(name: str, value: int = 1) -> None:
+    """Increment a counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def gauge(name: str, value: Union[float, Callable[[], Any]]) -> None:
+    """Set a gauge. A callable is evaluated lazily on every snapshot."""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record one duration sample for a timing."""
+    with _lock:
+        t = _timings.get(name)
+        if t is None:
+            t = _timings[name] = {'count': 0, 'total': 0.0, 'max': 0.0}
+        t['count'] += 1
+        t['total'] += seconds
+        if seconds > t['max']:
+            t['max'] = seconds
+
+
+@contextmanager
+def timed(name: str):
+    """Context manager recording the wall time of its block under ``name``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def snapshot() -> dict:
+    """Return a JSON-serialisable copy of all metrics."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        timings = {k: dict(v) for k, v in _timings.items()}
+
+    evaluated = {}
+    for name, value in gauges.items():
+        if callable(value):
+            try:
+                value = value()
+            except Exception as e:
+                value = f"error: {e}"
+        evaluated[name] = value
+
+    for t in timings.values():
+        t['avg'] = t['total'] / t['count'] if t['count'] else 0.0
+
+    return {'counters': counters, 'gauges': evaluated, 'timings': timings}
+
+
+def format_snapshot(snap: dict) -> str:
+    """Render a snapshot as plain text lines (used by the bot command)."""
+    lines = []
+    for name, value in sorted(snap['counters'].items()):
+        lines.append(f"{name} = {value}")
+    for name, value in sorted(snap['gauges'].items()):
+        lines.append(f"{name} = {value}")
+    for name, t in sorted(snap['timings'].items()):
+        lines.append(
+            f"{name}: n={t['count']} avg={t['avg'] * 1000:.1f}ms max={t['max'] * 1000:.1f}ms"
+        )
+    return "\n".join(lines) or "(no metrics yet)"
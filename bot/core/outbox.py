@@ -0,0 +1,129 @@
+"""Transactional outbox for Telegram notifications.
+
+Web requests never talk to Telegram. They write an ``outbox`` document in the
+same Firestore batch as the change that triggers the notification (see
+``FirebaseService.assign_case``). The bot process drains the outbox through
+its long-lived, pooled ``Bot`` client.
+
+Delivery is at-least-once: a record is claimed with an optimistic
+precondition, sent, then marked ``sent``. A crash between sending and marking
+means the record is retried after its lease expires.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = 'outbox'
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 10
+
+
+def new_record(chat_id, text: str) -> dict:
+    """Build an outbox document for a plain text message."""
+    now = datetime.now().isoformat()
+    return {
+        'chat_id': int(chat_id),
+        'text': text,
+        'status': 'pending',  # pending, sent, failed
+        'attempts': 0,
+        'last_error': None,
+        # Due records have next_attempt_at <= now; finished records set it to None
+        'next_attempt_at': now,
+        'created_at': now,
+        'updated_at': now,
+    }
+
+
+class OutboxDrainer:
+    """Background loop sending due outbox records with ``bot``."""
+
+    def __init__(self, service, bot, interval: float = 2.0, batch_size: int = 50):
+        self.service = service
+        self.bot = bot
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """Finish the send in progress, then leave ``run`` (unclaimed records stay due)."""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        logger.info("Outbox drainer started")
+        while not self._stopping.is_set():
+            try:
+                sent = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox drain failed: {e}")
+                sent = 0
+            if sent < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("Outbox drainer stopped")
+
+    async def drain_once(self) -> int:
+        """Send one batch of due records; returns how many were processed."""
+        docs = await asyncio.to_thread(self._fetch_due)
+        for doc in docs:
+            if self._stopping.is_set():
+                break
+            if not await asyncio.to_thread(self._claim, doc):
+                continue
+            record = doc.to_dict()
+            try:
+                await self.bot.send_message(chat_id=record['chat_id'], text=record['text'])
+            except Exception as e:
+                metrics.incr("outbox.errors")
+                logger.warning(f"Outbox send {doc.id} failed: {e}")
+                await asyncio.to_thread(self._mark_failed, doc.reference, record, e)
+                continue
+            await asyncio.to_thread(self._mark_sent, doc.reference)
+            metrics.incr("outbox.sent")
+        return len(docs)
+
+    def _fetch_due(self):
+        now = datetime.now().isoformat()
+        query = (
+            self.service.db.collection(OUTBOX_COLLECTION)
+            .where('next_attempt_at', '<=', now)
+            .order_by('next_attempt_at')
+            .limit(self.batch_size)
+        )
+        return list(query.stream())
+
+    def _claim(self, doc) -> bool:
+        """Lease ``doc`` unless another drainer changed it since we read it."""
+        lease_until = (datetime.now() + timedelta(seconds=LEASE_SECONDS)).isoformat()
+        try:
+            doc.reference.update(
+                {'next_attempt_at': lease_until, 'updated_at': datetime.now().isoformat()},
+                option=self.service.db.write_option(last_update_time=doc.update_time),
+            )
+            return True
+        except Exception:
+            return False
+
+    def _mark_sent(self, ref) -> None:
+        now = datetime.now().isoformat()
+        ref.update({'status': 'sent', 'next_attempt_at': None, 'sent_at': now, 'updated_at': now})
+
+    def _mark_failed(self, ref, record: dict, error: Exception) -> None:
+        attempts = int(record.get('attempts') or 0) + 1
+        update = {'attempts': attempts, 'last_error': str(error), 'updated_at': datetime.now().isoformat()}
+        if attempts >= MAX_ATTEMPTS:
+            update.update({'status': 'failed', 'next_attempt_at': None})
+        else:
+            # Exponential backoff capped at one hour
+            delay = min(2 ** attempts * 5, 3600)
+            update['next_attempt_at'] = (datetime.now() + timedelta(seconds=delay)).isoformat()
+        ref.update(update)
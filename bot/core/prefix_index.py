@@ -0,0 +1,70 @@
+"""Sorted-array prefix index for resolving short case ids."""
+
+import bisect
+from typing import Iterable, Iterator, List, Optional
+
+
+class AmbiguousPrefix(Exception):
+    """Raised when a short id matches more than one case."""
+
+    def __init__(self, prefix: str, matches: List[str]):
+        super().__init__(f"'{prefix}' matches {len(matches)} cases")
+        self.prefix = prefix
+        self.matches = matches
+
+
+class PrefixIndex:
+    """Ids kept sorted so every id starting with a prefix is one contiguous
+    run, found with a binary search (O(log n) plus the matches returned).
+    """
+
+    __slots__ = ('_ids',)
+
+    def __init__(self, ids: Iterable[str] = ()):
+        self._ids: List[str] = sorted(set(ids))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __contains__(self, item: str) -> bool:
+        i = bisect.bisect_left(self._ids, item)
+        return i < len(self._ids) and self._ids[i] == item
+
+    def add(self, item: str) -> None:
+        i = bisect.bisect_left(self._ids, item)
+        if i == len(self._ids) or self._ids[i] != item:
+            self._ids.insert(i, item)
+
+    def discard(self, item: str) -> None:
+        i = bisect.bisect_left(self._ids, item)
+        if i < len(self._ids) and self._ids[i] == item:
+            del self._ids[i]
+
+    def matches(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Ids starting with ``prefix`` in sorted order (at most ``limit``)."""
+        i = bisect.bisect_left(self._ids, prefix)
+        found = []
+        while i < len(self._ids) and self._ids[i].startswith(prefix):
+            found.append(self._ids[i])
+            if limit is not None and len(found) >= limit:
+                break
+            i += 1
+        return found
+
+    def resolve(self, prefix: str) -> Optional[str]:
+        """The single id starting with ``prefix``; None if there is none.
+
+        An exact id always wins. Raises ``AmbiguousPrefix`` (with up to five
+        candidates) when several ids share the prefix.
+        """
+        if not prefix:
+            return None
+        if prefix in self:
+            return prefix
+        found = self.matches(prefix, limit=5)
+        if len(found) > 1:
+            raise AmbiguousPrefix(prefix, found)
+        return found[0] if found else None
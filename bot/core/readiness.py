@@ -0,0 +1,142 @@
+"""Readiness probes for the web and bot processes.
+
+Each dependency is checked with the cheapest call that proves it works:
+a point read of one Firestore document, and Telegram's ``getMe``. Results
+are cached per process (``READINESS_CACHE_SECONDS``; a successful
+``getMe`` for ``READINESS_TELEGRAM_CACHE_SECONDS``) and concurrent probes
+wait for the one check in progress, so a load balancer polling every
+instance never multiplies the traffic to Firestore or Telegram.
+
+``/api/health/`` stays a liveness check; ``/api/ready/`` (and the bot's
+``/ready`` on ``BOT_HEALTH_PORT``) answer 503 while any probe fails.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class Probe:
+    """One dependency check with a cached result."""
+
+    def __init__(self, name: str, check: Callable[[], None], ttl: float, failure_ttl: Optional[float] = None):
+        self.name = name
+        self.check = check
+        self.ttl = ttl
+        self.failure_ttl = ttl if failure_ttl is None else failure_ttl
+        self.ok = None
+        self.latency_ms = None
+        self.checked_at = None
+        self.last_error = None
+        self.last_error_at = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _fresh(self) -> bool:
+        if self._checked is None:
+            return False
+        ttl = self.ttl if self.ok else self.failure_ttl
+        return time.monotonic() - self._checked < ttl
+
+    def result(self) -> dict:
+        """The cached result, re-running the check once it has expired."""
+        with self._lock:
+            if not self._fresh():
+                self._run()
+            return {
+                'ok': self.ok,
+                'latency_ms': self.latency_ms,
+                'checked_at': self.checked_at,
+                'last_error': self.last_error,
+                'last_error_at': self.last_error_at,
+            }
+
+    def _run(self) -> None:
+        started = time.monotonic()
+        try:
+            self.check()
+            self.ok = True
+        except Exception as e:
+            self.ok = False
+            self.last_error = f"{type(e).__name__}: {e}"
+            self.last_error_at = _now()
+            metrics.incr(f"ready.{self.name}.failures")
+            logger.warning(f"Readiness check {self.name} failed: {self.last_error}")
+        elapsed = time.monotonic() - started
+        metrics.observe(f"ready.{self.name}", elapsed)
+        self.latency_ms = round(elapsed * 1000, 1)
+        self.checked_at = _now()
+        self._checked = time.monotonic()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _timeout() -> float:
+    from django.conf import settings
+    return getattr(settings, 'READINESS_TIMEOUT', 2.0)
+
+
+def check_firestore() -> None:
+    from .firebase import get_service, last_error
+
+    service = get_service()
+    if service is None:
+        raise RuntimeError(f"Firestore client is not initialized: {last_error() or 'unknown error'}")
+    service.ping(timeout=_timeout())
+
+
+def check_telegram() -> None:
+    import requests
+    from django.conf import settings
+
+    token = getattr(settings, 'TELEGRAM_BOT_TOKEN', '')
+    if not token:
+        raise RuntimeError("TELEGRAM_BOT_TOKEN not set")
+    try:
+        response = requests.get(f"https://api.telegram.org/bot{token}/getMe", timeout=_timeout())
+        payload = response.json()
+    except Exception as e:
+        # requests puts the URL, and so the token, into its messages
+        raise RuntimeError(str(e).replace(token, '<token>')) from None
+    if not payload.get('ok'):
+        raise RuntimeError(f"getMe returned {response.status_code}: {payload.get('description', '')}")
+
+
+_probes: List[Probe] = []
+_probes_lock = threading.Lock()
+
+
+def probes() -> List[Probe]:
+    """This process's probes, created on first use."""
+    with _probes_lock:
+        if not _probes:
+            from django.conf import settings
+            ttl = getattr(settings, 'READINESS_CACHE_SECONDS', 5.0)
+            _probes.extend([
+                Probe('firestore', check_firestore, ttl),
+                Probe('telegram', check_telegram,
+                      getattr(settings, 'READINESS_TELEGRAM_CACHE_SECONDS', 60.0), failure_ttl=ttl),
+            ])
+        return list(_probes)
+
+
+def summarize(results: Dict[str, dict]) -> dict:
+    """Response body for ``{probe name: Probe.result()}``."""
+    return {
+        'status': 'ready' if all(r['ok'] for r in results.values()) else 'unavailable',
+        'checks': results,
+    }
+
+
+def report() -> dict:
+    """Run (or reuse) every probe one after another; see ``summarize``."""
+    return summarize({probe.name: probe.result() for probe in probes()})
@@ -0,0 +1,188 @@
+"""Compact record types for users, cases and messages held in memory.
+
+Firestore documents arrive as dicts with ISO timestamp strings and ids that
+are sometimes strings, sometimes ints. Records parse them once at the
+storage boundary (``from_doc``) into slotted, immutable objects with
+``datetime``s, integer telegram ids and shared enum members for status and
+role, and convert back with ``to_dict`` for code that expects documents.
+
+The open-case view stores ``CaseSummary`` records, the bot reads profiles
+as ``User`` records, and ``FirebaseService.add_message_to_case`` builds each
+stored message through ``Message``. Compare footprints of all three with
+``python manage.py bench_records``.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Optional, Union
+
+
+class Role(str, Enum):
+    USER = 'user'
+    COUNSELOR = 'counselor'
+    LEADER = 'leader'
+    ADMIN = 'admin'
+
+
+class CaseStatus(str, Enum):
+    PENDING = 'pending'
+    ASSIGNED = 'assigned'
+    ACTIVE = 'active'
+    CLOSED = 'closed'
+
+
+def _enum(cls, value, default):
+    if value is None:
+        return default
+    try:
+        return cls(value)
+    except ValueError:
+        return default
+
+
+def _int(value) -> Optional[int]:
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _dt(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+@dataclass(frozen=True)
+class User:
+    __slots__ = ('telegram_id', 'username', 'first_name', 'role', 'blocked', 'created_at', 'updated_at')
+
+    telegram_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    role: Role
+    blocked: bool
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_doc(cls, data: dict) -> 'User':
+        return cls(
+            telegram_id=_int(data.get('telegram_id')),
+            username=data.get('username'),
+            first_name=data.get('first_name'),
+            role=_enum(Role, data.get('role'), Role.USER),
+            blocked=bool(data.get('blocked')),
+            created_at=_dt(data.get('created_at')),
+            updated_at=_dt(data.get('updated_at')),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'telegram_id': self.telegram_id,
+            'username': self.username,
+            'first_name': self.first_name,
+            'role': self.role.value,
+            'blocked': self.blocked,
+            'created_at': _iso(self.created_at),
+            'updated_at': _iso(self.updated_at),
+        }
+
+
+@dataclass(frozen=True)
+class CaseSummary:
+    """A case without its message history (``message_count`` only)."""
+
+    __slots__ = (
+        'id', 'user_telegram_id', 'status', 'problem', 'alias', 'done',
+        'assigned_counselor_id', 'counseling_leader_id', 'message_count',
+        'created_at', 'updated_at',
+    )
+
+    id: str
+    user_telegram_id: Optional[int]
+    status: CaseStatus
+    problem: str
+    alias: Optional[str]
+    done: bool
+    assigned_counselor_id: Optional[int]
+    counseling_leader_id: Optional[int]
+    message_count: int
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_doc(cls, case_id: str, data: dict) -> 'CaseSummary':
+        messages = data.get('messages')
+        return cls(
+            id=case_id,
+            user_telegram_id=_int(data.get('user_telegram_id')),
+            status=_enum(CaseStatus, data.get('status'), CaseStatus.PENDING),
+            problem=data.get('problem') or '',
+            alias=data.get('alias'),
+            done=bool(data.get('done')),
+            assigned_counselor_id=_int(data.get('assigned_counselor_id')),
+            counseling_leader_id=_int(data.get('counseling_leader_id')),
+            message_count=len(messages) if messages is not None else int(data.get('message_count') or 0),
+            created_at=_dt(data.get('created_at')),
+            updated_at=_dt(data.get('updated_at')),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'user_telegram_id': self.user_telegram_id,
+            'status': self.status.value,
+            'problem': self.problem,
+            'alias': self.alias,
+            'done': self.done,
+            'assigned_counselor_id': self.assigned_counselor_id,
+            'counseling_leader_id': self.counseling_leader_id,
+            'message_count': self.message_count,
+            'created_at': _iso(self.created_at),
+            'updated_at': _iso(self.updated_at),
+        }
+
+
+@dataclass(frozen=True)
+class Message:
+    __slots__ = ('sender_role', 'sender_telegram_id', 'message', 'timestamp', 'media')
+
+    sender_role: Union[Role, str]
+    sender_telegram_id: Optional[int]
+    message: str
+    timestamp: Optional[datetime]
+    media: Optional[dict]
+
+    @classmethod
+    def from_doc(cls, data: dict) -> 'Message':
+        role = data.get('sender_role')
+        return cls(
+            # Messages use 'user'/'counselor'; anything else is kept verbatim
+            sender_role=_enum(Role, role, role),
+            sender_telegram_id=_int(data.get('sender_telegram_id')),
+            message=data.get('message') or '',
+            timestamp=_dt(data.get('timestamp')),
+            media=data.get('media'),
+        )
+
+    def to_dict(self) -> dict:
+        d = {
+            'sender_role': getattr(self.sender_role, 'value', self.sender_role),
+            'sender_telegram_id': self.sender_telegram_id,
+            'message': self.message,
+            'timestamp': _iso(self.timestamp),
+        }
+        if self.media:
+            d['media'] = self.media
+        return d
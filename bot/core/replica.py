@@ -0,0 +1,433 @@
+"""Local SQLite replica of Firestore ``users`` and ``cases`` for reporting.
+
+``python manage.py replicate`` bulk-loads both collections, then keeps the
+replica current with ``on_snapshot`` listeners on ``updated_at >=
+checkpoint``. The checkpoint (the newest ``updated_at`` applied, per
+collection) is stored in the replica, so a restarted daemon only re-reads
+documents changed since it stopped. Every write in this project sets
+``updated_at``, which is what makes the range listener complete. A resumed
+listener cannot see documents deleted while it was down, so deletions are
+reconciled from the tombstones ``FirebaseService.delete_document`` leaves;
+documents deleted some other way (e.g. in the console) need ``--full``.
+In a resumed listener a ``REMOVED`` change only means the document left the
+``updated_at`` range (e.g. its ``updated_at`` moved backwards under clock
+skew), so the document is read again and deleted only if it is gone.
+
+Reporting endpoints read from the replica when ``REPORTS_SOURCE`` is
+``replica`` or the request has ``?source=replica`` (see ``replica_for``).
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ('users', 'cases')
+
+# Writers run on different hosts; re-read this much before the checkpoint
+CLOCK_SKEW = timedelta(minutes=5)
+
+# Tries at applying a listener's first snapshot before giving up
+INITIAL_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    telegram_id INTEGER,
+    username TEXT,
+    first_name TEXT,
+    role TEXT,
+    blocked INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_role ON users (role);
+CREATE INDEX IF NOT EXISTS users_telegram_id ON users (telegram_id);
+
+CREATE TABLE IF NOT EXISTS cases (
+    id TEXT PRIMARY KEY,
+    user_telegram_id INTEGER,
+    status TEXT,
+    assigned_counselor_id INTEGER,
+    counseling_leader_id INTEGER,
+    problem TEXT,
+    alias TEXT,
+    done INTEGER NOT NULL DEFAULT 0,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cases_status ON cases (status);
+CREATE INDEX IF NOT EXISTS cases_counselor ON cases (assigned_counselor_id, status);
+CREATE INDEX IF NOT EXISTS cases_user ON cases (user_telegram_id);
+CREATE INDEX IF NOT EXISTS cases_created ON cases (created_at);
+CREATE INDEX IF NOT EXISTS cases_status_created ON cases (status, created_at);
+CREATE INDEX IF NOT EXISTS cases_updated ON cases (updated_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    case_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    sender_role TEXT,
+    sender_telegram_id INTEGER,
+    message TEXT,
+    timestamp TEXT,
+    PRIMARY KEY (case_id, position)
+);
+CREATE INDEX IF NOT EXISTS messages_timestamp ON messages (timestamp);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    collection TEXT PRIMARY KEY,
+    updated_at TEXT,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+class Replica:
+    """SQLite file holding indexed copies of users, cases and messages."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # Writes ---------------------------------------------------------------
+
+    def apply(self, collection: str, upserts: Dict[str, dict], deletes=()) -> None:
+        """Apply one batch of changes to ``collection`` in a transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for doc_id in deletes:
+                    self._delete(collection, doc_id)
+                for doc_id, data in upserts.items():
+                    if collection == 'users':
+                        self._upsert_user(doc_id, data)
+                    else:
+                        self._upsert_case(doc_id, data)
+                newest = max((d.get('updated_at') or '' for d in upserts.values()), default='')
+                if newest:
+                    self._conn.execute(
+                        "INSERT INTO checkpoints (collection, updated_at, synced_at) VALUES (?, ?, ?)"
+                        " ON CONFLICT (collection) DO UPDATE SET"
+                        " updated_at = max(coalesce(updated_at, ''), excluded.updated_at),"
+                        " synced_at = excluded.synced_at",
+                        (collection, str(newest), time.time()),
+                    )
+                else:
+                    self._touch(collection)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        metrics.incr(f"replica.{collection}.applied", len(upserts) + len(deletes))
+
+    def reset(self, collection: str) -> None:
+        with self._lock:
+            if collection == 'cases':
+                self._conn.execute("DELETE FROM messages")
+            self._conn.execute(f"DELETE FROM {collection}")
+            self._conn.execute("DELETE FROM checkpoints WHERE collection = ?", (collection,))
+
+    def _touch(self, collection: str) -> None:
+        self._conn.execute(
+            "INSERT INTO checkpoints (collection, updated_at, synced_at) VALUES (?, NULL, ?)"
+            " ON CONFLICT (collection) DO UPDATE SET synced_at = excluded.synced_at",
+            (collection, time.time()),
+        )
+
+    def _delete(self, collection: str, doc_id: str) -> None:
+        self._conn.execute(f"DELETE FROM {collection} WHERE id = ?", (doc_id,))
+        if collection == 'cases':
+            self._conn.execute("DELETE FROM messages WHERE case_id = ?", (doc_id,))
+
+    def _upsert_user(self, doc_id: str, data: dict) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO users"
+            " (id, telegram_id, username, first_name, role, blocked, created_at, updated_at, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (doc_id, _int(data.get('telegram_id')), data.get('username'), data.get('first_name'),
+             data.get('role') or 'user', int(bool(data.get('blocked'))), data.get('created_at'),
+             data.get('updated_at'), json.dumps(data, default=str)),
+        )
+
+    def _upsert_case(self, doc_id: str, data: dict) -> None:
+        messages = data.get('messages') or []
+        summary = {k: v for k, v in data.items() if k != 'messages'}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cases"
+            " (id, user_telegram_id, status, assigned_counselor_id, counseling_leader_id, problem,"
+            "  alias, done, message_count, created_at, updated_at, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (doc_id, _int(data.get('user_telegram_id')), data.get('status'),
+             _int(data.get('assigned_counselor_id')), _int(data.get('counseling_leader_id')),
+             data.get('problem'), data.get('alias'), int(bool(data.get('done'))), len(messages),
+             data.get('created_at'), data.get('updated_at'), json.dumps(summary, default=str)),
+        )
+        self._conn.execute("DELETE FROM messages WHERE case_id = ?", (doc_id,))
+        self._conn.executemany(
+            "INSERT INTO messages (case_id, position, sender_role, sender_telegram_id, message, timestamp)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(doc_id, i, m.get('sender_role'), _int(m.get('sender_telegram_id')), m.get('message'), m.get('timestamp'))
+             for i, m in enumerate(messages)],
+        )
+
+    # Checkpoints ----------------------------------------------------------
+
+    def checkpoint(self, collection: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at, synced_at FROM checkpoints WHERE collection = ?", (collection,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    @property
+    def ready(self) -> bool:
+        """True once every collection has been loaded at least once."""
+        return all(self.checkpoint(c) is not None for c in COLLECTIONS)
+
+    # Reads ----------------------------------------------------------------
+
+    def query(self, sql: str, params=()) -> List[dict]:
+        with metrics.timed("replica.query"), self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    def cases(self, with_messages: bool = True, created_from: Optional[str] = None,
+              created_to: Optional[str] = None) -> List[dict]:
+        """Cases as Firestore-shaped documents (``id`` included), optionally
+        only those created in ``[created_from, created_to)``.
+        """
+        where, params = _created_between(created_from, created_to)
+        cases = [{**json.loads(r['data']), 'id': r['id']}
+                 for r in self.query(f"SELECT id, data FROM cases{where}", params)]
+        if with_messages:
+            grouped: Dict[str, list] = {}
+            for m in self.query(
+                "SELECT case_id, sender_role, sender_telegram_id, message, timestamp"
+                f" FROM messages WHERE case_id IN (SELECT id FROM cases{where})"
+                " ORDER BY case_id, position",
+                params,
+            ):
+                grouped.setdefault(m.pop('case_id'), []).append(m)
+            for case in cases:
+                case['messages'] = grouped.get(case['id'], [])
+        return cases
+
+    def find_cases(self, clause: str, params=()) -> List[dict]:
+        """Cases (without messages) for a ``WHERE ... ORDER BY ...`` clause
+        built by ``case_query.replica_sql``.
+        """
+        return [{**json.loads(r['data']), 'id': r['id'], 'message_count': r['message_count']}
+                for r in self.query(f"SELECT id, data, message_count FROM cases{clause}", params)]
+
+    def users(self, roles=None) -> List[dict]:
+        if roles:
+            marks = ','.join('?' * len(roles))
+            rows = self.query(f"SELECT id, data FROM users WHERE role IN ({marks})", tuple(roles))
+        else:
+            rows = self.query("SELECT id, data FROM users")
+        return [{**json.loads(r['data']), 'id': r['id']} for r in rows]
+
+    def stats(self) -> dict:
+        """The same numbers as ``/api/stats/``, from indexed aggregates."""
+        roles = {r['role']: r['n'] for r in self.query("SELECT role, count(*) AS n FROM users GROUP BY role")}
+        statuses = {r['status'] or 'unknown': r['n']
+                    for r in self.query("SELECT status, count(*) AS n FROM cases GROUP BY status")}
+        return {
+            'total_users': sum(roles.values()),
+            'total_cases': sum(statuses.values()),
+            'pending_cases': statuses.get('pending', 0),
+            'users_by_role': roles,
+            'cases_by_status': statuses,
+        }
+
+
+def _created_between(start, end):
+    clauses, params = [], []
+    if start:
+        clauses.append("created_at >= ?")
+        params.append(start)
+    if end:
+        clauses.append("created_at < ?")
+        params.append(end)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), tuple(params)
+
+
+class ReplicaSync:
+    """Bulk load plus ``on_snapshot`` change capture into a ``Replica``."""
+
+    def __init__(self, db, replica: Replica, full: bool = False):
+        self.db = db
+        self.replica = replica
+        self.full = full
+        self._watches = {}
+        self._synced = threading.Event()
+        self._done = threading.Event()
+        self._pending = set(COLLECTIONS)
+        # Collections whose listener is limited to ``updated_at >= since``
+        self._ranged = set()
+        self.error = None
+
+    def start(self) -> None:
+        for collection in COLLECTIONS:
+            query = self.db.collection(collection)
+            since = self._since(collection)
+            if since is None:
+                # No checkpoint: the listener's first snapshot is the bulk load
+                self.replica.reset(collection)
+                logger.info(f"Replica: full load of {collection}")
+            else:
+                query = query.where('updated_at', '>=', since)
+                self._ranged.add(collection)
+                logger.info(f"Replica: resuming {collection} from {since}")
+                # Before subscribing: a document re-created since comes back
+                # with the listener's first snapshot
+                self._reconcile_deletions(collection, since)
+            self._watches[collection] = query.on_snapshot(self._handler(collection))
+
+    def wait_synced(self, timeout: Optional[float] = None) -> bool:
+        """Block until every collection applied its first snapshot.
+
+        False if one of them could not be applied (see ``error``) or
+        ``timeout`` seconds passed.
+        """
+        self._done.wait(timeout)
+        return self._synced.is_set()
+
+    def _reconcile_deletions(self, collection: str, since: str) -> None:
+        tombstones = self.db.collection('tombstones').document(collection).collection('items')
+        deleted = [doc.id for doc in tombstones.where('updated_at', '>=', since).stream()]
+        if deleted:
+            self.replica.apply(collection, {}, deleted)
+            logger.info(f"Replica: removed {len(deleted)} {collection} deleted since {since}")
+
+    def stop(self) -> None:
+        for watch in self._watches.values():
+            try:
+                watch.unsubscribe()
+            except Exception:
+                pass
+        self._watches.clear()
+
+    @property
+    def healthy(self) -> bool:
+        return all(getattr(w, 'is_active', True) for w in self._watches.values())
+
+    def _since(self, collection: str) -> Optional[str]:
+        if self.full:
+            return None
+        checkpoint = self.replica.checkpoint(collection)
+        if not checkpoint or not checkpoint.get('updated_at'):
+            return None
+        try:
+            return (datetime.fromisoformat(checkpoint['updated_at']) - CLOCK_SKEW).isoformat()
+        except ValueError:
+            return None
+
+    def _handler(self, collection: str):
+        first = [True]
+
+        def on_snapshot(docs, changes, read_time):
+            if first[0]:
+                # Later callbacks carry only changes: the first one has to land
+                upserts = {doc.id: doc.to_dict() or {} for doc in docs}
+                for attempt in range(1, INITIAL_ATTEMPTS + 1):
+                    try:
+                        self.replica.apply(collection, upserts)
+                        break
+                    except Exception as e:
+                        logger.error(f"Replica: loading {collection} failed (attempt {attempt}): {e}")
+                        if attempt == INITIAL_ATTEMPTS:
+                            self.error = f"loading {collection} failed: {e}"
+                            self._done.set()
+                            return
+                        time.sleep(attempt)
+                first[0] = False
+                logger.info(f"Replica: {collection} synced ({len(docs)} documents)")
+                self._pending.discard(collection)
+                if not self._pending:
+                    self._synced.set()
+                    self._done.set()
+                return
+            upserts, deletes = {}, []
+            for change in changes:
+                if change.type.name != 'REMOVED':
+                    upserts[change.document.id] = change.document.to_dict() or {}
+                elif collection not in self._ranged:
+                    deletes.append(change.document.id)
+                else:
+                    # Left the updated_at range, not necessarily deleted
+                    try:
+                        doc = self.db.collection(collection).document(change.document.id).get()
+                    except Exception as e:
+                        logger.error(f"Replica: re-reading {collection}/{change.document.id} failed: {e}")
+                        continue
+                    if doc.exists:
+                        upserts[doc.id] = doc.to_dict() or {}
+                    else:
+                        deletes.append(doc.id)
+            try:
+                self.replica.apply(collection, upserts, deletes)
+            except Exception as e:
+                logger.error(f"Replica: applying {collection} changes failed: {e}")
+
+        return on_snapshot
+
+
+_replica = None
+_replica_lock = threading.Lock()
+
+
+def get_replica() -> Optional[Replica]:
+    """The process-wide replica, or None when ``REPLICA_PATH`` is empty."""
+    global _replica
+    if _replica is None:
+        path = getattr(settings, 'REPLICA_PATH', '')
+        if not path:
+            return None
+        with _replica_lock:
+            if _replica is None:
+                _replica = Replica(path)
+    return _replica
+
+
+def replica_for(request) -> Optional[Replica]:
+    """The replica if this request should be served from it, else None.
+
+    ``?source=replica`` or ``?source=firestore`` overrides the
+    ``REPORTS_SOURCE`` setting. A replica that was never loaded is ignored.
+    """
+    source = request.GET.get('source') or getattr(settings, 'REPORTS_SOURCE', 'firestore')
+    if source != 'replica':
+        return None
+    try:
+        replica = get_replica()
+    except Exception as e:
+        logger.warning(f"Replica unavailable: {e}")
+        return None
+    return replica if replica is not None and replica.ready else None
@@ -0,0 +1,108 @@
+"""Shared cache for polled JSON endpoints, served with strong ETags.
+
+Responses are stored in the Django cache (``API_CACHE_ALIAS``, see
+``CACHES`` in settings) under a key made of the path, the sorted query
+parameters and the current generation of every namespace the view depends
+on (``cases``, ``users``). Writes call ``invalidate``, which bumps the
+generation so older entries are never read again; they expire after
+``API_CACHE_TTL`` seconds, which also bounds staleness for writes made by
+processes that do not share the cache.
+
+Only successful payloads are cached: views that answer ``200`` with an
+empty fallback after an error wrap it in ``uncacheable``.
+
+A request whose ``If-None-Match`` matches the cached entry's ETag gets a
+``304`` without running the view.
+"""
+
+import functools
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from . import metrics
+
+
+def _cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(namespace: str) -> str:
+    return f"api:gen:{namespace}"
+
+
+def invalidate(*namespaces: str) -> None:
+    """Drop every cached response that depends on ``namespaces``."""
+    cache = _cache()
+    for namespace in namespaces:
+        key = _generation_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+    metrics.incr("api_cache.invalidations")
+
+
+def uncacheable(response):
+    """Mark ``response`` (e.g. an empty fallback after an error) as not to be cached."""
+    response.no_store = True
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def _not_modified(request, etag: str) -> bool:
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = parse_etags(header)
+    # compact.compressed_response tags encoded bodies '"<etag>-gzip"' / '-br'
+    variants = {etag, f'{etag[:-1]}-gzip"', f'{etag[:-1]}-br"'}
+    return '*' in tags or not variants.isdisjoint(tags)
+
+
+def cached_response(*namespaces: str):
+    """Cache a GET view's ``200`` responses; ``namespaces`` are what it reads."""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await view(request, *args, **kwargs)
+            cache = _cache()
+            keys = [_generation_key(ns) for ns in namespaces]
+            generations = await cache.aget_many(keys)
+            version = '.'.join(str(generations.get(k, 0)) for k in keys)
+            params = urlencode(sorted(request.GET.lists()), doseq=True)
+            digest = hashlib.sha256(f"{request.path}?{params}|{version}".encode()).hexdigest()
+            key = f"api:resp:{digest}"
+
+            entry = await cache.aget(key)
+            if entry is None:
+                metrics.incr("api_cache.misses")
+                response = await view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming or getattr(response, 'no_store', False):
+                    return response
+                entry = {
+                    'etag': '"%s"' % hashlib.sha256(response.content).hexdigest()[:32],
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                }
+                await cache.aset(key, entry, getattr(settings, 'API_CACHE_TTL', 30))
+            else:
+                metrics.incr("api_cache.hits")
+                response = None
+
+            if _not_modified(request, entry['etag']):
+                metrics.incr("api_cache.not_modified")
+                response = HttpResponseNotModified()
+            elif response is None:
+                response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            response['ETag'] = entry['etag']
+            # Let browsers keep the body but revalidate on every poll
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,223 @@
+"""Local full-text index over case problems and messages.
+
+A SQLite FTS5 table mirrors the text of every case: one row for the
+``problem`` and one per message. The bot keeps it current from the write
+path (``FirebaseService.create_case`` / ``add_message_to_case``); the web
+process reads the same file for ``/api/search/``. Rebuild it from Firestore
+with ``python manage.py rebuild_search_index``.
+
+Results are ranked with ``bm25`` and carry a short highlighted snippet.
+"""
+
+import html
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Snippet markers; replaced after escaping so user text can't inject markup
+_OPEN, _CLOSE = '\x02', '\x03'
+
+
+class SearchIndex:
+    """FTS5 index of case text stored in a SQLite file (WAL mode)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS entries USING fts5("
+            " body, case_id UNINDEXED, kind UNINDEXED, position UNINDEXED,"
+            " sender_role UNINDEXED, timestamp UNINDEXED,"
+            " tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        # Messages indexed per case, so appends get the next position
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cases (case_id TEXT PRIMARY KEY, messages INTEGER NOT NULL DEFAULT 0)"
+        )
+        # FTS rowids of each case: case_id is UNINDEXED in ``entries``, so
+        # filtering on it there would scan the whole table
+        has_rows = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'case_rows'"
+        ).fetchone()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS case_rows (rowid INTEGER PRIMARY KEY, case_id TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS case_rows_case ON case_rows (case_id)")
+        if not has_rows:
+            # Index files from before case_rows existed: map their rows once
+            self._conn.execute("INSERT INTO case_rows (rowid, case_id) SELECT rowid, case_id FROM entries")
+
+    # Writes ---------------------------------------------------------------
+
+    def index_case(self, case_id: str, case: dict, replace: bool = True) -> None:
+        """(Re)index one case: its problem and all its messages.
+
+        ``replace=False`` skips removing rows the case already has, for bulk
+        loads into an empty index.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if replace:
+                    self._delete(case_id)
+                self._insert_problem(case_id, case)
+                messages = case.get('messages') or []
+                for position, message in enumerate(messages):
+                    self._insert_message(case_id, position, message)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cases (case_id, messages) VALUES (?, ?)",
+                    (case_id, len(messages)),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        metrics.incr("search.cases_indexed")
+
+    def add_message(self, case_id: str, message: dict) -> None:
+        """Index one message appended to ``case_id``."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute("SELECT messages FROM cases WHERE case_id = ?", (case_id,)).fetchone()
+                position = row[0] if row else 0
+                self._insert_message(case_id, position, message)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cases (case_id, messages) VALUES (?, ?)",
+                    (case_id, position + 1),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        metrics.incr("search.messages_indexed")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM cases")
+            self._conn.execute("DELETE FROM case_rows")
+
+    def optimize(self) -> None:
+        """Merge FTS segments (worth running after a bulk rebuild)."""
+        with self._lock:
+            self._conn.execute("INSERT INTO entries (entries) VALUES ('optimize')")
+
+    def _delete(self, case_id: str) -> None:
+        self._conn.execute(
+            "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM case_rows WHERE case_id = ?)", (case_id,)
+        )
+        self._conn.execute("DELETE FROM case_rows WHERE case_id = ?", (case_id,))
+        self._conn.execute("DELETE FROM cases WHERE case_id = ?", (case_id,))
+
+    def _insert_problem(self, case_id: str, case: dict) -> None:
+        cursor = self._conn.execute(
+            "INSERT INTO entries (body, case_id, kind, position, sender_role, timestamp)"
+            " VALUES (?, ?, 'problem', NULL, 'user', ?)",
+            (case.get('problem') or '', case_id, case.get('created_at')),
+        )
+        self._track(case_id, cursor.lastrowid)
+
+    def _insert_message(self, case_id: str, position: int, message: dict) -> None:
+        cursor = self._conn.execute(
+            "INSERT INTO entries (body, case_id, kind, position, sender_role, timestamp)"
+            " VALUES (?, ?, 'message', ?, ?, ?)",
+            (message.get('message') or '', case_id, position,
+             message.get('sender_role'), message.get('timestamp')),
+        )
+        self._track(case_id, cursor.lastrowid)
+
+    def _track(self, case_id: str, rowid: int) -> None:
+        self._conn.execute("INSERT INTO case_rows (rowid, case_id) VALUES (?, ?)", (rowid, case_id))
+
+    # Reads ----------------------------------------------------------------
+
+    def search(self, query: str, limit: int = 20, offset: int = 0,
+               marks: Tuple[str, str] = ('<mark>', '</mark>')) -> Tuple[int, List[dict]]:
+        """Best matches for ``query`` as ``(total, hits)``.
+
+        Each hit has ``case_id``, ``kind`` (problem/message), ``position``,
+        ``sender_role``, ``timestamp``, ``score`` (lower is better) and an
+        HTML-escaped ``snippet`` with matches wrapped in ``marks``.
+        """
+        match = fts_query(query)
+        if not match:
+            return 0, []
+        with metrics.timed("search.query"), self._lock:
+            total = self._conn.execute(
+                "SELECT count(*) FROM entries WHERE entries MATCH ?", (match,)
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT case_id, kind, position, sender_role, timestamp, bm25(entries),"
+                " snippet(entries, 0, ?, ?, '…', 16)"
+                " FROM entries WHERE entries MATCH ? ORDER BY bm25(entries) LIMIT ? OFFSET ?",
+                (_OPEN, _CLOSE, match, limit, offset),
+            ).fetchall()
+        return total, [
+            {
+                'case_id': r[0],
+                'kind': r[1],
+                'position': r[2],
+                'sender_role': r[3],
+                'timestamp': r[4],
+                'score': round(r[5], 4),
+                'snippet': highlight(r[6], *marks),
+            }
+            for r in rows
+        ]
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into a safe FTS5 query: all words, last one as a prefix."""
+    words = [w for w in (text or '').split() if w.strip('"*')]
+    if not words:
+        return ''
+    quoted = ['"' + w.replace('"', '""') + '"' for w in words]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def highlight(snippet: str, open_mark: str, close_mark: str) -> str:
+    return html.escape(snippet or '', quote=False).replace(_OPEN, open_mark).replace(_CLOSE, close_mark)
+
+
+def index_all(index: SearchIndex, cases: Iterable[Tuple[str, dict]]) -> int:
+    """Rebuild ``index`` from ``(case_id, case)`` pairs; returns the count."""
+    index.clear()
+    count = 0
+    for case_id, case in cases:
+        # Empty after clear(): nothing to delete first
+        index.index_case(case_id, case, replace=False)
+        count += 1
+    index.optimize()
+    return count
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> Optional[SearchIndex]:
+    """The process-wide index, or None when ``SEARCH_INDEX_PATH`` is empty."""
+    global _index
+    if _index is None:
+        path = getattr(settings, 'SEARCH_INDEX_PATH', '')
+        if not path:
+            return None
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex(path)
+    return _index
@@ -0,0 +1,373 @@
+"""Local write-ahead spool for Firestore writes.
+
+When Firestore is slow or unreachable, case and message writes are appended
+to a SQLite file (WAL mode) instead of being lost. ``SpoolReplayer`` flushes
+the spool to Firestore in order, in batches, backing off while Firestore
+stays down. Reads in ``FirebaseService`` overlay still-spooled writes with
+``apply_ops`` so counselors see a consistent history.
+
+``updated_at`` is stamped when a write is committed (``stamp``), not when it
+is queued: a write replayed after an outage gets the replay time, so
+``updated_at`` cursors (delta sync, incremental backups, the replica) that
+moved on during the outage still see it.
+
+Every process that writes to a spool must also replay it (the bot and each
+web worker start a replayer through ``bot.core.firebase.replay_spool``).
+Processes sharing one spool file take turns through an exclusive lock on
+``<spool>.lock``: only its holder replays, the others retry the lock.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds to keep routing writes straight to the spool after a failure
+OUTAGE_COOLDOWN = 30
+# Seconds between attempts to take the replay lock held by another process
+LOCK_RETRY_SECONDS = 10.0
+
+
+class WriteSpool:
+    """Ordered queue of pending Firestore writes in a local SQLite file.
+
+    Each entry is ``(seq, op, collection, doc_id, payload)`` where ``op`` is
+    ``set`` (whole document), ``update`` (merge fields) or ``append_message``
+    (append to the case's ``messages`` array).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " op TEXT NOT NULL,"
+            " collection TEXT NOT NULL,"
+            " doc_id TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS spool_doc ON spool (collection, doc_id)")
+        self._outage_until = 0.0
+        metrics.gauge("spool.depth", self.depth)
+
+    # Outage tracking ----------------------------------------------------
+
+    def mark_outage(self) -> None:
+        self._outage_until = time.monotonic() + OUTAGE_COOLDOWN
+
+    def clear_outage(self) -> None:
+        self._outage_until = 0.0
+
+    @property
+    def in_outage(self) -> bool:
+        return time.monotonic() < self._outage_until
+
+    # Queue operations ---------------------------------------------------
+
+    def append(self, op: str, collection: str, doc_id: str, payload: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO spool (op, collection, doc_id, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (op, collection, doc_id, json.dumps(payload), time.time()),
+            )
+        metrics.incr("spool.appended")
+
+    def pending(self, limit: int = 100) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, op, collection, doc_id, payload, attempts FROM spool ORDER BY seq LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [_row(r) for r in rows]
+
+    def pending_for(self, collection: str, doc_id: str) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, op, collection, doc_id, payload, attempts FROM spool"
+                " WHERE collection = ? AND doc_id = ? ORDER BY seq",
+                (collection, doc_id),
+            ).fetchall()
+        return [_row(r) for r in rows]
+
+    def pending_docs(self, collection: str) -> Dict[str, List[dict]]:
+        """All spooled entries of ``collection`` grouped by document id."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, op, collection, doc_id, payload, attempts FROM spool"
+                " WHERE collection = ? ORDER BY seq",
+                (collection,),
+            ).fetchall()
+        grouped: Dict[str, List[dict]] = {}
+        for r in rows:
+            entry = _row(r)
+            grouped.setdefault(entry['doc_id'], []).append(entry)
+        return grouped
+
+    def has_pending(self, collection: str, doc_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM spool WHERE collection = ? AND doc_id = ? LIMIT 1",
+                (collection, doc_id),
+            ).fetchone()
+        return row is not None
+
+    def ack(self, seqs: Iterable[int]) -> None:
+        seqs = list(seqs)
+        if not seqs:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM spool WHERE seq = ?", [(s,) for s in seqs])
+        metrics.incr("spool.replayed", len(seqs))
+
+    def bump_attempts(self, seq: int) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE spool SET attempts = attempts + 1 WHERE seq = ?", (seq,))
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+
+def _row(r) -> dict:
+    return {
+        'seq': r[0],
+        'op': r[1],
+        'collection': r[2],
+        'doc_id': r[3],
+        'payload': json.loads(r[4]),
+        'attempts': r[5],
+    }
+
+
+def stamp(fields: dict, now: Optional[str] = None) -> dict:
+    """``fields`` with ``updated_at`` set to ``now`` (default: the current time)."""
+    return {**fields, 'updated_at': now or datetime.now().isoformat()}
+
+
+def apply_ops(doc: Optional[dict], entries: List[dict]) -> Optional[dict]:
+    """Overlay spooled ``entries`` on a document read from Firestore.
+
+    Like the eventual commit, each applied entry stamps ``updated_at`` with
+    the current time rather than the time it was queued.
+    """
+    now = datetime.now().isoformat()
+    for e in entries:
+        if e['op'] == 'set':
+            doc = stamp(e['payload'], now)
+        elif doc is None:
+            continue
+        elif e['op'] == 'update':
+            doc = {**doc, **stamp(e['payload'], now)}
+        elif e['op'] == 'append_message':
+            message = e['payload']['message']
+            doc = stamp({
+                **doc,
+                'messages': list(doc.get('messages') or []) + [message],
+                'status': 'active',
+            }, now)
+    return doc
+
+
+class ReplayLock:
+    """Non-blocking exclusive lock on a file, held until ``release``.
+
+    The operating system drops it when the holding process dies, so another
+    process takes over replaying.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        try:
+            fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            logger.warning(f"Cannot open spool lock {self.path}: {e}")
+            return False
+        try:
+            _lock_file(fd)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            try:
+                _unlock_file(fd)
+            finally:
+                os.close(fd)
+
+
+try:
+    import fcntl
+
+    def _lock_file(fd):
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock_file(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_file(fd):
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+    def _unlock_file(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class SpoolReplayer:
+    """Background thread flushing the spool to Firestore in order.
+
+    Entries are committed in ``WriteBatch``es of up to ``batch_size``. A
+    failing batch is retried entry by entry so a permanently broken entry
+    (e.g. a message for a deleted case) is dropped after ``max_attempts``
+    instead of blocking the queue; connectivity errors back off
+    exponentially up to ``max_backoff`` seconds. Replays only while holding
+    the spool's ``ReplayLock``.
+    """
+
+    def __init__(self, service, spool: WriteSpool, batch_size: int = 100,
+                 interval: float = 1.0, max_backoff: float = 60.0, max_attempts: int = 5):
+        self.service = service
+        self.spool = spool
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.lock = ReplayLock(str(spool.path) + '.lock')
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='spool-replayer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the thread; the lock stays held until ``release``, so ``flush`` can follow."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def release(self) -> None:
+        self.lock.release()
+
+    def flush(self, deadline: float) -> bool:
+        """Replay until the spool is empty or ``deadline`` (monotonic) passes.
+
+        Returns False right away if another process holds the replay lock;
+        that process replays the rest.
+        """
+        if not self.lock.acquire():
+            return self.spool.depth() == 0
+        while time.monotonic() < deadline:
+            if self.spool.depth() == 0:
+                return True
+            try:
+                self.replay_once()
+            except Exception as e:
+                logger.warning(f"Spool flush failed: {e}")
+                time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+        return self.spool.depth() == 0
+
+    def replay_once(self) -> int:
+        """Commit one batch; returns how many entries were flushed."""
+        entries = self.spool.pending(self.batch_size)
+        if not entries:
+            self.spool.clear_outage()
+            return 0
+        try:
+            batch = self.service.db.batch()
+            for e in entries:
+                self.service._stage_write(batch, e['op'], e['collection'], e['doc_id'], e['payload'])
+            batch.commit()
+            self.spool.ack(e['seq'] for e in entries)
+            return len(entries)
+        except Exception as error:
+            if is_transient(error):
+                raise
+        # A permanent failure somewhere in the batch: apply one by one to isolate it
+        flushed = 0
+        for e in entries:
+            try:
+                self.service._apply_write(e['op'], e['collection'], e['doc_id'], e['payload'])
+            except Exception as error:
+                if is_transient(error):
+                    raise
+                self._give_up_or_retry(e, error)
+                break
+            self.spool.ack([e['seq']])
+            flushed += 1
+        return flushed
+
+    def _give_up_or_retry(self, entry: dict, error: Exception) -> None:
+        if entry['attempts'] + 1 >= self.max_attempts:
+            logger.error(f"Dropping spooled {entry['op']} for {entry['collection']}/{entry['doc_id']}: {error}")
+            metrics.incr("spool.dropped")
+            self.spool.ack([entry['seq']])
+        else:
+            self.spool.bump_attempts(entry['seq'])
+
+    def _run(self) -> None:
+        waiting = False
+        while not self._stop.is_set() and not self.lock.acquire():
+            if not waiting:
+                logger.info(f"Another process replays {self.spool.path}; waiting for its lock")
+                waiting = True
+            self._stop.wait(LOCK_RETRY_SECONDS)
+        backoff = self.interval
+        while not self._stop.is_set():
+            try:
+                flushed = self.replay_once()
+                backoff = self.interval
+                if flushed:
+                    continue
+            except Exception as e:
+                self.spool.mark_outage()
+                metrics.incr("spool.replay_errors")
+                logger.warning(f"Spool replay failed, retrying in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            self._stop.wait(self.interval)
+
+
+def is_transient(error: Exception) -> bool:
+    """True for errors worth retrying later (network, deadline, unavailable)."""
+    try:
+        from google.api_core import exceptions as gexc
+    except ImportError:
+        return True
+    permanent = (gexc.NotFound, gexc.InvalidArgument, gexc.FailedPrecondition, gexc.PermissionDenied)
+    return not isinstance(error, permanent)
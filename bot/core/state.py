@@ -1,6 +1,7 @@
-"""In-memory shared state for counselor selections, etc."""
-
-# Maps counselor telegram_id -> currently selected case_id
-counselor_active_case_selection: dict[int, str] = {}
+"""Shared state for counselor selections, etc.
 
+The bounded stores live in ``bot.bot_app.state``; re-exported here so both
+import paths refer to the same objects.
+"""
 
+from bot.bot_app.state import counselor_active_case_selection  # noqa: F401
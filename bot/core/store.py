@@ -0,0 +1,203 @@
+"""Bounded in-memory key/value store with idle TTL and LRU eviction.
+
+Used for per-user conversation state so the bot's memory stays flat no
+matter how many anonymous users have ever written to it.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def deep_sizeof(obj: Any, _seen: Optional[set] = None) -> int:
+    """Approximate the memory footprint of ``obj`` including its contents."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += deep_sizeof(k, _seen) + deep_sizeof(v, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_sizeof(item, _seen)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), _seen)
+    elif hasattr(obj, '__slots__'):
+        for name in obj.__slots__:
+            size += deep_sizeof(getattr(obj, name, None), _seen)
+    return size
+
+
+class BoundedStore(MutableMapping):
+    """Mapping that forgets entries idle for ``ttl_seconds`` and keeps at most
+    ``max_entries`` (least recently used are evicted first).
+
+    Every read or write refreshes the entry. ``on_evict(key, value)`` is called
+    for expired and LRU-evicted entries, not for explicit deletes. When
+    ``persist_path`` is set, the store is loaded from it on creation and
+    written back by ``save()``; keys and values must then be JSON-serialisable.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 10000,
+        ttl_seconds: Optional[float] = None,
+        on_evict: Optional[Callable[[Any, Any], None]] = None,
+        persist_path: Optional[Path] = None,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.evictions = 0
+        # key -> (value, last_access); ordered oldest access first
+        self._data: 'OrderedDict[Any, tuple]' = OrderedDict()
+        self._lock = threading.RLock()
+
+        if self.persist_path:
+            self.load()
+
+        metrics.gauge(f"store.{name}.entries", lambda: len(self))
+        metrics.gauge(f"store.{name}.bytes", self.approx_size_bytes)
+
+    # Mapping protocol -------------------------------------------------
+
+    def __getitem__(self, key):
+        with self._lock:
+            value, last = self._data[key]
+            now = time.time()
+            if self._expired(last, now):
+                self._evict(key)
+                raise KeyError(key)
+            self._data[key] = (value, now)
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._evict(next(iter(self._data)))
+
+    def __delitem__(self, key) -> None:
+        with self._lock:
+            del self._data[key]
+
+    def __iter__(self) -> Iterator:
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and not self._expired(item[1], time.time())
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, default=_MISSING):
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        return item[0]
+
+    # Eviction ---------------------------------------------------------
+
+    def touch(self, key, value=None) -> None:
+        """Mark ``key`` as active, storing ``value`` if it is not present yet."""
+        with self._lock:
+            item = self._data.get(key)
+            self[key] = value if item is None else item[0]
+
+    def sweep(self) -> int:
+        """Evict every expired entry. Cost is proportional to what is evicted."""
+        if not self.ttl_seconds:
+            return 0
+        evicted = 0
+        now = time.time()
+        with self._lock:
+            while self._data:
+                key, (_, last) = next(iter(self._data.items()))
+                if not self._expired(last, now):
+                    break
+                self._evict(key)
+                evicted += 1
+        return evicted
+
+    def _expired(self, last: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - last > self.ttl_seconds
+
+    def _evict(self, key) -> None:
+        value, _ = self._data.pop(key)
+        self.evictions += 1
+        metrics.incr(f"store.{self.name}.evictions")
+        if self.on_evict is not None:
+            try:
+                self.on_evict(key, value)
+            except Exception as e:
+                logger.warning(f"Eviction callback for {self.name} failed: {e}")
+
+    # Introspection and persistence -------------------------------------
+
+    def approx_size_bytes(self) -> int:
+        with self._lock:
+            items = list(self._data.items())
+        return sys.getsizeof(self._data) + sum(deep_sizeof(k) + deep_sizeof(v) for k, v in items)
+
+    def save(self) -> None:
+        if not self.persist_path:
+            return
+        with self._lock:
+            rows = [[k, v, last] for k, (v, last) in self._data.items()]
+        tmp = self.persist_path.with_suffix('.tmp')
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(rows))
+            os.replace(tmp, self.persist_path)
+        except Exception as e:
+            logger.error(f"Failed to persist {self.name} state: {e}")
+
+    def load(self) -> None:
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            rows = json.loads(self.persist_path.read_text())
+        except Exception as e:
+            logger.error(f"Failed to load {self.name} state: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, value, last in sorted(rows, key=lambda r: r[2]):
+                if not self._expired(last, now):
+                    self._data[key] = (value, last)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
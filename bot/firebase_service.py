@@ -1,41 +1,44 @@
 """
 Firebase Firestore service for managing database operations.
-"""
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-except ImportError as e:
-    print(f"Warning: firebase_admin not installed. {e}")
-    firebase_admin = None
-    firestore = None
 
+``firebase_admin`` (and gRPC with it) is imported when the first service
+is created, not at module import, so processes only pay for it when they
+talk to Firestore.
+"""
 from django.conf import settings
 from datetime import datetime
 from pathlib import Path
+import itertools
+import json
 import os
 
+from .core.case_search import CaseSearchIndex
+from .core import delta
+from .core.case_view import OPEN_STATUSES
+from .core.prefix_index import PrefixIndex
+from .core.records import Message
+from .core import response_cache
+from .core.search import get_search_index
+from .core.spool import WriteSpool, apply_ops, is_transient, stamp
+
 
 class FirebaseService:
-    def __init__(self):
-        if firebase_admin is None:
-            raise ImportError("firebase-admin is not installed. Run: pip install firebase-admin")
+    """Firestore data access. Create it through ``bot.core.firebase.get_service``.
+
+    ``pool_size`` Firestore clients are created, each with its own gRPC
+    channel, and ``db`` hands them out in turn.
+    """
+
+    def __init__(self, pool_size=1):
+        try:
+            import firebase_admin
+            from firebase_admin import credentials
+        except ImportError as e:
+            raise ImportError(f"firebase-admin is not installed. Run: pip install firebase-admin ({e})")
         
         if not firebase_admin._apps:
-            cred_path_setting = getattr(settings, 'FIREBASE_CREDENTIALS_PATH', 'serviceAccountKey.json')
-            cred_path = Path(cred_path_setting)
-            if not cred_path.is_absolute():
-                base_dir = Path(getattr(settings, 'BASE_DIR', '.'))
-                cred_path = base_dir / cred_path
-            print(f"[Firebase] Using credentials path: {cred_path}")
             try:
-                if cred_path.exists():
-                    cred = credentials.Certificate(str(cred_path))
-                    firebase_admin.initialize_app(cred)
-                    print("[Firebase] Initialized with service account credentials")
-                else:
-                    print(f"[Firebase] Credentials file not found at {cred_path}. Trying default app init...")
-                    firebase_admin.initialize_app()
-                    print("[Firebase] Initialized default app (no explicit credentials)")
+                firebase_admin.initialize_app(*_credentials(credentials))
             except Exception as e:
                 print(f"[Firebase] Error initializing Firebase: {e}")
                 import traceback
@@ -43,13 +46,142 @@ class FirebaseService:
                 raise
         
         try:
-            self.db = firestore.client()
-            print("[Firebase] Firestore client created successfully")
+            self._clients = [_firestore_client(firebase_admin.get_app()) for _ in range(max(1, pool_size))]
+            self._next_client = itertools.cycle(self._clients)
+            print(f"[Firebase] Firestore client created successfully ({len(self._clients)} channel(s))")
         except Exception as e:
             print(f"[Firebase] Error creating Firestore client: {e}")
             import traceback
             traceback.print_exc()
             raise
+
+        # Optional realtime view of open cases (attached by the bot process)
+        self.case_view = None
+
+        # Local write-ahead spool for case/message writes during outages
+        self.spool = None
+        spool_path = getattr(settings, 'FIRESTORE_SPOOL_PATH', '')
+        if spool_path:
+            try:
+                self.spool = WriteSpool(spool_path)
+            except Exception as e:
+                print(f"[Firebase] Write spool disabled: {e}")
+
+    @property
+    def db(self):
+        if len(self._clients) == 1:
+            return self._clients[0]
+        return next(self._next_client)
+
+    def warm_up(self):
+        """Open every gRPC channel and fetch an auth token with one point read each."""
+        for client in self._clients:
+            client.collection('users').document('_warmup').get()
+
+    def ping(self, timeout=None):
+        """Readiness check: one point read, failing after ``timeout`` seconds."""
+        self.db.collection('users').document('_ready').get(timeout=timeout)
+
+    # Spooled writes -------------------------------------------------------
+
+    def _stage_write(self, batch, op, collection, doc_id, payload):
+        """Add one spool-format write to a Firestore ``WriteBatch``.
+
+        ``updated_at`` is stamped now, when the write is committed, so a
+        write replayed from the spool does not land with its queue time.
+        """
+        ref = self.db.collection(collection).document(doc_id)
+        if op == 'set':
+            batch.set(ref, stamp(payload))
+        elif op == 'update':
+            batch.update(ref, stamp(payload))
+        elif op == 'append_message':
+            from firebase_admin import firestore
+            # The message keeps its own timestamp
+            batch.update(ref, stamp({
+                'messages': firestore.ArrayUnion([payload['message']]),
+                'status': 'active',
+            }))
+        else:
+            raise ValueError(f"Unknown spool op: {op}")
+
+    def _apply_write(self, op, collection, doc_id, payload):
+        batch = self.db.batch()
+        self._stage_write(batch, op, collection, doc_id, payload)
+        batch.commit()
+
+    def _write(self, op, collection, doc_id, payload):
+        """Write to Firestore, or to the local spool when Firestore is failing.
+
+        Writes for a document that still has spooled entries are spooled too,
+        so each document's writes reach Firestore in order.
+        """
+        spool = self.spool
+        if spool is not None and (spool.in_outage or spool.has_pending(collection, doc_id)):
+            spool.append(op, collection, doc_id, payload)
+            return
+        try:
+            self._apply_write(op, collection, doc_id, payload)
+        except Exception as e:
+            if spool is None or not is_transient(e):
+                raise
+            print(f"[Firebase] Write to {collection}/{doc_id} failed, spooling: {e}")
+            spool.mark_outage()
+            spool.append(op, collection, doc_id, payload)
+
+    def _index_text(self, method, case_id, payload):
+        """Mirror written text into the local search index (best effort)."""
+        try:
+            index = get_search_index()
+            if index is not None:
+                getattr(index, method)(case_id, payload)
+        except Exception as e:
+            print(f"[Firebase] Search index update failed for {case_id}: {e}")
+
+    def _invalidate(self, *namespaces):
+        """Expire cached API responses built from these collections (best effort)."""
+        try:
+            response_cache.invalidate(*namespaces)
+        except Exception as e:
+            print(f"[Firebase] Response cache invalidation failed: {e}")
+
+    def _merge_spooled(self, collection, doc_id, doc):
+        """Overlay spooled writes for one document on its Firestore data."""
+        if self.spool is None:
+            return doc
+        entries = self.spool.pending_for(collection, doc_id)
+        return apply_ops(doc, entries) if entries else doc
+
+    def _query_with_spool(self, query, field, value):
+        """Stream a ``cases`` query and overlay spooled writes.
+
+        If Firestore is unreachable, spooled cases alone are returned when
+        there are any; otherwise the error propagates.
+        """
+        try:
+            cases = [{'id': doc.id, **doc.to_dict()} for doc in query.stream()]
+        except Exception:
+            cases = self._merge_spooled_query('cases', [], field, value)
+            if not cases:
+                raise
+            return cases
+        return self._merge_spooled_query('cases', cases, field, value)
+
+    def _merge_spooled_query(self, collection, docs, field, value):
+        """Overlay spooled writes on query results for ``field == value``."""
+        if self.spool is None:
+            return docs
+        pending = self.spool.pending_docs(collection)
+        if not pending:
+            return docs
+        by_id = {d['id']: d for d in docs}
+        for doc_id, entries in pending.items():
+            merged = apply_ops(by_id.get(doc_id), entries)
+            if merged is not None and str(merged.get(field)) == str(value):
+                by_id[doc_id] = {**merged, 'id': doc_id}
+            else:
+                by_id.pop(doc_id, None)
+        return list(by_id.values())
     
     def create_user(self, user_data):
         """Create a new user in Firestore."""
@@ -63,6 +195,7 @@ class FirebaseService:
             'created_at': datetime.now().isoformat(),
             'updated_at': datetime.now().isoformat()
         })
+        self._invalidate('users')
         return user_ref
     
     def get_user(self, telegram_id):
@@ -80,10 +213,12 @@ class FirebaseService:
             'role': new_role,
             'updated_at': datetime.now().isoformat()
         })
+        self._invalidate('users')
     
     def create_case(self, case_data):
         """Create a new counseling case."""
-        case_ref = self.db.collection('cases')
+        # The id is generated locally, so the case can be spooled if needed
+        case_ref = self.db.collection('cases').document()
         new_case = {
             'user_telegram_id': case_data['user_telegram_id'],
             'problem': case_data['problem'],
@@ -94,73 +229,260 @@ class FirebaseService:
             'created_at': datetime.now().isoformat(),
             'updated_at': datetime.now().isoformat()
         }
-        doc_ref = case_ref.add(new_case)[1]
-        return doc_ref.id
+        self._write('set', 'cases', case_ref.id, new_case)
+        self._index_text('index_case', case_ref.id, new_case)
+        self._invalidate('cases')
+        return case_ref.id
     
     def get_case(self, case_id):
-        """Get case from Firestore."""
+        """Get case from Firestore (including writes still in the spool).
+
+        Open cases are served from the attached open-case view when it is
+        ready; those results omit the ``messages`` array.
+        """
+        view = self._open_view()
+        if view is not None:
+            case = view.get(case_id)
+            if case is not None:
+                return {**self._merge_spooled('cases', case_id, case), 'id': case_id}
         case_ref = self.db.collection('cases').document(case_id)
-        doc = case_ref.get()
-        if doc.exists:
-            return {**doc.to_dict(), 'id': doc.id}
+        try:
+            doc = case_ref.get()
+            data = doc.to_dict() if doc.exists else None
+        except Exception:
+            if self.spool is None or not self.spool.has_pending('cases', case_id):
+                raise
+            data = None
+        data = self._merge_spooled('cases', case_id, data)
+        if data is not None:
+            return {**data, 'id': case_id}
         return None
+
+    def update_case(self, case_id, fields):
+        """Update case fields; ``updated_at`` is set automatically."""
+        self._write('update', 'cases', case_id, {
+            **fields,
+            'updated_at': datetime.now().isoformat()
+        })
+        self._invalidate('cases')
     
-    def assign_case(self, case_id, counselor_id, leader_id):
-        """Assign case to a counselor."""
-        case_ref = self.db.collection('cases').document(case_id)
-        case_ref.update({
+    def assign_case(self, case_id, counselor_id, leader_id, notification=None):
+        """Assign case to a counselor.
+
+        ``notification`` (an outbox record, see ``bot.core.outbox.new_record``)
+        is written in the same batch, so it exists if and only if the
+        assignment does. The bot process delivers it.
+
+        While the case still has spooled writes (e.g. its ``create_case``),
+        or Firestore is failing, the update and then the notification go
+        through the spool instead, so they reach Firestore after the earlier
+        writes. Raises ``LookupError`` if the case does not exist.
+        """
+        now = datetime.now().isoformat()
+        fields = {
             'status': 'assigned',
             'assigned_counselor_id': counselor_id,
             'counseling_leader_id': leader_id,
-            'updated_at': datetime.now().isoformat()
-        })
+            'assigned_at': now,
+            'updated_at': now
+        }
+        spool = self.spool
+        if spool is None or not (spool.in_outage or spool.has_pending('cases', case_id)):
+            batch = self.db.batch()
+            batch.update(self.db.collection('cases').document(case_id), fields)
+            if notification:
+                batch.set(self.db.collection('outbox').document(), notification)
+            try:
+                batch.commit()
+                self._invalidate('cases')
+                return
+            except Exception as e:
+                if not is_transient(e):
+                    if type(e).__name__ == 'NotFound':
+                        raise LookupError(f"Case {case_id} not found") from e
+                    raise
+                if spool is None:
+                    raise
+                print(f"[Firebase] Assignment of {case_id} failed, spooling: {e}")
+                spool.mark_outage()
+        self._write('update', 'cases', case_id, fields)
+        if notification:
+            outbox_id = self.db.collection('outbox').document().id
+            if spool.has_pending('cases', case_id):
+                # Replayed after the update, so the counselor is told only once it applies
+                spool.append('set', 'outbox', outbox_id, notification)
+            else:
+                self._write('set', 'outbox', outbox_id, notification)
+        self._invalidate('cases')
     
     def add_message_to_case(self, case_id, message_data):
         """Add a message to a case's chat."""
-        case_ref = self.db.collection('cases').document(case_id)
-        case_doc = case_ref.get()
-        
-        if case_doc.exists:
-            case_data = case_doc.to_dict()
-            messages = case_data.get('messages', [])
-            messages.append({
-                'sender_role': message_data['sender_role'],
-                'sender_telegram_id': message_data['sender_telegram_id'],
-                'message': message_data['message'],
-                'timestamp': datetime.now().isoformat()
-            })
-            case_ref.update({
-                'messages': messages,
-                'status': 'active',
-                'updated_at': datetime.now().isoformat()
-            })
+        # Normalized through the Message record; media is relayed by Telegram
+        # file_id, so only its metadata is stored
+        entry = Message.from_doc({**message_data, 'timestamp': datetime.now()}).to_dict()
+        self._write('append_message', 'cases', case_id, {'message': entry})
+        self._index_text('add_message', case_id, entry)
+        self._invalidate('cases')
     
     def close_case(self, case_id):
         """Close a counseling case."""
-        case_ref = self.db.collection('cases').document(case_id)
-        case_ref.update({
-            'status': 'closed',
-            'updated_at': datetime.now().isoformat()
-        })
+        self.update_case(case_id, {'status': 'closed'})
     
     def get_all_pending_cases(self):
         """Get all pending cases."""
+        view = self._open_view()
+        if view is not None:
+            return self._merge_spooled_query('cases', view.with_status('pending'), 'status', 'pending')
         cases_ref = self.db.collection('cases').where('status', '==', 'pending')
         docs = cases_ref.stream()
         return [{'id': doc.id, **doc.to_dict()} for doc in docs]
+
+    def count_cases(self):
+        """Number of cases, via an aggregation query instead of a full scan."""
+        try:
+            return int(self.db.collection('cases').count().get()[0][0].value)
+        except AttributeError:
+            # Older client without aggregation queries
+            return sum(1 for _ in self.db.collection('cases').select([]).stream())
     
     def get_user_cases(self, telegram_id):
         """Get all cases for a user."""
         cases_ref = self.db.collection('cases').where('user_telegram_id', '==', telegram_id)
-        docs = cases_ref.stream()
-        return [{'id': doc.id, **doc.to_dict()} for doc in docs]
+        return self._query_with_spool(cases_ref, 'user_telegram_id', telegram_id)
     
     def get_counselor_cases(self, counselor_id):
         """Get all cases assigned to a counselor."""
         cases_ref = self.db.collection('cases').where('assigned_counselor_id', '==', counselor_id)
-        docs = cases_ref.stream()
-        return [{'id': doc.id, **doc.to_dict()} for doc in docs]
+        return self._query_with_spool(cases_ref, 'assigned_counselor_id', counselor_id)
     
+    # Open cases (served from the open-case view when attached) ------------
+
+    def attach_case_view(self, view):
+        """Serve open-case reads from ``view`` (see ``bot.core.case_view``)."""
+        self.case_view = view
+
+    def _open_view(self):
+        view = self.case_view
+        return view if view is not None and view.ready else None
+
+    def get_open_user_cases(self, telegram_id):
+        """Get a user's pending/assigned/active cases, newest first."""
+        view = self._open_view()
+        if view is not None:
+            cases = self._merge_spooled_query('cases', view.by_user(telegram_id), 'user_telegram_id', telegram_id)
+        else:
+            cases = self.get_user_cases(telegram_id)
+        return _newest_first(c for c in cases if c.get('status') in OPEN_STATUSES)
+
+    def get_open_counselor_cases(self, counselor_id):
+        """Get a counselor's pending/assigned/active cases, newest first."""
+        view = self._open_view()
+        if view is not None:
+            cases = self._merge_spooled_query('cases', view.by_counselor(counselor_id), 'assigned_counselor_id', counselor_id)
+        else:
+            cases = self.get_counselor_cases(counselor_id)
+        return _newest_first(c for c in cases if c.get('status') in OPEN_STATUSES)
+
+    def search_open_cases(self, query, counselor_id=None):
+        """Open cases matching ``query`` by id prefix, alias or problem words.
+
+        Limited to one counselor's cases when ``counselor_id`` is given.
+        Without a ready view the candidates are queried and indexed on the fly.
+        """
+        view = self._open_view()
+        if view is not None:
+            return view.search(query, counselor_id)
+        if counselor_id is not None:
+            cases = self.get_open_counselor_cases(counselor_id)
+        else:
+            docs = self.db.collection('cases').where('status', 'in', list(OPEN_STATUSES)).stream()
+            cases = [{'id': doc.id, **doc.to_dict()} for doc in docs]
+        return CaseSearchIndex(cases).search(query)
+
+    def resolve_case_id(self, prefix, counselor_id=None):
+        """Resolve a (short) case id, optionally among one counselor's open cases.
+
+        Uses the open-case view's prefix index when it is ready, so no
+        Firestore reads are needed. Returns None when nothing matches and
+        raises ``AmbiguousPrefix`` when several cases do.
+        """
+        prefix = (prefix or '').strip()
+        if not prefix or '/' in prefix:
+            return None
+        view = self._open_view()
+        if view is not None:
+            case_id = view.resolve(prefix, counselor_id)
+            if case_id is not None or counselor_id is not None:
+                return case_id
+            # Not an open case: only a full (20 character) id can still match
+            return prefix if len(prefix) >= 20 and self.get_case(prefix) else None
+        if counselor_id is not None:
+            ids = [c['id'] for c in self.get_open_counselor_cases(counselor_id)]
+            return PrefixIndex(ids).resolve(prefix)
+        from firebase_admin import firestore
+        cases = self.db.collection('cases')
+        docs = (
+            cases
+            .where(firestore.FieldPath.document_id(), '>=', cases.document(prefix))
+            .where(firestore.FieldPath.document_id(), '<', cases.document(prefix + '\uf8ff'))
+            .limit(5)
+            .stream()
+        )
+        return PrefixIndex(doc.id for doc in docs).resolve(prefix)
+
+    def get_cases_created_between(self, start, end):
+        """Cases (with messages) whose ``created_at`` is in ``[start, end)``."""
+        cases_ref = (
+            self.db.collection('cases')
+            .where('created_at', '>=', start)
+            .where('created_at', '<', end)
+        )
+        return [{'id': doc.id, **doc.to_dict()} for doc in cases_ref.stream()]
+
+    def changes_since(self, collection, cursor=None, limit=500):
+        """Documents of ``collection`` changed after ``cursor``, plus tombstones.
+
+        Returns ``(docs, deleted_ids, next_cursor, has_more)``; see
+        ``bot.core.delta`` for the cursor format. Raises ValueError for a
+        malformed cursor.
+        """
+        position = delta.decode_cursor(cursor)
+        # One extra row per source tells whether anything follows the page
+        changed = self._changed_after(self.db.collection(collection), position, limit + 1)
+        removed = self._changed_after(self._tombstones(collection), position, limit + 1)
+        rows = [{**doc, 'id': doc_id} for doc_id, doc in changed]
+        rows += [{'id': doc_id, 'updated_at': t.get('updated_at'), 'deleted': True} for doc_id, t in removed]
+        chunk, next_cursor, has_more = delta.page(rows, position, limit)
+        docs = [row for row in chunk if not row.get('deleted')]
+        deleted = [row['id'] for row in chunk if row.get('deleted')]
+        return docs, deleted, next_cursor, has_more
+
+    def _changed_after(self, ref, position, limit):
+        """Up to ``limit`` documents of ``ref`` after ``(updated_at, id)``, in that order.
+
+        Keyset paging on both fields: any number of changes may share one
+        ``updated_at`` without stalling the cursor.
+        """
+        from google.cloud.firestore_v1 import FieldPath
+
+        query = ref.order_by('updated_at').order_by(FieldPath.document_id())
+        if position != delta.ORIGIN:
+            query = query.start_after({'updated_at': position[0], '__name__': position[1]})
+        return [(doc.id, doc.to_dict() or {}) for doc in query.limit(limit).stream()]
+
+    def _tombstones(self, collection):
+        # One subcollection per collection keeps the range query single-field
+        return self.db.collection('tombstones').document(collection).collection('items')
+
+    def delete_document(self, collection, doc_id):
+        """Delete a document and leave a tombstone for delta-sync clients."""
+        now = datetime.now().isoformat()
+        batch = self.db.batch()
+        batch.delete(self.db.collection(collection).document(doc_id))
+        batch.set(self._tombstones(collection).document(doc_id), {'deleted_at': now, 'updated_at': now})
+        batch.commit()
+        self._invalidate(collection)
+
     def get_all_users_by_role(self, role):
         """Get all users with a specific role."""
         users_ref = self.db.collection('users').where('role', '==', role)
@@ -168,22 +490,60 @@ class FirebaseService:
         return [{**doc.to_dict(), 'id': doc.id} for doc in docs]
 
 
-# Lazy singleton - will be created on first access
-_firebase_service_instance = None
+def _credentials(credentials):
+    """``initialize_app`` arguments: the service account from
+    ``FIREBASE_CREDENTIALS_JSON`` (parsed in memory), else the
+    ``FIREBASE_CREDENTIALS_PATH`` file, else application default credentials.
+    """
+    blob = getattr(settings, 'FIREBASE_CREDENTIALS_JSON', '')
+    if blob:
+        print("[Firebase] Using credentials from FIREBASE_CREDENTIALS_JSON")
+        return (credentials.Certificate(json.loads(blob)),)
+    cred_path = Path(getattr(settings, 'FIREBASE_CREDENTIALS_PATH', 'serviceAccountKey.json'))
+    if not cred_path.is_absolute():
+        cred_path = Path(getattr(settings, 'BASE_DIR', '.')) / cred_path
+    print(f"[Firebase] Using credentials path: {cred_path}")
+    if cred_path.exists():
+        return (credentials.Certificate(str(cred_path)),)
+    print(f"[Firebase] Credentials file not found at {cred_path}. Using default credentials...")
+    return ()
+
+
+def _firestore_client(app):
+    """A new Firestore client (and gRPC channel) for the firebase_admin ``app``.
+
+    ``firebase_admin.firestore.client()`` caches one client per app, which a
+    forked process would share with its parent; this always builds a fresh one.
+    """
+    from google.cloud import firestore as gcf
+
+    project = app.project_id
+    if not project:
+        raise ValueError(
+            'Project ID is required to access Firestore. Use service account credentials '
+            'or set GOOGLE_CLOUD_PROJECT.')
+    return gcf.Client(credentials=app.credential.get_credential(), project=project)
+
+
+def _newest_first(cases):
+    return sorted(cases, key=lambda c: c.get('created_at') or '', reverse=True)
+
 
 def get_firebase_service():
-    global _firebase_service_instance
-    if _firebase_service_instance is None:
-        try:
-            _firebase_service_instance = FirebaseService()
-            print("Firebase service initialized successfully!")
-        except Exception as e:
-            print(f"Failed to initialize Firebase: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
-    return _firebase_service_instance
+    """The process's service (see ``bot.core.firebase.get_service``)."""
+    from .core.firebase import get_service
+    return get_service()
 
-# For backward compatibility
-firebase_service = None
 
+class _ServiceProxy:
+    """``firebase_service`` for older modules: resolves the service on use."""
+
+    def __getattr__(self, name):
+        service = get_firebase_service()
+        if service is None:
+            raise RuntimeError("Firebase service is not available")
+        return getattr(service, name)
+
+
+# For backward compatibility
+firebase_service = _ServiceProxy()
@@ -0,0 +1,47 @@
+"""
+Management command to back up Firestore users and cases to compressed
+NDJSON shards (see ``bot.core.backup``).
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Back up Firestore users/cases (with messages) to zstd/gzip NDJSON shards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dest', default=None, help='Backup root directory (default: BACKUP_DIR)')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only documents changed since the last completed backup')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue the latest interrupted run instead of starting a new one')
+        parser.add_argument('--shards', type=int, default=8, help='Id ranges per collection (full runs)')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--page-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        from bot.core import backup
+        from bot.core.firebase import get_service, last_error
+
+        root = options['dest'] or settings.BACKUP_DIR
+        service = get_service()
+        if service is None:
+            raise CommandError(f"Firebase is not available: {last_error() or 'set FIREBASE_CREDENTIALS_PATH or FIREBASE_CREDENTIALS_JSON'}")
+
+        if options['resume']:
+            run_dir = backup.latest_unfinished(root)
+            if run_dir is None:
+                raise CommandError(f'No interrupted backup under {root}')
+            run = backup.BackupRun(service.db, root, page_size=options['page_size'], run_dir=run_dir)
+            self.stdout.write(f'Resuming {run_dir}')
+        else:
+            try:
+                run = backup.BackupRun(service.db, root, incremental=options['incremental'],
+                                       shards=options['shards'], page_size=options['page_size'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        totals = run.run(workers=options['workers'])
+        summary = ', '.join(f'{n} {c}' for c, n in totals.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"{run.manifest['kind'].capitalize()} backup written to {run.dir} ({summary})"))
@@ -0,0 +1,97 @@
+"""
+Management command comparing the memory footprint of cached cases, users
+and messages kept as plain Firestore dicts versus ``CaseSummary``, ``User``
+and ``Message`` records.
+"""
+import json
+import random
+import string
+import tracemalloc
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from bot.core.records import CaseSummary, Message, User
+
+
+def _fake_doc(i, base):
+    created = base + timedelta(seconds=i * 37)
+    counselor = str(random.randint(10 ** 8, 10 ** 10)) if i % 3 else None
+    return ''.join(random.choices(string.ascii_letters + string.digits, k=20)), {
+        'user_telegram_id': random.randint(10 ** 8, 10 ** 10),
+        'problem': f"Problem description number {i}",
+        'status': random.choice(['pending', 'assigned', 'active']),
+        'assigned_counselor_id': counselor,
+        'counseling_leader_id': None,
+        'alias': None,
+        'messages': [],
+        'created_at': created.isoformat(),
+        'updated_at': (created + timedelta(minutes=5)).isoformat(),
+    }
+
+
+def _fake_user(i, base):
+    created = base + timedelta(seconds=i * 53)
+    telegram_id = random.randint(10 ** 8, 10 ** 10)
+    return str(telegram_id), {
+        'telegram_id': telegram_id,
+        'username': f"user{i}",
+        'first_name': f"Name {i}",
+        'role': random.choice(['user'] * 8 + ['counselor', 'leader']),
+        'blocked': False,
+        'created_at': created.isoformat(),
+        'updated_at': created.isoformat(),
+    }
+
+
+def _fake_message(i, base):
+    return str(i), {
+        'sender_role': random.choice(['user', 'counselor']),
+        'sender_telegram_id': random.randint(10 ** 8, 10 ** 10),
+        'message': f"Message text number {i}",
+        'timestamp': (base + timedelta(seconds=i * 11)).isoformat(),
+    }
+
+
+def _measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    data = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return data, size
+
+
+class Command(BaseCommand):
+    help = 'Benchmark memory of cached cases, users and messages: plain dicts vs records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        random.seed(42)
+        base = datetime(2025, 1, 1)
+        kinds = [
+            ('cases', _fake_doc, lambda cid, doc: CaseSummary.from_doc(cid, doc), True),
+            ('users', _fake_user, lambda cid, doc: User.from_doc(doc), False),
+            ('messages', _fake_message, lambda cid, doc: Message.from_doc(doc), False),
+        ]
+        self.stdout.write(f"{count} cached records of each kind")
+        for name, fake, to_record, with_id in kinds:
+            # Serialized so each decode yields fresh objects, like doc.to_dict()
+            docs = [(cid, json.dumps(d)) for cid, d in (fake(i, base) for i in range(count))]
+
+            # Cached as the bot did before: a copy of doc.to_dict() (cases also carry their id)
+            if with_id:
+                _, dict_bytes = _measure(lambda: {cid: {**json.loads(raw), 'id': cid} for cid, raw in docs})
+            else:
+                _, dict_bytes = _measure(lambda: {cid: json.loads(raw) for cid, raw in docs})
+            _, record_bytes = _measure(lambda: {cid: to_record(cid, json.loads(raw)) for cid, raw in docs})
+
+            self.stdout.write(f"{name}:")
+            self.stdout.write(f"  dicts:   {dict_bytes / 2 ** 20:8.1f} MiB ({dict_bytes / count:.0f} B/record)")
+            self.stdout.write(f"  records: {record_bytes / 2 ** 20:8.1f} MiB ({record_bytes / count:.0f} B/record)")
+            if record_bytes:
+                self.stdout.write(self.style.SUCCESS(f"  ratio:   {dict_bytes / record_bytes:.2f}x smaller"))
@@ -0,0 +1,92 @@
+"""
+Management command comparing admin case-list responses before and after the
+compact response layer: full dicts through ``JsonResponse``'s encoder versus
+summaries through ``bot.core.compact`` (plus gzip/brotli).
+"""
+import gzip
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from bot.core import compact
+
+
+def _fake_case(i, base):
+    created = base + timedelta(seconds=i * 37)
+    user_id = random.randint(10 ** 8, 10 ** 10)
+    counselor = random.randint(10 ** 8, 10 ** 10) if i % 3 else None
+    messages = [
+        {
+            'sender_role': 'user' if n % 2 == 0 else 'counselor',
+            'sender_telegram_id': user_id if n % 2 == 0 else counselor,
+            'message': f"Message {n} of case {i}: " + ' '.join(random.choices(
+                ['I', 'feel', 'today', 'really', 'about', 'school', 'family', 'help', 'thanks', 'okay'], k=20)),
+            'timestamp': (created + timedelta(minutes=n)).isoformat(),
+        }
+        for n in range(random.randint(0, 40))
+    ]
+    return {
+        'id': f"case{i:016d}",
+        'user_telegram_id': user_id,
+        'problem': f"Problem description number {i}",
+        'status': random.choice(['pending', 'assigned', 'active', 'closed']),
+        'assigned_counselor_id': counselor,
+        'counseling_leader_id': None,
+        'alias': None,
+        'messages': messages,
+        'created_at': created.isoformat(),
+        'updated_at': (created + timedelta(minutes=5)).isoformat(),
+        'user_info': {'first_name': f"User {i}", 'username': f"user{i}"},
+    }
+
+
+def _best(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bytes on the wire and serialization time of the admin case list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        count, repeat = options['count'], options['repeat']
+        random.seed(42)
+        base = datetime(2025, 1, 1)
+        cases = [_fake_case(i, base) for i in range(count)]
+        request = SimpleNamespace(GET={})
+
+        # Before: full documents, JsonResponse's encoder, no compression
+        before, before_time = _best(
+            lambda: json.dumps({'cases': cases}, cls=DjangoJSONEncoder).encode('utf-8'), repeat)
+        # After: summaries through the compact serializer
+        after, after_time = _best(
+            lambda: compact.dumps({'cases': compact.shape(request, 'cases', cases)}), repeat)
+
+        rows = [('before (full, json)', len(before), before_time)]
+        rows.append(('after (summary)', len(after), after_time))
+        zipped, zip_time = _best(lambda: gzip.compress(after, compresslevel=6), repeat)
+        rows.append(('after + gzip', len(zipped), after_time + zip_time))
+        if compact.brotli is not None:
+            squeezed, br_time = _best(lambda: compact.brotli.compress(after, quality=5), repeat)
+            rows.append(('after + brotli', len(squeezed), after_time + br_time))
+
+        serializer = 'orjson' if compact.orjson is not None else 'json (orjson not installed)'
+        self.stdout.write(f"{count} cases, serializer: {serializer}, best of {repeat}")
+        for label, size, seconds in rows:
+            self.stdout.write(f"  {label:22} {size / 1024:10.1f} KiB {seconds * 1000:9.1f} ms")
+        smallest = min(size for _, size, _ in rows)
+        self.stdout.write(self.style.SUCCESS(f"  {len(before) / smallest:.1f}x fewer bytes on the wire"))
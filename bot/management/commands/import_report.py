@@ -0,0 +1,70 @@
+"""
+Management command reporting import time at process start (``python -X
+importtime``), so cold-start regressions show up before deploy. Exits with
+an error when the total exceeds ``--budget-ms``, which lets CI run it as a
+check.
+"""
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+TARGETS = {
+    # What a web worker imports before serving (warm-up disabled: no network)
+    'web': 'import counseling_bot.wsgi',
+    # What the bot imports before polling
+    'bot': 'import django; django.setup(); import bot.bot_app.app',
+}
+
+
+def parse_importtime(stderr):
+    """``(module, self_us, cumulative_us, depth)`` for each ``-X importtime`` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+            rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+        except ValueError:
+            continue
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Report module import time at startup (python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default='web',
+                            help="'web', 'bot' or a module to import (default: web)")
+        parser.add_argument('--top', type=int, default=20, help='How many of the slowest imports to list')
+        parser.add_argument('--budget-ms', type=float, default=0,
+                            help='Fail if total import time exceeds this (0: report only)')
+
+    def handle(self, *args, **options):
+        target = options['target']
+        code = TARGETS.get(target, f"import django; django.setup(); import {target}")
+        env = {**os.environ, 'FIREBASE_WARMUP': 'False'}
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'counseling_bot.settings')
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                capture_output=True, text=True, env=env)
+        if result.returncode != 0:
+            raise CommandError(f"Importing {target} failed:\n{result.stderr[-2000:]}")
+
+        rows = parse_importtime(result.stderr)
+        total_ms = sum(self_us for _, self_us, _, _ in rows) / 1000
+        self.stdout.write(f"{target}: {len(rows)} modules, {total_ms:.0f} ms total import time")
+        self.stdout.write(f"  {'cumulative':>10} {'self':>8}  module")
+        # Top-level packages own their children's time: rank those by cumulative
+        top_level = sorted((r for r in rows if r[3] == 0), key=lambda r: r[2], reverse=True)
+        for name, self_us, cumulative_us, _ in top_level[:options['top']]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f}ms {self_us / 1000:6.1f}ms  {name}")
+
+        budget = options['budget_ms']
+        if budget and total_ms > budget:
+            raise CommandError(f"Import time {total_ms:.0f} ms exceeds the {budget:.0f} ms budget")
+        if budget:
+            self.stdout.write(self.style.SUCCESS(f"Within the {budget:.0f} ms budget"))
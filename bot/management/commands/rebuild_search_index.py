@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the local full-text search index from Firestore.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SQLite full-text index of case problems and messages'
+
+    def handle(self, *args, **options):
+        from bot.core.search import get_search_index, index_all
+        from bot.core.firebase import get_service, last_error
+
+        index = get_search_index()
+        if index is None:
+            raise CommandError('SEARCH_INDEX_PATH is empty; the search index is disabled.')
+
+        service = get_service()
+        if service is None:
+            raise CommandError(f"Firebase is not available: {last_error() or 'set FIREBASE_CREDENTIALS_PATH or FIREBASE_CREDENTIALS_JSON'}")
+        docs = service.db.collection('cases').stream()
+        count = index_all(index, ((doc.id, doc.to_dict() or {}) for doc in docs))
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} cases into {index.path}'))
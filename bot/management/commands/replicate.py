@@ -0,0 +1,55 @@
+"""
+Management command to mirror Firestore users and cases into the local
+reporting replica (see ``bot.core.replica``).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Mirror Firestore users/cases into the local SQLite reporting replica'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Load or catch up, then exit instead of following changes')
+        parser.add_argument('--full', action='store_true',
+                            help='Ignore the checkpoint and reload everything')
+        parser.add_argument('--health-interval', type=float, default=15.0)
+        parser.add_argument('--sync-timeout', type=float, default=600.0,
+                            help='Seconds to wait for the initial load before failing')
+
+    def handle(self, *args, **options):
+        from bot.core.replica import ReplicaSync, get_replica
+        from bot.core.firebase import get_service, last_error
+
+        replica = get_replica()
+        if replica is None:
+            raise CommandError('REPLICA_PATH is empty; the replica is disabled.')
+        service = get_service()
+        if service is None:
+            raise CommandError(f"Firebase is not available: {last_error() or 'set FIREBASE_CREDENTIALS_PATH or FIREBASE_CREDENTIALS_JSON'}")
+
+        sync = ReplicaSync(service.db, replica, full=options['full'])
+        sync.start()
+        if not sync.wait_synced(options['sync_timeout']):
+            sync.stop()
+            raise CommandError(sync.error or f"Replica not synced within {options['sync_timeout']:.0f}s")
+        self.stdout.write(self.style.SUCCESS(f'Replica synced into {replica.path}'))
+        if options['once']:
+            sync.stop()
+            return
+
+        try:
+            while True:
+                time.sleep(options['health_interval'])
+                if not sync.healthy:
+                    # Resubscribe from the checkpoint
+                    self.stdout.write(self.style.WARNING('Listener inactive; resubscribing'))
+                    sync.stop()
+                    sync = ReplicaSync(service.db, replica)
+                    sync.start()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\nReplica stopped by user.'))
+        finally:
+            sync.stop()
@@ -0,0 +1,43 @@
+"""
+Management command to restore Firestore users and cases from backups made
+with ``manage.py backup``.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Restore Firestore users/cases from backup shards via batched writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=None, help='Backup root directory (default: BACKUP_DIR)')
+        parser.add_argument('--run', default=None,
+                            help='Restore only this run directory (default: latest full run plus later incrementals)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Writes per WriteBatch commit (max 500)')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--dry-run', action='store_true', help='Read and count documents without writing')
+
+    def handle(self, *args, **options):
+        from bot.core import backup
+        from bot.core.firebase import get_service, last_error
+
+        root = options['source'] or settings.BACKUP_DIR
+        run_dirs = [Path(options['run'])] if options['run'] else backup.restore_chain(root)
+        if not run_dirs:
+            raise CommandError(f'No completed backup under {root}')
+        self.stdout.write('Restoring: ' + ', '.join(d.name for d in run_dirs))
+
+        service = get_service()
+        if service is None:
+            raise CommandError(f"Firebase is not available: {last_error() or 'set FIREBASE_CREDENTIALS_PATH or FIREBASE_CREDENTIALS_JSON'}")
+        totals = backup.restore(
+            service.db, run_dirs,
+            batch_size=max(1, min(500, options['batch_size'])),
+            workers=options['workers'],
+            dry_run=options['dry_run'],
+        )
+        summary = ', '.join(f'{n} {c}' for c, n in totals.items())
+        verb = 'Would restore' if options['dry_run'] else 'Restored'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {summary}'))
@@ -3,11 +3,24 @@
 from telegram import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 
 
+# Button labels (also the routing keys in bot_app.router)
+BTN_DISCUSS = "💬 Discuss"
+BTN_NEW_PROBLEM = "🆕 New problem"
+BTN_SWITCH = "🔀 Switch case"
+BTN_MY_CASES = "📋 My cases"
+BTN_SET_NAME = "📝 Set name"
+BTN_DONE = "✅ Done"
+BTN_BLOCK = "🚫 Block user"
+BTN_HELP = "❓ Help"
+BTN_ALL_CASES = "📊 All cases"
+BTN_PENDING = "🕓 Pending"
+
+
 def build_main_menu():
     """For normal users: show Discuss button only."""
     return ReplyKeyboardMarkup(
         [
-            [KeyboardButton("💬 Discuss")],
+            [KeyboardButton(BTN_DISCUSS)],
         ],
         resize_keyboard=True,
     )
@@ -16,9 +29,9 @@ def build_main_menu():
 def build_counselor_menu() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         [
-            [KeyboardButton("🔀 Switch case"), KeyboardButton("📋 My cases")],
-            [KeyboardButton("📝 Set name"), KeyboardButton("✅ Done")],
-            [KeyboardButton("🚫 Block user"), KeyboardButton("❓ Help")],
+            [KeyboardButton(BTN_SWITCH), KeyboardButton(BTN_MY_CASES)],
+            [KeyboardButton(BTN_SET_NAME), KeyboardButton(BTN_DONE)],
+            [KeyboardButton(BTN_BLOCK), KeyboardButton(BTN_HELP)],
         ],
         resize_keyboard=True,
     )
@@ -27,12 +40,17 @@ def build_counselor_menu() -> ReplyKeyboardMarkup:
 def build_admin_menu() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         [
-            [KeyboardButton("🔀 Switch case"), KeyboardButton("📋 My cases")],
-            [KeyboardButton("📝 Set name"), KeyboardButton("✅ Done")],
-            [KeyboardButton("🚫 Block user"), KeyboardButton("❓ Help")],
-            [KeyboardButton("📊 All cases"), KeyboardButton("🕓 Pending")],
+            [KeyboardButton(BTN_SWITCH), KeyboardButton(BTN_MY_CASES)],
+            [KeyboardButton(BTN_SET_NAME), KeyboardButton(BTN_DONE)],
+            [KeyboardButton(BTN_BLOCK), KeyboardButton(BTN_HELP)],
+            [KeyboardButton(BTN_ALL_CASES), KeyboardButton(BTN_PENDING)],
         ],
         resize_keyboard=True,
     )
 
 
+# Built once at import time; PTB markup objects are immutable and safe to share.
+MAIN_MENU = build_main_menu()
+COUNSELOR_MENU = build_counselor_menu()
+ADMIN_MENU = build_admin_menu()
+REMOVE_KEYBOARD = ReplyKeyboardRemove()
@@ -6,9 +6,14 @@ from . import views
 
 urlpatterns = [
     path('health/', views.health_check, name='health'),
+    path('ready/', views.ready_check, name='ready'),
     path('cases/', views.get_all_cases, name='get_cases'),
     path('users/', views.get_all_users, name='get_users'),
     path('assign-role/', views.assign_user_role, name='assign_role'),
     path('stats/', views.get_stats, name='stats'),
+    path('metrics/', views.get_metrics, name='metrics'),
+    path('search/', views.search_cases, name='search'),
+    path('analytics/', views.get_analytics, name='analytics'),
+    path('export/<str:dataset>.<str:fmt>', views.export_data, name='export'),
 ]
 
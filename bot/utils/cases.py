@@ -5,7 +5,7 @@ from typing import Any
 
 def build_case_label(service: Any, counselor_id: int, case_dict: dict) -> str:
     try:
-        cases = service.get_counselor_cases(str(counselor_id)) or []
+        cases = service.get_open_counselor_cases(str(counselor_id)) or []
         active = [c for c in cases if c.get('status') in ['assigned', 'active']]
         active.sort(key=lambda c: (c.get('updated_at') or c.get('created_at') or ''), reverse=True)
         idx = next((i for i, c in enumerate(active) if c.get('id') == case_dict.get('id')), None)
@@ -18,7 +18,7 @@ def build_case_label(service: Any, counselor_id: int, case_dict: dict) -> str:
 
 def build_case_tag(service: Any, counselor_id: int, case_dict: dict) -> str:
     try:
-        cases = service.get_counselor_cases(str(counselor_id)) or []
+        cases = service.get_open_counselor_cases(str(counselor_id)) or []
         active = [c for c in cases if c.get('status') in ['assigned', 'active']]
         active.sort(key=lambda c: (c.get('updated_at') or c.get('created_at') or ''), reverse=True)
         idx = next((i for i, c in enumerate(active) if c.get('id') == case_dict.get('id')), None)
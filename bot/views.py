@@ -1,64 +1,230 @@
 """
 Django views for bot admin and API.
 """
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 import json
 import logging
 
-logger = logging.getLogger(__name__)
+from .core import case_query
+from .core.aio import (
+    async_csrf_exempt, async_require_http_methods, gather, is_asgi, iterate_in_thread, run_sync,
+)
+from .core.compact import compressed_response, json_response, shape
+from .core.firebase import get_service as get_firebase_service
+from .core.replica import replica_for
+from .core.response_cache import cached_response
 
-# Lazy import to avoid Firebase initialization at module load
-def get_firebase_service():
-    from .firebase_service import firebase_service as fs
-    return fs
+logger = logging.getLogger(__name__)
 
 
-def health_check(request):
+async def health_check(request):
     """Health check endpoint."""
     return JsonResponse({'status': 'ok', 'message': 'Counseling Bot API is running'})
 
 
-@csrf_exempt
-@require_http_methods(["GET"])
-def get_all_cases(request):
-    """Get all cases (for admin)."""
+@async_require_http_methods(["GET", "HEAD"])
+async def ready_check(request):
+    """Readiness: 200 if Firestore and Telegram answer, else 503 (results cached briefly)."""
+    from .core import readiness
+    probes = readiness.probes()
+    results = await gather(*((probe.result,) for probe in probes))
+    body = readiness.summarize({probe.name: result for probe, result in zip(probes, results)})
+    return JsonResponse(body, status=200 if body['status'] == 'ready' else 503)
+
+
+@async_require_http_methods(["GET"])
+async def get_metrics(request):
+    """In-process metrics of this web worker."""
+    from .core import metrics
+    return JsonResponse({'metrics': metrics.snapshot()})
+
+
+async def _changes_since(request, collection):
+    """Delta-sync page: documents changed after ``since`` plus deleted ids.
+
+    Start with ``since=`` (empty) and pass the returned ``cursor`` back on
+    the next request; repeat immediately while ``has_more`` is true.
+    """
     try:
-        firebase_service = get_firebase_service()
-        cases = []
-        for doc in firebase_service.db.collection('cases').stream():
-            case_data = doc.to_dict()
-            case_data['id'] = doc.id
-            cases.append(case_data)
-        
-        return JsonResponse({'cases': cases, 'count': len(cases)})
+        limit = min(1000, max(1, int(request.GET.get('limit', 500))))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    try:
+        firebase_service = await run_sync(get_firebase_service)
+        docs, deleted, cursor, has_more = await run_sync(
+            firebase_service.changes_since, collection, request.GET.get('since'), limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error getting {collection} changes: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse({
+        collection: docs,
+        'deleted': deleted,
+        'count': len(docs),
+        'cursor': cursor,
+        'has_more': has_more,
+    })
+
+
+@async_csrf_exempt
+@async_require_http_methods(["GET"])
+@compressed_response
+async def get_all_cases(request):
+    """Get all cases (for admin), or only changes with ``?since=<cursor>``.
+
+    Filter and sort parameters are described in ``bot.core.case_query``.
+    """
+    if 'since' in request.GET:
+        return await _changes_since(request, 'cases')
+    replica = replica_for(request)
+    try:
+        query = case_query.from_request(request)
+        if query is not None and replica is None:
+            case_query.plan(query)
+    except case_query.QueryError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if replica is not None:
+        if query is None:
+            cases = await run_sync(replica.cases)
+        else:
+            cases = await run_sync(replica.find_cases, *case_query.replica_sql(query))
+        return json_response({'cases': shape(request, 'cases', cases), 'count': len(cases), 'source': 'replica'})
+    try:
+        firebase_service = await run_sync(get_firebase_service)
+        if query is None:
+            cases = await run_sync(_stream_all, firebase_service.db, 'cases')
+        else:
+            cases = await run_sync(_stream_query, case_query.firestore_query(firebase_service.db.collection('cases'), query))
+        return json_response({'cases': shape(request, 'cases', cases), 'count': len(cases)})
     except Exception as e:
         logger.error(f"Error getting cases: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@csrf_exempt
-@require_http_methods(["GET"])
-def get_all_users(request):
-    """Get all users (for admin)."""
+@async_csrf_exempt
+@async_require_http_methods(["GET"])
+@compressed_response
+async def get_all_users(request):
+    """Get all users (for admin), or only changes with ``?since=<cursor>``."""
+    if 'since' in request.GET:
+        return await _changes_since(request, 'users')
+    replica = replica_for(request)
+    if replica is not None:
+        users = await run_sync(replica.users)
+        return json_response({'users': shape(request, 'users', users), 'count': len(users), 'source': 'replica'})
     try:
-        firebase_service = get_firebase_service()
-        users = []
-        for doc in firebase_service.db.collection('users').stream():
-            user_data = doc.to_dict()
-            user_data['id'] = doc.id
-            users.append(user_data)
-        
-        return JsonResponse({'users': users, 'count': len(users)})
+        firebase_service = await run_sync(get_firebase_service)
+        users = await run_sync(_stream_all, firebase_service.db, 'users')
+        return json_response({'users': shape(request, 'users', users), 'count': len(users)})
     except Exception as e:
         logger.error(f"Error getting users: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def assign_user_role(request):
+@async_require_http_methods(["GET"])
+async def search_cases(request):
+    """Full-text search over case problems and messages.
+
+    Query parameters: ``q`` (required), ``page`` (from 1) and ``page_size``
+    (max 100). Hits are ranked by relevance; ``snippet`` is HTML-escaped
+    with matches wrapped in ``<mark>``.
+    """
+    from .core.search import get_search_index
+
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'Missing q'}, status=400)
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+        page_size = min(100, max(1, int(request.GET.get('page_size', 20))))
+    except ValueError:
+        return JsonResponse({'error': 'page and page_size must be integers'}, status=400)
+
+    index = await run_sync(get_search_index)
+    if index is None:
+        return JsonResponse({'error': 'Search index is disabled'}, status=503)
+    try:
+        total, hits = await run_sync(index.search, query, limit=page_size, offset=(page - 1) * page_size)
+    except Exception as e:
+        logger.error(f"Error searching cases: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'page_size': page_size,
+        'total': total,
+        'has_next': page * page_size < total,
+        'results': hits,
+    })
+
+
+@async_require_http_methods(["GET"])
+async def get_analytics(request):
+    """Counselor workload and response-time analytics.
+
+    Covers cases created in the window given by ``days`` (default 30) or
+    ``since``/``until`` (ISO timestamps). Durations are in seconds.
+    """
+    from .core import analytics
+
+    if not analytics.available():
+        return JsonResponse({'error': 'Analytics need numpy and pandas installed'}, status=503)
+    try:
+        days = int(request.GET['days']) if request.GET.get('days') else None
+        start, end = analytics.window(days, request.GET.get('since'), request.GET.get('until'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid days/since/until'}, status=400)
+
+    replica = replica_for(request)
+    try:
+        if replica is not None:
+            result = await run_sync(
+                analytics.report, lambda s, e: replica.cases(created_from=s, created_to=e), start, end, source='replica')
+        else:
+            service = await run_sync(get_firebase_service)
+            result = await run_sync(analytics.report, service.get_cases_created_between, start, end)
+        return JsonResponse({'analytics': result})
+    except Exception as e:
+        logger.error(f"Error computing analytics: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def export_data(request, dataset, fmt):
+    """Stream ``users``, ``cases`` or ``messages`` (transcripts) as NDJSON or CSV.
+
+    Rows are written as Firestore pages arrive, so memory use does not grow
+    with the collection. ``?gzip=1`` compresses the download; for cases,
+    ``?messages=1`` embeds each case's messages in NDJSON rows.
+    """
+    from .core import export
+
+    if dataset not in export.FIELDS or fmt not in export.CONTENT_TYPES:
+        return JsonResponse({'error': 'Unknown export'}, status=404)
+    firebase_service = get_firebase_service()
+    if not firebase_service:
+        return JsonResponse({'error': 'Firebase not connected'}, status=503)
+
+    compress = request.GET.get('gzip') in ('1', 'true')
+    filename = f"{dataset}.{fmt}" + ('.gz' if compress else '')
+    chunks = export.stream(firebase_service.db, dataset, fmt, compress=compress,
+                           with_messages=request.GET.get('messages') in ('1', 'true'))
+    if is_asgi(request):
+        # ASGI would read a sync iterator to the end before sending anything
+        chunks = iterate_in_thread(chunks)
+    response = StreamingHttpResponse(
+        chunks,
+        content_type='application/gzip' if compress else f"{export.CONTENT_TYPES[fmt]}; charset=utf-8",
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@async_csrf_exempt
+@async_require_http_methods(["POST"])
+async def assign_user_role(request):
     """Assign role to a user."""
     try:
         data = json.loads(request.body)
@@ -71,42 +237,60 @@ def assign_user_role(request):
         if role not in ['user', 'counselor', 'leader']:
             return JsonResponse({'error': 'Invalid role'}, status=400)
         
-        firebase_service = get_firebase_service()
-        firebase_service.update_user_role(telegram_id, role)
+        firebase_service = await run_sync(get_firebase_service)
+        await run_sync(firebase_service.update_user_role, telegram_id, role)
         return JsonResponse({'success': True, 'message': f'Role {role} assigned'})
     except Exception as e:
         logger.error(f"Error assigning role: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@csrf_exempt
-@require_http_methods(["GET"])
-def get_stats(request):
+@async_csrf_exempt
+@async_require_http_methods(["GET"])
+@cached_response('cases', 'users')
+async def get_stats(request):
     """Get statistics."""
+    replica = replica_for(request)
+    if replica is not None:
+        return JsonResponse({'stats': await run_sync(replica.stats), 'source': 'replica'})
     try:
-        firebase_service = get_firebase_service()
+        firebase_service = await run_sync(get_firebase_service)
+        db = firebase_service.db
+        # One projected scan per collection plus the pending query, run side by side
+        roles, statuses, pending = await gather(
+            (_count_by, db.collection('users').select(['role']), 'role', 'user'),
+            (_count_by, db.collection('cases').select(['status']), 'status', 'unknown'),
+            (firebase_service.get_all_pending_cases,),
+        )
         stats = {
-            'total_users': len(list(firebase_service.db.collection('users').stream())),
-            'total_cases': len(list(firebase_service.db.collection('cases').stream())),
-            'pending_cases': len(firebase_service.get_all_pending_cases()),
+            'total_users': sum(roles.values()),
+            'total_cases': sum(statuses.values()),
+            'pending_cases': len(pending),
+            'users_by_role': roles,
+            'cases_by_status': statuses,
         }
-        
-        # Count by role
-        roles = {}
-        for doc in firebase_service.db.collection('users').stream():
-            role = doc.to_dict().get('role', 'user')
-            roles[role] = roles.get(role, 0) + 1
-        stats['users_by_role'] = roles
-        
-        # Count by status
-        statuses = {}
-        for doc in firebase_service.db.collection('cases').stream():
-            status = doc.to_dict().get('status', 'unknown')
-            statuses[status] = statuses.get(status, 0) + 1
-        stats['cases_by_status'] = statuses
-        
         return JsonResponse({'stats': stats})
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
+
+def _stream_all(db, collection):
+    return _stream_query(db.collection(collection))
+
+
+def _stream_query(query):
+    documents = []
+    for doc in query.stream():
+        data = doc.to_dict()
+        data['id'] = doc.id
+        documents.append(data)
+    return documents
+
+
+def _count_by(query, field, default):
+    counts = {}
+    for doc in query.stream():
+        value = (doc.to_dict() or {}).get(field, default)
+        counts[value] = counts.get(value, 0) + 1
+    return counts
@@ -134,4 +134,86 @@ TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
 
 # Firebase Configuration
 FIREBASE_CREDENTIALS_PATH = os.getenv('FIREBASE_CREDENTIALS_PATH', 'serviceAccountKey.json')
-
+# Service account JSON itself (e.g. a Render secret); used in memory, never written to disk
+FIREBASE_CREDENTIALS_JSON = os.getenv('FIREBASE_CREDENTIALS_JSON', '')
+# Open the Firestore channel while a process boots instead of on its first request
+FIREBASE_WARMUP = os.getenv('FIREBASE_WARMUP', 'True') == 'True'
+FIREBASE_WARMUP_TIMEOUT = float(os.getenv('FIREBASE_WARMUP_TIMEOUT', '10'))
+
+
+# Bot conversation state: per-user entries idle longer than the TTL, or beyond
+# the max entry count (least recently used first), are dropped.
+BOT_STATE_MAX_ENTRIES = int(os.getenv('BOT_STATE_MAX_ENTRIES', '10000'))
+BOT_STATE_TTL_SECONDS = int(os.getenv('BOT_STATE_TTL_SECONDS', str(6 * 3600)))
+# Directory to persist bot state across restarts (disabled when empty)
+BOT_STATE_DIR = os.getenv('BOT_STATE_DIR', '')
+
+# Seconds between outbox polls in the bot process (notifications queued by web views)
+OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', '2'))
+
+# Local SQLite write-ahead spool for case/message writes while Firestore is
+# unreachable. Every process that spools also replays (the bot and each web
+# worker); processes sharing the file take turns through <path>.lock. Set to
+# an empty string to disable.
+FIRESTORE_SPOOL_PATH = os.getenv('FIRESTORE_SPOOL_PATH', str(BASE_DIR / 'var' / 'firestore_spool.sqlite3'))
+
+# Local SQLite FTS5 index of case problems and messages, written by the bot
+# and read by /api/search/. Set to an empty string to disable.
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', str(BASE_DIR / 'var' / 'search.sqlite3'))
+
+# Local SQLite replica of users/cases kept by `manage.py replicate`. Reporting
+# endpoints read it when REPORTS_SOURCE is 'replica' (or with ?source=replica).
+REPLICA_PATH = os.getenv('REPLICA_PATH', str(BASE_DIR / 'var' / 'replica.sqlite3'))
+REPORTS_SOURCE = os.getenv('REPORTS_SOURCE', 'firestore')
+
+# Root directory for `manage.py backup` / `restore`
+BACKUP_DIR = os.getenv('BACKUP_DIR', str(BASE_DIR / 'var' / 'backups'))
+
+# Most blocking Firestore calls one async view request runs at once
+FIRESTORE_CONCURRENCY = int(os.getenv('FIRESTORE_CONCURRENCY', '8'))
+
+# Cache for the polled admin/stats JSON endpoints (bot.core.response_cache).
+# 'locmem' is per process; 'file' (API_CACHE_DIR) and 'db' (run
+# `manage.py createcachetable` first) are shared by every worker and the bot,
+# so write invalidations reach all of them.
+API_CACHE_BACKEND = os.getenv('API_CACHE_BACKEND', 'locmem')
+_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'counseling-bot',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('API_CACHE_DIR', str(BASE_DIR / 'var' / 'cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache',
+    },
+}
+CACHES = {'default': _CACHE_BACKENDS[API_CACHE_BACKEND]}
+API_CACHE_ALIAS = 'default'
+API_CACHE_TTL = int(os.getenv('API_CACHE_TTL', '30'))
+
+# Listing responses above this size are gzip/brotli-compressed (bot.core.compact)
+API_COMPRESS_MIN_BYTES = int(os.getenv('API_COMPRESS_MIN_BYTES', '1024'))
+
+# Composite Firestore indexes the case-list query planner may use (bot.core.case_query)
+FIRESTORE_INDEXES_PATH = os.getenv('FIRESTORE_INDEXES_PATH', str(BASE_DIR / 'firestore.indexes.json'))
+
+# Seconds the bot gets on SIGTERM to finish in-flight updates, outbox sends
+# and the spool flush (keep below the supervisor's SHUTDOWN_GRACE_SECONDS)
+BOT_DRAIN_SECONDS = float(os.getenv('BOT_DRAIN_SECONDS', '25'))
+
+# Readiness probes (/api/ready/, and the bot's /ready on BOT_HEALTH_PORT):
+# results are reused for READINESS_CACHE_SECONDS, a successful Telegram getMe
+# for READINESS_TELEGRAM_CACHE_SECONDS; each check gives up after READINESS_TIMEOUT.
+READINESS_CACHE_SECONDS = float(os.getenv('READINESS_CACHE_SECONDS', '5'))
+READINESS_TELEGRAM_CACHE_SECONDS = float(os.getenv('READINESS_TELEGRAM_CACHE_SECONDS', '60'))
+READINESS_TIMEOUT = float(os.getenv('READINESS_TIMEOUT', '2'))
+# Port of the bot process's /health and /ready endpoints (0 disables them)
+BOT_HEALTH_PORT = int(os.getenv('BOT_HEALTH_PORT', '0'))
+
+# gRPC channels (one Firestore client each) the Firestore service spreads its
+# calls over; raise it for workers running many concurrent requests
+FIRESTORE_CHANNEL_POOL_SIZE = int(os.getenv('FIRESTORE_CHANNEL_POOL_SIZE', '1'))
@@ -5,15 +5,24 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from bot.admin_views import admin_dashboard, api_cases, api_counselors, api_assign_case
+from bot.admin_views import admin_dashboard, api_cases, api_cases_stream, api_counselors, api_assign_case
+from bot import admin_site
 
 urlpatterns = [
     # Standalone admin dashboard - accessible at /admin-ui/
     path('admin-ui/', admin_dashboard, name='admin_dashboard'),
     path('admin-ui/api/cases/', api_cases, name='api_cases'),
+    path('admin-ui/api/cases/stream/', api_cases_stream, name='api_cases_stream'),
     path('admin-ui/api/counselors/', api_counselors, name='api_counselors'),
     path('admin-ui/api/cases/<str:case_id>/assign/', api_assign_case, name='api_assign_case'),
     
+    # Case management inside the Django admin (login required)
+    path('admin/counseling/', admin_site.counseling_cases_view, name='admin_counseling_cases'),
+    path('admin/bot/cases/api/', admin_site.cases_api_view, name='admin_cases_api'),
+    path('admin/bot/cases/stream/', admin_site.cases_stream_view, name='admin_cases_stream'),
+    path('admin/bot/cases/<str:case_id>/assign/', admin_site.assign_case_view, name='admin_assign_case'),
+    path('admin/bot/users/api/', admin_site.users_api_view, name='admin_users_api'),
+
     # Django admin
     path('admin/', admin.site.urls),
     
@@ -15,3 +15,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'counseling_bot.settings')
 
 application = get_wsgi_application()
 
+# Open the Firestore channel before this worker takes its first request, and
+# replay writes that views spool while Firestore is down
+from bot.core.firebase import replay_spool, warm_up  # noqa: E402
+
+warm_up()
+replay_spool()
+
@@ -1,43 +1,231 @@
 #!/usr/bin/env python
 """
-Simple script to run Django and bot together.
+Run the web server and the Telegram bot together, under supervision.
+
+Each service is a child process. A child that exits is restarted with
+exponential backoff (reset once it has stayed up for a minute). SIGTERM or
+SIGINT is forwarded to every child as SIGTERM so they can drain, and
+anything still running after the grace period is killed. SIGHUP restarts
+the children one by one. The supervisor sleeps between events, so it idles
+at ~0% CPU.
+
+The web server is uvicorn (ASGI) when installed, else gunicorn (WSGI,
+threaded workers), else Django's runserver. Under ASGI the dashboard event
+streams and exports are async iterators and an idle stream holds no thread.
+Under WSGI every open stream holds one of a worker's ``--threads`` for its
+whole lifetime, so size them for the admin tabs you expect.
+
+    python run.py [--workers 4] [--threads 8] [--bind 0.0.0.0:8000] [--server auto] [--no-bot] [--no-web]
 """
+import argparse
+import importlib.util
+import logging
 import os
-import sys
+import select
+import signal
 import subprocess
-import threading
+import sys
+import time
+from pathlib import Path
 
+BASE_DIR = Path(__file__).resolve().parent
 
-def run_django():
-    """Run Django development server."""
-    os.system("python manage.py runserver")
+logger = logging.getLogger('supervisor')
 
+# Restart delays: BACKOFF_START doubling up to BACKOFF_MAX; a child that ran
+# for STABLE_SECONDS counts as healthy again.
+BACKOFF_START = 1.0
+BACKOFF_MAX = 60.0
+STABLE_SECONDS = 60.0
 
-def run_bot():
-    """Run Telegram bot."""
-    os.system("python manage.py run_bot")
 
+def _installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def web_command(server, workers, threads, bind, grace):
+    """argv for the web server child."""
+    host, _, port = bind.rpartition(':')
+    if server == 'auto':
+        if _installed('uvicorn'):
+            server = 'uvicorn'
+        elif _installed('gunicorn'):
+            server = 'gunicorn'
+        else:
+            server = 'runserver'
+    if server == 'gunicorn':
+        # WSGI: each open SSE stream or export holds one of these threads
+        # until it ends, on top of the ones serving ordinary requests
+        return [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', bind,
+                '--graceful-timeout', str(int(grace)), '--threads', str(threads),
+                'counseling_bot.wsgi:application']
+    if server == 'uvicorn':
+        return [sys.executable, '-m', 'uvicorn', 'counseling_bot.asgi:application',
+                '--host', host or '127.0.0.1', '--port', port, '--workers', str(workers),
+                '--timeout-graceful-shutdown', str(int(grace))]
+    logger.warning("Neither gunicorn nor uvicorn is installed; using Django's development server")
+    return [sys.executable, 'manage.py', 'runserver', '--noreload', bind]
+
+
+class Child:
+    """One supervised process."""
+
+    def __init__(self, name, argv):
+        self.name = name
+        self.argv = argv
+        self.proc = None
+        self.started_at = 0.0
+        self.backoff = BACKOFF_START
+        self.restart_at = 0.0
+
+    def start(self):
+        # Own session: terminal Ctrl+C reaches only the supervisor, which
+        # then stops children in order
+        self.proc = subprocess.Popen(self.argv, cwd=BASE_DIR, start_new_session=True)
+        self.started_at = time.monotonic()
+        logger.info(f"Started {self.name} (pid {self.proc.pid})")
+
+    @property
+    def running(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def signal(self, signum):
+        if self.running:
+            try:
+                self.proc.send_signal(signum)
+            except ProcessLookupError:
+                pass
+
+    def reap(self, stopping):
+        """If the child exited, schedule its restart; returns True if it did."""
+        if self.proc is None or self.proc.poll() is None:
+            return False
+        code = self.proc.returncode
+        self.proc = None
+        if stopping:
+            logger.info(f"{self.name} exited ({code})")
+            return True
+        now = time.monotonic()
+        if now - self.started_at >= STABLE_SECONDS:
+            self.backoff = BACKOFF_START
+        self.restart_at = now + self.backoff
+        logger.warning(f"{self.name} exited ({code}); restarting in {self.backoff:.0f}s")
+        self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+        return True
+
+
+class Supervisor:
+    def __init__(self, children, grace):
+        self.children = children
+        self.grace = grace
+        self.stopping = False
+        self.reload = False
+        # Self-pipe: the interpreter writes a byte to it for every signal
+        # (signal.set_wakeup_fd), which wakes the select() in run()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+
+    def _on_signal(self, signum, frame):
+        # Only plain flags: anything taking a lock here can deadlock with
+        # the main thread the handler interrupted
+        if signum in (signal.SIGTERM, signal.SIGINT):
+            self.stopping = True
+        elif signum == signal.SIGHUP:
+            self.reload = True
+
+    def _sleep(self, timeout):
+        """Wait up to ``timeout`` seconds or until a signal arrives."""
+        ready, _, _ = select.select([self._wake_r], [], [], timeout)
+        if ready:
+            try:
+                while os.read(self._wake_r, 512):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def run(self):
+        signal.set_wakeup_fd(self._wake_w, warn_on_full_buffer=False)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+        for child in self.children:
+            child.start()
+        while not self.stopping:
+            if self.reload:
+                self.reload = False
+                self._rolling_restart()
+            now = time.monotonic()
+            for child in self.children:
+                child.reap(stopping=False)
+                if child.proc is None and now >= child.restart_at:
+                    child.start()
+            pending = [c.restart_at - now for c in self.children if c.proc is None]
+            # SIGCHLD/SIGTERM/SIGHUP wake us early; otherwise sleep
+            self._sleep(max(0.1, min(pending)) if pending else 30.0)
+        self.shutdown()
+
+    def _rolling_restart(self):
+        logger.info("Reload requested; restarting children one by one")
+        for child in self.children:
+            self._stop(child)
+            child.backoff = BACKOFF_START
+            child.start()
+
+    def _stop(self, child):
+        child.signal(signal.SIGTERM)
+        try:
+            if child.proc is not None:
+                child.proc.wait(self.grace)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{child.name} did not stop within {self.grace:.0f}s; killing")
+            child.signal(signal.SIGKILL)
+            child.proc.wait()
+        child.proc = None
+
+    def shutdown(self):
+        logger.info("Stopping services...")
+        for child in self.children:
+            child.signal(signal.SIGTERM)
+        deadline = time.monotonic() + self.grace
+        for child in self.children:
+            if child.proc is None:
+                continue
+            try:
+                child.proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.warning(f"{child.name} did not drain within {self.grace:.0f}s; killing")
+                child.signal(signal.SIGKILL)
+                child.proc.wait()
+            child.reap(stopping=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Counseling Bot web server and bot')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', '2')))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WEB_THREADS', '8')),
+                        help='Threads per gunicorn (WSGI) worker; each open event stream or export holds one')
+    parser.add_argument('--bind', default=os.getenv('WEB_BIND', '127.0.0.1:8000'))
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'uvicorn', 'runserver'],
+                        default=os.getenv('WEB_SERVER', 'auto'))
+    parser.add_argument('--grace', type=float, default=float(os.getenv('SHUTDOWN_GRACE_SECONDS', '30')),
+                        help='Seconds children get to drain after SIGTERM')
+    parser.add_argument('--no-web', action='store_true')
+    parser.add_argument('--no-bot', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s [%(name)s] %(message)s', level=logging.INFO)
+    children = []
+    if not args.no_web:
+        children.append(Child('web', web_command(args.server, args.workers, args.threads, args.bind, args.grace)))
+    if not args.no_bot:
+        children.append(Child('bot', [sys.executable, 'manage.py', 'run_bot']))
+    if not children:
+        parser.error('Nothing to run')
 
-if __name__ == '__main__':
     print("Starting Counseling Bot...")
     print("Press Ctrl+C to stop")
-    
-    # Create threads
-    django_thread = threading.Thread(target=run_django)
-    bot_thread = threading.Thread(target=run_bot)
-    
-    # Start threads
-    django_thread.daemon = True
-    bot_thread.daemon = True
-    
-    django_thread.start()
-    bot_thread.start()
-    
-    # Wait for threads
-    try:
-        while True:
-            pass
-    except KeyboardInterrupt:
-        print("\nStopping services...")
-        sys.exit(0)
+    Supervisor(children, args.grace).run()
+
 
+if __name__ == '__main__':
+    main()